@@ -1,18 +1,31 @@
-import uvicorn
+import os
+import sys
+import time
 from typing_extensions import override
 from a2a.server.apps import A2AStarletteApplication
 from a2a.server.request_handlers import DefaultRequestHandler
-from a2a.server.tasks import InMemoryTaskStore
 from a2a.server.agent_execution import AgentExecutor, RequestContext
 from a2a.server.events import EventQueue
-from a2a.utils import new_agent_text_message
 from a2a.types import (
     AgentCard,
     AgentSkill,
     AgentCapabilities,
+    AgentExtension,
 )
 import re
 
+# Shared modules at the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.log import REQUEST_ID_HEADER, configure_logging, get_logger, request_context
+from common.metrics import instrument_app, track_skill
+from common.reply import RESPONSE_CACHE_EXTENSION, stream_reply
+from common.server import agent_port, serve
+from common.task_store import create_task_store
+from common.tracing import SERVER, extract, get_tracer, request_headers
+
+tracer = get_tracer('calculator_agent')
+logger = get_logger('calculator_agent')
+
 
 class CalculatorAgent:
     """Simple calculator agent with mock implementations"""
@@ -91,21 +104,33 @@ class CalculatorAgent:
         except Exception as e:
             return f"Temperature conversion error: {str(e)}"
     
-    async def process_query(self, query: str) -> str:
-        """Route query to appropriate calculation method"""
+    def classify(self, query: str):
+        """Skill id a query will run"""
         query_lower = query.lower()
         
         # Check for currency conversion
         if any(curr in query.upper() for curr in self.EXCHANGE_RATES.keys()):
             if 'to' in query_lower or 'convert' in query_lower:
-                return await self.convert_currency(query)
+                return 'convert_currency'
         
         # Check for temperature conversion
         if ('°c' in query_lower or 'celsius' in query_lower or 
             '°f' in query_lower or 'fahrenheit' in query_lower):
-            return await self.convert_temperature(query)
+            return 'convert_temperature'
         
         # Default to calculation
+        return 'calculate'
+    
+    async def process_query(self, query: str) -> str:
+        """Route query to appropriate calculation method"""
+        return await self.run_skill(self.classify(query), query)
+    
+    async def run_skill(self, skill_id, query: str) -> str:
+        """Run the handler for a classified skill"""
+        if skill_id == 'convert_currency':
+            return await self.convert_currency(query)
+        if skill_id == 'convert_temperature':
+            return await self.convert_temperature(query)
         return await self.calculate(query)
 
 
@@ -121,19 +146,31 @@ class CalculatorAgentExecutor(AgentExecutor):
         context: RequestContext,
         event_queue: EventQueue,
     ) -> None:
-        # Get the user's message
-        message_text = ""
-        if context.message and context.message.parts:
-            for part in context.message.parts:
-                if hasattr(part, 'root') and hasattr(part.root, 'text'):
-                    message_text = part.root.text
-                    break
-        
-        # Process the query
-        result = await self.agent.process_query(message_text)
-        
-        # Send response through event queue
-        await event_queue.enqueue_event(new_agent_text_message(result))
+        # Continue the caller's request id and trace (X-Request-ID and traceparent headers)
+        headers = request_headers(context)
+        with request_context(headers.get(REQUEST_ID_HEADER)), tracer.start_as_current_span(
+            'agent.execute', kind=SERVER, parent=extract(headers), attributes={'task_id': context.task_id}
+        ):
+            # Get the user's message
+            message_text = ""
+            if context.message and context.message.parts:
+                for part in context.message.parts:
+                    if hasattr(part, 'root') and hasattr(part.root, 'text'):
+                        message_text = part.root.text
+                        break
+            
+            # Process the query
+            skill_id = self.agent.classify(message_text)
+            started = time.perf_counter()
+            with tracer.start_as_current_span('agent.process', attributes={'skill': skill_id}), track_skill(skill_id):
+                result = await self.agent.run_skill(skill_id, message_text)
+            
+            # Stream the response through the event queue
+            with tracer.start_as_current_span('agent.reply'):
+                await stream_reply(context, event_queue, result)
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            logger.info("✅ %s answered in %.1fms", skill_id, elapsed_ms,
+                        extra={'skill': skill_id, 'duration_ms': round(elapsed_ms, 1)})
     
     @override
     async def cancel(
@@ -144,7 +181,8 @@ class CalculatorAgentExecutor(AgentExecutor):
         raise Exception('cancel not supported')
 
 
-if __name__ == '__main__':
+def create_app():
+    """Build the calculator agent's Starlette app (once per worker process)"""
     # Define agent skills
     calculate_skill = AgentSkill(
         id='calculate',
@@ -170,16 +208,26 @@ if __name__ == '__main__':
         examples=['12°C to F', '68°F to C', 'Convert 25 celsius to fahrenheit'],
     )
     
+    # Port from CALCULATOR_AGENT_PORT or PORT (run replicas on different ports)
+    port = agent_port('calculator_agent', 5002)
+    
     # Create Agent Card
     agent_card = AgentCard(
         name='calculator_agent',
         version='1.0.0',
         description='Performs calculations, currency conversions, and temperature conversions',
-        url='http://localhost:5002',
+        url=f'http://localhost:{port}',
         protocolVersion='0.3.0',
         capabilities=AgentCapabilities(
-            streaming=False,
+            streaming=True,
             pushNotifications=False,
+            extensions=[
+                AgentExtension(
+                    uri=RESPONSE_CACHE_EXTENSION,
+                    description='Per-skill response cache TTLs in seconds (0 = never cache)',
+                    params={'skills': {'calculate': 86400, 'convert_currency': 3600, 'convert_temperature': 86400}},
+                ),
+            ],
         ),
         authentication={
             'schemes': [],
@@ -192,7 +240,7 @@ if __name__ == '__main__':
     # Create request handler
     request_handler = DefaultRequestHandler(
         agent_executor=CalculatorAgentExecutor(),
-        task_store=InMemoryTaskStore(),
+        task_store=create_task_store('calculator_agent'),  # SQLite behind an LRU, shared by every worker (TASK_STORE)
     )
     
     # Create A2A server application
@@ -201,10 +249,19 @@ if __name__ == '__main__':
         http_handler=request_handler,
     )
     
-    print("🧮 Calculator Agent starting on http://localhost:5002")
-    print("📋 AgentCard: http://localhost:5002/.well-known/agent.json")
+    # Build the Starlette app with Prometheus metrics at /metrics
+    return instrument_app(server.build(), request_handler)
+
+
+if __name__ == '__main__':
+    configure_logging('calculator_agent')
+    port = agent_port('calculator_agent', 5002)
+    
+    logger.info("🧮 Calculator Agent starting on http://localhost:%d", port)
+    logger.info("📋 AgentCard: http://localhost:%d/.well-known/agent.json", port)
+    logger.info("📈 Metrics: http://localhost:%d/metrics", port)
     
-    # Start server
-    uvicorn.run(server.build(), host='0.0.0.0', port=5002)
+    # Start server (CALCULATOR_AGENT_WORKERS or WORKERS worker processes)
+    serve('calculator_agent', create_app, default_port=5002)
 
 # Made with Bob
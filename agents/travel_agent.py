@@ -1,17 +1,30 @@
-import uvicorn
+import os
+import sys
+import time
 from typing_extensions import override
 from a2a.server.apps import A2AStarletteApplication
 from a2a.server.request_handlers import DefaultRequestHandler
-from a2a.server.tasks import InMemoryTaskStore
 from a2a.server.agent_execution import AgentExecutor, RequestContext
 from a2a.server.events import EventQueue
-from a2a.utils import new_agent_text_message
 from a2a.types import (
     AgentCard,
     AgentSkill,
     AgentCapabilities,
+    AgentExtension,
 )
 
+# Shared modules at the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.log import REQUEST_ID_HEADER, configure_logging, get_logger, request_context
+from common.metrics import instrument_app, track_skill
+from common.reply import RESPONSE_CACHE_EXTENSION, stream_reply
+from common.server import agent_port, serve
+from common.task_store import create_task_store
+from common.tracing import SERVER, extract, get_tracer, request_headers
+
+tracer = get_tracer('travel_agent')
+logger = get_logger('travel_agent')
+
 
 class TravelAgent:
     """Simple travel advisor agent with mock recommendations"""
@@ -179,19 +192,31 @@ class TravelAgent:
         
         return "Please specify a destination (Paris, Tokyo, Maldives, or Thailand) for budget estimate"
     
-    async def process_query(self, query: str) -> str:
-        """Route query to appropriate travel method"""
+    def classify(self, query: str):
+        """Skill id a query will run"""
         query_lower = query.lower()
         
         # Check for budget estimate
         if any(word in query_lower for word in ["budget", "cost", "price", "expensive", "estimate"]):
-            return await self.estimate_budget(query)
+            return 'estimate_budget'
         
         # Check for travel tips
         if any(word in query_lower for word in ["tips", "advice", "safety", "cultural"]):
-            return await self.get_travel_tips(query)
+            return 'get_travel_tips'
         
         # Default to destination recommendation
+        return 'recommend_destination'
+    
+    async def process_query(self, query: str) -> str:
+        """Route query to appropriate travel method"""
+        return await self.run_skill(self.classify(query), query)
+    
+    async def run_skill(self, skill_id, query: str) -> str:
+        """Run the handler for a classified skill"""
+        if skill_id == 'estimate_budget':
+            return await self.estimate_budget(query)
+        if skill_id == 'get_travel_tips':
+            return await self.get_travel_tips(query)
         return await self.recommend_destination(query)
 
 
@@ -207,19 +232,31 @@ class TravelAgentExecutor(AgentExecutor):
         context: RequestContext,
         event_queue: EventQueue,
     ) -> None:
-        # Get the user's message
-        message_text = ""
-        if context.message and context.message.parts:
-            for part in context.message.parts:
-                if hasattr(part, 'root') and hasattr(part.root, 'text'):
-                    message_text = part.root.text
-                    break
-        
-        # Process the query
-        result = await self.agent.process_query(message_text)
-        
-        # Send response through event queue
-        await event_queue.enqueue_event(new_agent_text_message(result))
+        # Continue the caller's request id and trace (X-Request-ID and traceparent headers)
+        headers = request_headers(context)
+        with request_context(headers.get(REQUEST_ID_HEADER)), tracer.start_as_current_span(
+            'agent.execute', kind=SERVER, parent=extract(headers), attributes={'task_id': context.task_id}
+        ):
+            # Get the user's message
+            message_text = ""
+            if context.message and context.message.parts:
+                for part in context.message.parts:
+                    if hasattr(part, 'root') and hasattr(part.root, 'text'):
+                        message_text = part.root.text
+                        break
+            
+            # Process the query
+            skill_id = self.agent.classify(message_text)
+            started = time.perf_counter()
+            with tracer.start_as_current_span('agent.process', attributes={'skill': skill_id}), track_skill(skill_id):
+                result = await self.agent.run_skill(skill_id, message_text)
+            
+            # Stream the response through the event queue
+            with tracer.start_as_current_span('agent.reply'):
+                await stream_reply(context, event_queue, result)
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            logger.info("✅ %s answered in %.1fms", skill_id, elapsed_ms,
+                        extra={'skill': skill_id, 'duration_ms': round(elapsed_ms, 1)})
     
     @override
     async def cancel(
@@ -230,7 +267,8 @@ class TravelAgentExecutor(AgentExecutor):
         raise Exception('cancel not supported')
 
 
-if __name__ == '__main__':
+def create_app():
+    """Build the travel agent's Starlette app (once per worker process)"""
     # Define agent skills
     recommend_skill = AgentSkill(
         id='recommend_destination',
@@ -256,16 +294,26 @@ if __name__ == '__main__':
         examples=['Budget for 7 days in Paris', 'How much does Tokyo cost', 'Estimate trip to Maldives'],
     )
     
+    # Port from TRAVEL_AGENT_PORT or PORT (run replicas on different ports)
+    port = agent_port('travel_agent', 5003)
+    
     # Create Agent Card
     agent_card = AgentCard(
         name='travel_agent',
         version='1.0.0',
         description='Travel advisor providing destination recommendations, tips, and budget estimates',
-        url='http://localhost:5003',
+        url=f'http://localhost:{port}',
         protocolVersion='0.3.0',
         capabilities=AgentCapabilities(
-            streaming=False,
+            streaming=True,
             pushNotifications=False,
+            extensions=[
+                AgentExtension(
+                    uri=RESPONSE_CACHE_EXTENSION,
+                    description='Per-skill response cache TTLs in seconds (0 = never cache)',
+                    params={'skills': {'recommend_destination': 3600, 'get_travel_tips': 3600, 'estimate_budget': 3600}},
+                ),
+            ],
         ),
         authentication={
             'schemes': [],
@@ -278,7 +326,7 @@ if __name__ == '__main__':
     # Create request handler
     request_handler = DefaultRequestHandler(
         agent_executor=TravelAgentExecutor(),
-        task_store=InMemoryTaskStore(),
+        task_store=create_task_store('travel_agent'),  # SQLite behind an LRU, shared by every worker (TASK_STORE)
     )
     
     # Create A2A server application
@@ -287,10 +335,19 @@ if __name__ == '__main__':
         http_handler=request_handler,
     )
     
-    print("✈️  Travel Agent starting on http://localhost:5003")
-    print("📋 AgentCard: http://localhost:5003/.well-known/agent.json")
+    # Build the Starlette app with Prometheus metrics at /metrics
+    return instrument_app(server.build(), request_handler)
+
+
+if __name__ == '__main__':
+    configure_logging('travel_agent')
+    port = agent_port('travel_agent', 5003)
+    
+    logger.info("✈️  Travel Agent starting on http://localhost:%d", port)
+    logger.info("📋 AgentCard: http://localhost:%d/.well-known/agent.json", port)
+    logger.info("📈 Metrics: http://localhost:%d/metrics", port)
     
-    # Start server
-    uvicorn.run(server.build(), host='0.0.0.0', port=5003)
+    # Start server (TRAVEL_AGENT_WORKERS or WORKERS worker processes)
+    serve('travel_agent', create_app, default_port=5003)
 
 # Made with Bob
@@ -0,0 +1,6 @@
+"""Code shared by the orchestrator, the agents and the scripts
+
+Agents import it by putting the repository root on sys.path. The email agent
+is also deployed on its own (Railway root directory email-agent/), so it
+treats this package as optional and runs without it.
+"""
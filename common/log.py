@@ -0,0 +1,255 @@
+"""Structured, non-blocking logging for the orchestrator, the agents and the scripts
+
+configure_logging() routes the standard logging tree through a bounded queue:
+callers only append the record (message formatting is deferred too), and a
+background thread formats and writes it. When the queue is full, records are
+dropped and counted instead of blocking the event loop.
+
+Each line carries the service, logger, level, request id and, while a trace
+span is active, its trace and span ids:
+
+    {"ts": "2026-01-01T12:00:00.000Z", "level": "info", "service": "orchestrator",
+     "logger": "orchestrator", "msg": "🎯 Matched 1 agent(s)", "request_id": "3f2a...",
+     "trace_id": "...", "span_id": "...", "agents": ["weather_agent"]}
+
+Per-request lines are sampled: request_context() decides once per request
+from a hash of its id (LOG_SAMPLE_RATE), so the orchestrator and the agents
+it forwards the X-Request-ID header to keep or drop the same requests.
+INFO/DEBUG records logged inside an unsampled request are dropped before
+they are queued; warnings and errors are always kept.
+
+Configured from the environment:
+
+    LOG_LEVEL        DEBUG, INFO (default), WARNING, ...
+    LOG_FORMAT       'json', 'text' (message only, like the old print output)
+                     or 'auto' (default: text on a terminal, JSON otherwise)
+    LOG_SAMPLE_RATE  Fraction of requests whose INFO/DEBUG lines are kept
+    LOG_QUEUE_SIZE   Records buffered for the writer thread
+"""
+import atexit
+import contextvars
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import time
+import zlib
+from contextlib import contextmanager
+from uuid import uuid4
+
+from common.tracing import current_span
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "auto").lower()  # 'json', 'text' or 'auto'
+LOG_SAMPLE_RATE = float(os.getenv("LOG_SAMPLE_RATE", "1.0"))
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+
+REQUEST_ID_HEADER = "x-request-id"
+
+# Loggers whose INFO/DEBUG records are per-request lines emitted outside any
+# request_context (sampled record by record)
+SAMPLED_LOGGERS = frozenset({"uvicorn.access"})
+
+# Third-party loggers that log every HTTP request or connection event; kept at
+# WARNING so LOG_LEVEL=DEBUG shows this repo's lines, not the client's internals
+QUIET_LOGGERS = ("httpx", "httpcore", "hpack", "asyncio", "a2a.client.card_resolver")
+
+_request_id = contextvars.ContextVar("request_id", default=None)
+_sampled = contextvars.ContextVar("log_sampled", default=None)  # None outside a request
+
+# Attributes of every LogRecord; anything else was passed in extra= and is
+# emitted as a structured field
+_RECORD_ATTRIBUTES = frozenset(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {
+    "message", "asctime", "request_id", "trace_id", "span_id", "taskName",
+    "color_message",  # uvicorn's ANSI-coloured copy of msg
+}
+
+_listener = None
+_handler = None
+
+
+def new_request_id():
+    return uuid4().hex[:16]
+
+
+def current_request_id():
+    return _request_id.get()
+
+
+def is_sampled(request_id):
+    """Whether a request's INFO/DEBUG lines are kept (same answer in every process)"""
+    if LOG_SAMPLE_RATE >= 1.0:
+        return True
+    return zlib.crc32(request_id.encode()) / 2**32 < LOG_SAMPLE_RATE
+
+
+@contextmanager
+def request_context(request_id=None):
+    """Tag log records in the block with a request id and sample its lines
+
+    Args:
+        request_id: Id to reuse (e.g. from an X-Request-ID header); defaults
+                    to the enclosing request's id, or a new one
+
+    Yields:
+        The request id
+    """
+    request_id = request_id or _request_id.get() or new_request_id()
+    sampled = is_sampled(request_id)
+    id_token = _request_id.set(request_id)
+    sampled_token = _sampled.set(sampled)
+    try:
+        yield request_id
+    finally:
+        _sampled.reset(sampled_token)
+        _request_id.reset(id_token)
+
+
+def log_enabled(logger, level=logging.INFO):
+    """Whether a record at level would be kept here; guards costly log arguments"""
+    if level < logging.WARNING and _sampled.get() is False:
+        return False
+    return logger.isEnabledFor(level)
+
+
+def inject_request_id(headers: dict):
+    """Add the current request id header, if any (returns headers)"""
+    request_id = _request_id.get()
+    if request_id is not None:
+        headers[REQUEST_ID_HEADER] = request_id
+    return headers
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record, extra= fields included"""
+
+    def __init__(self, service):
+        super().__init__()
+        self.service = service
+
+    def format(self, record):
+        entry = {
+            'ts': time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created)) + f".{int(record.msecs):03d}Z",
+            'level': record.levelname.lower(),
+            'service': self.service,
+            'logger': record.name,
+            'msg': record.getMessage(),
+        }
+        for key in ('request_id', 'trace_id', 'span_id'):
+            value = getattr(record, key, None)
+            if value:
+                entry[key] = value
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRIBUTES and not key.startswith('_'):
+                entry[key] = value
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class TextFormatter(logging.Formatter):
+    """The message alone, as the print-based output looked; tracebacks appended"""
+
+    def __init__(self):
+        super().__init__("%(message)s")
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """Non-blocking, sampling queue handler
+
+    Records are captured with the caller's request and trace ids but are not
+    formatted here; the listener thread does that.
+    """
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def filter(self, record):
+        if record.levelno < logging.WARNING:
+            sampled = _sampled.get()
+            if sampled is None and record.name in SAMPLED_LOGGERS:
+                sampled = LOG_SAMPLE_RATE >= 1.0 or random.random() < LOG_SAMPLE_RATE
+            if sampled is False:
+                return False
+        return super().filter(record)
+
+    def prepare(self, record):
+        record.request_id = _request_id.get()
+        context = current_span().context
+        if context is not None:
+            record.trace_id = context.trace_id
+            record.span_id = context.span_id
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def configure_logging(service, level=LOG_LEVEL, fmt=LOG_FORMAT, stream=None, use_queue=True):
+    """Route all logging through the structured handler (call once per process)
+
+    Args:
+        service: Process role reported on every JSON line (e.g. 'weather_agent')
+        fmt: 'json', 'text' or 'auto' (text when stream is a terminal)
+        stream: Output stream (default: stdout)
+        use_queue: Write from a background thread; CLI scripts pass False so
+                   log lines stay in order with their printed reports
+    """
+    global _listener, _handler
+    stream = stream or sys.stdout
+    if fmt == "auto":
+        fmt = "text" if stream.isatty() else "json"
+
+    output = logging.StreamHandler(stream)
+    output.setFormatter(JsonFormatter(service) if fmt == "json" else TextFormatter())
+
+    shutdown_logging()
+    if use_queue:
+        log_queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+        _handler = _QueueHandler(log_queue)
+        _listener = logging.handlers.QueueListener(log_queue, output, respect_handler_level=False)
+        _listener.start()
+    else:
+        _handler = output
+
+    root = logging.getLogger()
+    root.handlers[:] = [_handler]
+    root.setLevel(level)
+    for name in QUIET_LOGGERS:
+        logging.getLogger(name).setLevel(logging.WARNING)
+    return _handler
+
+
+def flush_logs():
+    """Wait until queued records have been written"""
+    if _listener is not None:
+        _listener.queue.join()
+
+
+def dropped_records():
+    """Records dropped because the log queue was full"""
+    return getattr(_handler, 'dropped', 0)
+
+
+def shutdown_logging():
+    """Drain the queue and stop the writer thread (registered at exit)"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+        if dropped_records():
+            sys.stderr.write(f"⚠️  {dropped_records()} log records dropped (log queue full)\n")
+
+
+def get_logger(name):
+    return logging.getLogger(name)
+
+
+atexit.register(shutdown_logging)
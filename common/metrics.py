@@ -0,0 +1,314 @@
+"""Prometheus metrics for the agent servers
+
+instrument_app() mounts a pure-ASGI middleware and a GET /metrics route
+(Prometheus text format 0.0.4) on an agent's Starlette app:
+
+    a2a_http_requests_total{path,method,status}    Counter
+    a2a_http_request_duration_seconds{path}        Histogram (full response, streams included)
+    a2a_http_requests_in_flight                    Gauge
+    a2a_skill_requests_total{skill,outcome}        Counter
+    a2a_skill_duration_seconds{skill}              Histogram (AgentExecutor skill handler)
+    a2a_running_tasks                              Gauge, tasks executing in the request handler
+    a2a_event_queues / a2a_event_queue_depth       Gauges, open event queues and events waiting in them
+    a2a_task_store_tasks                           Gauge, tasks held by the task store (SQLite: recounted
+                                                   off the event loop every TASK_COUNT_INTERVAL)
+
+Executors label skill work with track_skill(). Request-handler and task-store
+gauges are read when /metrics is scraped, so they cost nothing per request.
+Metrics are per process: with several workers, each scrape reports the
+worker that answered it (the task-store gauge of a shared store excepted).
+No prometheus_client dependency; parse_metrics() and histogram_quantile()
+let the Streamlit dashboard read the same endpoint.
+"""
+import bisect
+import math
+import re
+import time
+from contextlib import contextmanager
+
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _format_value(value):
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _label_text(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    pairs += [f'{name}="{_escape(value)}"' for name, value in extra]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    """Monotonic count per label combination"""
+
+    type = "counter"
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.values = {}  # {label values: count}
+
+    def inc(self, *labels, amount=1):
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+    def samples(self):
+        for labels, value in self.values.items():
+            yield self.name, _label_text(self.labelnames, labels), value
+
+
+class Gauge:
+    """Current value, either set directly or read from a callback at scrape time"""
+
+    type = "gauge"
+
+    def __init__(self, name, help):
+        self.name = name
+        self.help = help
+        self.value = 0
+        self.function = None
+
+    def inc(self, amount=1):
+        self.value += amount
+
+    def dec(self, amount=1):
+        self.value -= amount
+
+    def set(self, value):
+        self.value = value
+
+    def set_function(self, function):
+        """Report function() instead of the stored value"""
+        self.function = function
+
+    def samples(self):
+        value = self.value
+        if self.function is not None:
+            try:
+                value = self.function()
+            except Exception:
+                return  # A broken collector must not break the scrape
+        yield self.name, "", value
+
+
+class Histogram:
+    """Cumulative bucket counts, sum and count per label combination"""
+
+    type = "histogram"
+
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self.values = {}  # {label values: [bucket counts..., sum, count]}
+
+    def observe(self, value, *labels):
+        series = self.values.get(labels)
+        if series is None:
+            series = self.values[labels] = [0] * (len(self.buckets) + 2)
+        # Non-cumulative per bucket (le is inclusive); made cumulative when
+        # rendered. Values above the last bound only count towards +Inf.
+        index = bisect.bisect_left(self.buckets, value)
+        if index < len(self.buckets):
+            series[index] += 1
+        series[-2] += value
+        series[-1] += 1
+
+    def samples(self):
+        for labels, series in self.values.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                yield f"{self.name}_bucket", _label_text(self.labelnames, labels, [("le", _format_value(bound))]), cumulative
+            yield f"{self.name}_bucket", _label_text(self.labelnames, labels, [("le", "+Inf")]), series[-1]
+            yield f"{self.name}_sum", _label_text(self.labelnames, labels), series[-2]
+            yield f"{self.name}_count", _label_text(self.labelnames, labels), series[-1]
+
+
+class MetricsRegistry:
+    """The metrics of one agent process, rendered in Prometheus text format"""
+
+    def __init__(self):
+        self.metrics = []
+        self.http_requests = self._add(Counter(
+            "a2a_http_requests_total", "HTTP requests by path, method and status", ("path", "method", "status")))
+        self.http_duration = self._add(Histogram(
+            "a2a_http_request_duration_seconds", "HTTP request duration including streamed responses", ("path",)))
+        self.http_in_flight = self._add(Gauge(
+            "a2a_http_requests_in_flight", "HTTP requests currently being served"))
+        self.skill_requests = self._add(Counter(
+            "a2a_skill_requests_total", "Skill executions by outcome", ("skill", "outcome")))
+        self.skill_duration = self._add(Histogram(
+            "a2a_skill_duration_seconds", "Time spent in the skill handler", ("skill",)))
+        self.running_tasks = self._add(Gauge(
+            "a2a_running_tasks", "Tasks currently executing in the request handler"))
+        self.event_queues = self._add(Gauge(
+            "a2a_event_queues", "Open task event queues"))
+        self.event_queue_depth = self._add(Gauge(
+            "a2a_event_queue_depth", "Events waiting in task event queues"))
+        self.task_store_tasks = self._add(Gauge(
+            "a2a_task_store_tasks", "Tasks held by the task store"))
+
+    def _add(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{labels} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+
+@contextmanager
+def track_skill(skill_id, registry=REGISTRY):
+    """Count and time one skill execution (outcome 'error' if it raises)"""
+    skill = skill_id or "none"
+    started = time.perf_counter()
+    outcome = "error"
+    try:
+        yield
+        outcome = "ok"
+    finally:
+        registry.skill_duration.observe(time.perf_counter() - started, skill)
+        registry.skill_requests.inc(skill, outcome)
+
+
+class MetricsMiddleware:
+    """ASGI middleware counting and timing HTTP requests
+
+    Paths outside the app's routes are reported as 'other' to keep label
+    cardinality bounded.
+    """
+
+    def __init__(self, app, registry=REGISTRY, paths=()):
+        self.app = app
+        self.registry = registry
+        self.paths = frozenset(paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500  # Reported if the app fails before responding
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        registry = self.registry
+        path = scope["path"] if scope["path"] in self.paths else "other"
+        registry.http_in_flight.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            registry.http_in_flight.dec()
+            registry.http_duration.observe(time.perf_counter() - started, path)
+            registry.http_requests.inc(path, scope["method"], str(status))
+
+
+def instrument_app(app, request_handler=None, registry=REGISTRY):
+    """Mount MetricsMiddleware and GET /metrics on a built Starlette app
+
+    Args:
+        request_handler: The app's DefaultRequestHandler; its running tasks,
+                         event queues and task store are reported at scrape time
+    """
+    from starlette.responses import Response
+    from starlette.routing import Route
+
+    if request_handler is not None:
+        queue_manager = getattr(request_handler, "_queue_manager", None)
+        queues = getattr(queue_manager, "_task_queue", None)
+        running = getattr(request_handler, "_running_agents", None)
+        if running is not None:
+            registry.running_tasks.set_function(lambda: len(running))
+        if queues is not None:
+            registry.event_queues.set_function(lambda: len(queues))
+            registry.event_queue_depth.set_function(
+                lambda: sum(
+                    queue.queue.qsize() for queue in list(queues.values()) if getattr(queue, "queue", None) is not None
+                )
+            )
+        # InMemoryTaskStore keeps its tasks in a dict; SqliteTaskStore keeps a
+        # row count refreshed off the event loop (never a query per scrape)
+        task_store = getattr(request_handler, "task_store", None)
+        if hasattr(task_store, "task_count"):
+            registry.task_store_tasks.set_function(lambda: task_store.task_count)
+        elif isinstance(getattr(task_store, "tasks", None), dict):
+            registry.task_store_tasks.set_function(lambda: len(task_store.tasks))
+
+    async def metrics_endpoint(request):
+        return Response(registry.render(), media_type=CONTENT_TYPE)
+
+    app.routes.append(Route("/metrics", metrics_endpoint, methods=["GET"]))
+    app.add_middleware(
+        MetricsMiddleware,
+        registry=registry,
+        paths=[route.path for route in app.routes if hasattr(route, "path")],
+    )
+    return app
+
+
+# ---------------------------------------------------------------------------
+# Reading /metrics (Streamlit dashboard)
+# ---------------------------------------------------------------------------
+
+_SAMPLE = re.compile(r'^([a-zA-Z_:][a-zA-Z0-9_:]*)(?:\{(.*)\})?\s+(\S+)$')
+_LABEL = re.compile(r'([a-zA-Z_][a-zA-Z0-9_]*)="((?:[^"\\]|\\.)*)"')
+
+
+def parse_metrics(text):
+    """Samples of a Prometheus text exposition as [(name, {label: value}, value)]"""
+    samples = []
+    for line in text.splitlines():
+        if not line or line.startswith("#"):
+            continue
+        match = _SAMPLE.match(line.strip())
+        if match:
+            name, labels, value = match.groups()
+            samples.append((name, dict(_LABEL.findall(labels or "")), float(value)))
+    return samples
+
+
+def histogram_quantile(q, buckets):
+    """Estimate the q-quantile (0-1) from cumulative [(upper_bound, count)] buckets
+
+    Interpolates linearly within the bucket holding the rank, like
+    Prometheus; None without observations.
+    """
+    buckets = sorted(buckets)
+    if not buckets or buckets[-1][1] == 0:
+        return None
+    rank = q * buckets[-1][1]
+    lower_bound, lower_count = 0.0, 0
+    for upper_bound, count in buckets:
+        if count >= rank:
+            if upper_bound == math.inf:
+                return lower_bound
+            if count == lower_count:
+                return upper_bound
+            return lower_bound + (upper_bound - lower_bound) * (rank - lower_count) / (count - lower_count)
+        lower_bound, lower_count = upper_bound, count
+    return buckets[-1][0]
@@ -0,0 +1,15 @@
+"""Streamed replies for the agent executors (stream_reply, RESPONSE_CACHE_EXTENSION)
+
+The code lives in email-agent/reply.py, which the email agent needs when it is
+deployed on its own; this module loads it for the other agents.
+"""
+import importlib.util
+import os
+
+_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'email-agent', 'reply.py')
+_spec = importlib.util.spec_from_file_location('agent_reply', _PATH)
+_module = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(_module)
+
+RESPONSE_CACHE_EXTENSION = _module.RESPONSE_CACHE_EXTENSION
+stream_reply = _module.stream_reply
@@ -0,0 +1,103 @@
+"""Launcher for the agent servers: N uvicorn workers, graceful reload, per-agent env config
+
+Each agent script defines create_app(), which builds its Starlette app, and
+hands it to serve():
+
+    if __name__ == '__main__':
+        configure_logging('weather_agent')
+        serve('weather_agent', create_app, default_port=5001)
+
+Settings come from the environment, the agent-specific variable first
+(WEATHER_AGENT_WORKERS, then WORKERS):
+
+    <AGENT>_PORT / PORT          Listening port
+    <AGENT>_HOST / HOST          Bind address (default 0.0.0.0)
+    <AGENT>_WORKERS / WORKERS    Worker processes (default 1: the app runs in-process)
+    <AGENT>_RELOAD / RELOAD      Restart on source changes (development, one worker)
+    GRACEFUL_TIMEOUT             Seconds in-flight requests get to finish on shutdown or reload
+
+With several workers, uvicorn's supervisor shares the listening socket
+between the worker processes, and SIGHUP reloads them gracefully: each worker
+is replaced by a new one that is up before the old one drains, so the port
+never stops serving. SIGTTIN / SIGTTOU add or remove a worker.
+
+Workers do not share memory, so state that must be consistent across them
+lives in a shared backend (common/task_store.py, the email agent's store).
+"""
+import importlib.util
+import inspect
+import os
+import sys
+
+GRACEFUL_TIMEOUT = float(os.getenv("GRACEFUL_TIMEOUT", "10.0"))
+
+# Passed to worker processes through the environment
+_FACTORY_ENV = "A2A_AGENT_FACTORY"  # <script path>:<factory name>
+_SERVICE_ENV = "A2A_AGENT_SERVICE"
+
+
+def agent_env(service, name, default=None):
+    """<SERVICE>_<NAME> if set, else <NAME>, else default"""
+    value = os.getenv(f"{service.upper()}_{name}")
+    if value is None:
+        value = os.getenv(name)
+    return default if value is None or value == "" else value
+
+
+def agent_port(service, default_port):
+    return int(agent_env(service, "PORT", default_port))
+
+
+def agent_workers(service):
+    return max(1, int(agent_env(service, "WORKERS", 1)))
+
+
+def serve(service, create_app, default_port):
+    """Run create_app() under uvicorn with the agent's configured workers
+
+    Args:
+        service: Agent name; prefixes its environment variables
+        create_app: Module-level factory returning the Starlette app (run
+                    once per worker process)
+        default_port: Port when neither <AGENT>_PORT nor PORT is set
+    """
+    import uvicorn
+
+    options = {
+        'host': agent_env(service, "HOST", "0.0.0.0"),
+        'port': agent_port(service, default_port),
+        'log_config': None,  # uvicorn logs through configure_logging
+        'timeout_graceful_shutdown': GRACEFUL_TIMEOUT,
+    }
+    workers = agent_workers(service)
+    reload = agent_env(service, "RELOAD", "false").lower() == "true"
+    if workers == 1 and not reload:
+        uvicorn.run(create_app(), **options)
+        return
+
+    # Worker processes import the app by name: they rebuild it from the
+    # script's factory through worker_app()
+    os.environ[_FACTORY_ENV] = f"{os.path.abspath(inspect.getfile(create_app))}:{create_app.__name__}"
+    os.environ[_SERVICE_ENV] = service
+    if reload:
+        options['reload_dirs'] = [os.path.dirname(os.environ[_FACTORY_ENV].rsplit(":", 1)[0])]
+    else:
+        options['workers'] = workers
+    uvicorn.run("common.server:worker_app", factory=True, reload=reload, **options)
+
+
+def worker_app():
+    """App factory run in each worker process: set up logging, then build the agent's app"""
+    from common.log import configure_logging
+
+    path, name = os.environ[_FACTORY_ENV].rsplit(":", 1)
+    configure_logging(os.environ[_SERVICE_ENV])
+
+    # Reuse the script when the worker already ran it as its main module
+    module = sys.modules.get("__mp_main__")
+    if getattr(module, "__file__", None) is None or os.path.abspath(module.__file__) != path:
+        spec = importlib.util.spec_from_file_location("a2a_agent_app", path)
+        module = importlib.util.module_from_spec(spec)
+        sys.path.insert(0, os.path.dirname(path))
+        spec.loader.exec_module(module)
+    return getattr(module, name)()
@@ -0,0 +1,277 @@
+"""Task stores for the agents' DefaultRequestHandler
+
+InMemoryTaskStore keeps every task in process memory, forever, and loses them
+all on restart. The agents keep their tasks in SqliteTaskStore instead: one
+row per task in a SQLite file (WAL mode), so memory stays flat under
+sustained traffic, a restart reopens the file without loading anything, and
+every worker and replica of the agent (common/server.py) sees the same tasks.
+
+In front of the file:
+
+- a bounded LRU of recently used tasks answers most reads without a query;
+- saves are written behind in batches: the first queued save wakes the
+  flush loop, which lets more join for TASK_FLUSH_INTERVAL seconds (or until
+  TASK_WRITE_BATCH are waiting) and commits them in one transaction; with
+  nothing queued it sleeps, and everything left is flushed at exit;
+- rows not updated for TASK_TTL seconds are swept out periodically, after a
+  flush.
+
+Configured per agent, the agent-specific variable first
+(WEATHER_AGENT_TASK_TTL, then TASK_TTL):
+
+    <AGENT>_TASK_STORE / TASK_STORE           'sqlite' (default) or 'memory' (unbounded)
+    <AGENT>_TASK_DB / TASK_DB                 SQLite file (default: data/<agent>_tasks.db)
+    <AGENT>_TASK_CACHE_SIZE / TASK_CACHE_SIZE Tasks kept in the LRU (default 1024 with
+                                              one worker, 0 with several: another worker
+                                              may update a cached task)
+    <AGENT>_TASK_FLUSH_INTERVAL / ...         Seconds a save may wait to be batched
+                                              (default 0.05; 0 writes every save through)
+    <AGENT>_TASK_WRITE_BATCH / ...            Queued saves that trigger an early flush
+    <AGENT>_TASK_TTL / TASK_TTL               Seconds a task is kept after its last update
+                                              (default one day; 0 keeps tasks forever)
+
+A save is visible at once in its own worker, and in the others once flushed;
+a crash loses at most the last flush interval. Event queues stay per worker:
+a stream can only be resubscribed on the worker that runs the task.
+"""
+import asyncio
+import atexit
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from a2a.server.tasks import InMemoryTaskStore, TaskStore
+from a2a.types import Task
+
+from common.server import agent_env, agent_workers
+
+DATA_DIR = os.getenv(
+    "DATA_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data"),
+)
+SQLITE_BUSY_TIMEOUT = float(os.getenv("SQLITE_BUSY_TIMEOUT", "5.0"))  # Seconds a writer waits for another worker's lock
+TASK_SWEEP_INTERVAL = float(os.getenv("TASK_SWEEP_INTERVAL", "60.0"))  # Seconds between TTL sweeps
+TASK_COUNT_INTERVAL = float(os.getenv("TASK_COUNT_INTERVAL", "5.0"))  # Seconds between row counts for /metrics
+
+logger = logging.getLogger("task_store")
+
+_DELETED = None  # Queued write that deletes the row
+
+
+class SqliteTaskStore(TaskStore):
+    """Tasks as JSON rows in a SQLite file, behind an LRU and a write-behind queue
+
+    Queries run in a worker thread (one connection per thread), so a worker
+    waiting for another's write lock never blocks the event loop.
+    """
+
+    def __init__(self, path, cache_size=1024, flush_interval=0.05, write_batch=256, ttl=86400.0):
+        self.path = path
+        self.cache_size = cache_size
+        self.flush_interval = flush_interval
+        self.write_batch = write_batch
+        self.ttl = ttl
+        self._cache = OrderedDict()  # task_id -> Task, least recently used first
+        self._pending = {}  # task_id -> JSON (or _DELETED) waiting for the next flush
+        self._flushing = {}  # The batch being committed right now
+        self._flush_lock = asyncio.Lock()
+        self._wake = asyncio.Event()
+        self._flusher = None
+        self._next_sweep = 0.0
+        self._next_count = 0.0
+        self._local = threading.local()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        connection = self._connection()
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS tasks (id TEXT PRIMARY KEY, data TEXT NOT NULL, updated_at REAL NOT NULL)"
+        )
+        connection.execute("CREATE INDEX IF NOT EXISTS tasks_updated_at ON tasks (updated_at)")
+        # Rows in the file (every worker's), recounted off the event loop by the
+        # flush loop, so a /metrics scrape never waits on another worker's lock
+        self.task_count = self._count()
+        atexit.register(self._flush_at_exit)
+
+    def _connection(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=SQLITE_BUSY_TIMEOUT, isolation_level=None)
+            connection.execute("PRAGMA synchronous=NORMAL")  # WAL: durable across crashes, no fsync per commit
+            self._local.connection = connection
+        return connection
+
+    # SQLite (worker thread)
+
+    def _write(self, batch):
+        """Commit a batch of queued saves and deletes in one transaction"""
+        now = time.time()
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            connection.executemany(
+                "INSERT INTO tasks (id, data, updated_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(id) DO UPDATE SET data = excluded.data, updated_at = excluded.updated_at",
+                [(task_id, data, now) for task_id, data in batch.items() if data is not _DELETED],
+            )
+            connection.executemany(
+                "DELETE FROM tasks WHERE id = ?",
+                [(task_id,) for task_id, data in batch.items() if data is _DELETED],
+            )
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+
+    def _get(self, task_id):
+        row = self._connection().execute("SELECT data FROM tasks WHERE id = ?", (task_id,)).fetchone()
+        return row[0] if row else None
+
+    def _count(self):
+        return self._connection().execute("SELECT COUNT(*) FROM tasks").fetchone()[0]
+
+    def _sweep(self):
+        """Delete tasks not updated within the TTL; returns how many"""
+        cursor = self._connection().execute("DELETE FROM tasks WHERE updated_at < ?", (time.time() - self.ttl,))
+        return cursor.rowcount
+
+    # LRU
+
+    def _cache_get(self, task_id):
+        task = self._cache.get(task_id)
+        if task is not None:
+            self._cache.move_to_end(task_id)
+        return task
+
+    def _cache_put(self, task):
+        if self.cache_size <= 0:
+            return
+        self._cache[task.id] = task
+        self._cache.move_to_end(task.id)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    # Write-behind
+
+    def _queue(self, task_id, data):
+        starting = not self._pending
+        self._pending[task_id] = data
+        if starting or len(self._pending) >= self.write_batch:
+            self._wake.set()  # Start a batch, or end a full one early
+        if self._flusher is None or self._flusher.done():
+            self._flusher = asyncio.get_running_loop().create_task(self._flush_loop())
+
+    async def _flush_loop(self):
+        """Commit queued saves in batches, and sweep expired tasks
+
+        Sleeps until a save is queued; the flush interval only batches the
+        saves that follow it.
+        """
+        while True:
+            if not self._pending:
+                await self._wake.wait()
+            self._wake.clear()
+            if len(self._pending) < self.write_batch:
+                try:
+                    await asyncio.wait_for(self._wake.wait(), self.flush_interval)
+                except asyncio.TimeoutError:
+                    pass
+                self._wake.clear()
+            try:
+                await self.flush()
+                if self.ttl > 0 and time.monotonic() >= self._next_sweep:
+                    self._next_sweep = time.monotonic() + TASK_SWEEP_INTERVAL
+                    swept = await asyncio.to_thread(self._sweep)
+                    if swept:
+                        logger.info("🧹 Evicted %d expired task(s) from %s", swept, self.path,
+                                    extra={'evicted': swept})
+                await self._refresh_count()
+            except sqlite3.Error:
+                logger.exception("❌ Task store flush failed (%d task(s) queued)", len(self._pending))
+
+    async def flush(self):
+        """Commit every queued save now"""
+        async with self._flush_lock:
+            if not self._pending:
+                return
+            self._flushing, self._pending = self._pending, {}
+            try:
+                await asyncio.to_thread(self._write, self._flushing)
+            except BaseException:
+                # Keep the batch (under any newer saves) for the next attempt
+                self._pending = {**self._flushing, **self._pending}
+                raise
+            finally:
+                self._flushing = {}
+
+    async def _refresh_count(self):
+        """Recount the rows in a worker thread, at most every TASK_COUNT_INTERVAL"""
+        if time.monotonic() >= self._next_count:
+            self._next_count = time.monotonic() + TASK_COUNT_INTERVAL
+            self.task_count = await asyncio.to_thread(self._count)
+
+    def _flush_at_exit(self):
+        batch = {**self._flushing, **self._pending}
+        if batch:
+            self._write(batch)
+            self._pending = {}
+
+    # TaskStore
+
+    async def save(self, task, context=None):
+        data = task.model_dump_json(exclude_none=True)  # Snapshot now: the handler keeps mutating task
+        self._cache_put(task)
+        if self.flush_interval <= 0:
+            await asyncio.to_thread(self._write, {task.id: data})
+            await self._refresh_count()
+        else:
+            self._queue(task.id, data)
+
+    async def get(self, task_id, context=None):
+        task = self._cache_get(task_id)
+        if task is not None:
+            return task
+        for queued in (self._pending, self._flushing):
+            if task_id in queued:
+                data = queued[task_id]
+                break
+        else:
+            data = await asyncio.to_thread(self._get, task_id)
+        if data is _DELETED:
+            return None
+        task = Task.model_validate_json(data)
+        self._cache_put(task)
+        return task
+
+    async def delete(self, task_id, context=None):
+        self._cache.pop(task_id, None)
+        if self.flush_interval <= 0:
+            await asyncio.to_thread(self._write, {task_id: _DELETED})
+            await self._refresh_count()
+        else:
+            self._queue(task_id, _DELETED)
+
+    def __len__(self):
+        """Rows in the file right now (a blocking query; /metrics reads task_count)"""
+        return self._count()
+
+
+def create_task_store(service):
+    """The task store configured for an agent (see module docstring)"""
+    kind = agent_env(service, "TASK_STORE", "sqlite").lower()
+    if kind == "memory":
+        return InMemoryTaskStore()
+    if kind == "sqlite":
+        workers = agent_workers(service)
+        return SqliteTaskStore(
+            agent_env(service, "TASK_DB", os.path.join(DATA_DIR, f"{service}_tasks.db")),
+            cache_size=int(agent_env(service, "TASK_CACHE_SIZE", 1024 if workers == 1 else 0)),
+            flush_interval=float(agent_env(service, "TASK_FLUSH_INTERVAL", 0.05)),
+            write_batch=int(agent_env(service, "TASK_WRITE_BATCH", 256)),
+            ttl=float(agent_env(service, "TASK_TTL", 86400.0)),
+        )
+    raise ValueError(f"Unknown TASK_STORE for {service}: {kind!r} (expected 'sqlite' or 'memory')")
@@ -0,0 +1,376 @@
+"""Lightweight distributed tracing for the orchestrator and the agents
+
+Spans follow the OpenTelemetry data model and propagate between processes in
+a W3C `traceparent` header, so one trace covers a query from
+Orchestrator.route_query through the JSON-RPC call into the agent's
+AgentExecutor.execute. No collector or network is needed: finished spans go
+to a JSON-lines file (one span per line, shared by every local process) or to
+an in-memory collector for tests and benchmarks.
+
+    tracer = get_tracer('orchestrator')
+    with tracer.start_as_current_span('route_query', attributes={'query': query}) as span:
+        headers = inject({})  # traceparent of the current span
+        ...
+
+    # Agent side
+    with tracer.start_as_current_span('agent.execute', kind=SERVER, parent=extract(headers)):
+        ...
+
+Configured from the environment:
+
+    TRACE_EXPORTER      'none' (default), 'file' or 'memory'
+    TRACE_FILE          JSON-lines file for the 'file' exporter
+    TRACE_SAMPLE_RATIO  Fraction of new traces recorded (agents follow the caller)
+
+When tracing is off, spans are a shared no-op object and nothing is
+propagated, so instrumented code costs a couple of microseconds per span.
+"""
+import atexit
+import contextvars
+import json
+import os
+import random
+import re
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+TRACE_EXPORTER = os.getenv("TRACE_EXPORTER", "none").lower()  # 'none', 'file' or 'memory'
+TRACE_FILE = os.getenv(
+    "TRACE_FILE",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "logs", "traces.jsonl"),
+)
+TRACE_SAMPLE_RATIO = float(os.getenv("TRACE_SAMPLE_RATIO", "1.0"))
+TRACE_FLUSH_SPANS = int(os.getenv("TRACE_FLUSH_SPANS", "256"))  # File exporter buffer size
+TRACE_FLUSH_INTERVAL = float(os.getenv("TRACE_FLUSH_INTERVAL", "1.0"))  # Max seconds a span sits in the buffer
+TRACE_MEMORY_SPANS = int(os.getenv("TRACE_MEMORY_SPANS", "10000"))  # Spans kept by the in-memory collector
+
+# Span kinds
+INTERNAL = "internal"
+SERVER = "server"
+CLIENT = "client"
+
+TRACEPARENT_HEADER = "traceparent"
+_TRACEPARENT = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+
+_current_span = contextvars.ContextVar("current_span", default=None)
+
+
+class SpanContext:
+    """Identity of a span that crosses process boundaries"""
+
+    __slots__ = ("trace_id", "span_id", "sampled")
+
+    def __init__(self, trace_id: str, span_id: str, sampled: bool = True):
+        self.trace_id = trace_id
+        self.span_id = span_id
+        self.sampled = sampled
+
+    def traceparent(self):
+        return f"00-{self.trace_id}-{self.span_id}-{'01' if self.sampled else '00'}"
+
+    def __repr__(self):
+        return f"SpanContext({self.traceparent()})"
+
+
+class Span:
+    """A timed operation; recorded spans are exported when they end"""
+
+    __slots__ = ("name", "context", "parent_id", "kind", "service", "attributes",
+                 "start_ns", "end_ns", "status", "error", "_start_perf")
+
+    def __init__(self, name, context, parent_id, kind, service, attributes=None):
+        self.name = name
+        self.context = context
+        self.parent_id = parent_id
+        self.kind = kind
+        self.service = service
+        self.attributes = dict(attributes) if attributes else {}
+        self.start_ns = time.time_ns()
+        self._start_perf = time.perf_counter_ns()
+        self.end_ns = None
+        self.status = "ok"
+        self.error = None
+
+    @property
+    def recording(self):
+        return self.context.sampled
+
+    def set_attribute(self, key, value):
+        self.attributes[key] = value
+
+    def set_attributes(self, attributes):
+        self.attributes.update(attributes)
+
+    def set_error(self, error):
+        """Mark the span failed; error is an exception or a message"""
+        self.status = "error"
+        self.error = f"{type(error).__name__}: {error}" if isinstance(error, BaseException) else str(error)
+
+    def end(self):
+        """Finish the span and hand it to the exporter (idempotent)"""
+        if self.end_ns is not None:
+            return
+        # Wall-clock start plus a monotonic duration, so clock steps cannot
+        # produce negative spans
+        self.end_ns = self.start_ns + time.perf_counter_ns() - self._start_perf
+        if self.context.sampled:
+            _export(self)
+
+    @property
+    def duration_ms(self):
+        return None if self.end_ns is None else (self.end_ns - self.start_ns) / 1e6
+
+    def to_dict(self):
+        return {
+            'trace_id': self.context.trace_id,
+            'span_id': self.context.span_id,
+            'parent_span_id': self.parent_id,
+            'name': self.name,
+            'kind': self.kind,
+            'service': self.service,
+            'start_time_unix_nano': self.start_ns,
+            'end_time_unix_nano': self.end_ns,
+            'duration_ms': self.duration_ms,
+            'status': self.status,
+            'error': self.error,
+            'attributes': self.attributes,
+        }
+
+
+class _NoopSpan:
+    """Stand-in returned while tracing is off; every call does nothing"""
+
+    context = None
+    recording = False
+
+    def set_attribute(self, key, value):
+        pass
+
+    def set_attributes(self, attributes):
+        pass
+
+    def set_error(self, error):
+        pass
+
+    def end(self):
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class Tracer:
+    """Creates spans for one service (process role, e.g. 'orchestrator')"""
+
+    def __init__(self, service: str):
+        self.service = service
+
+    def start_span(self, name, kind=INTERNAL, attributes=None, parent=None):
+        """Start a span without making it current; the caller must end() it
+
+        Use this where the span outlives a single await chain, e.g. inside
+        an async generator whose steps run in the consumer's context.
+
+        Args:
+            parent: Span or SpanContext (e.g. from extract()); defaults to
+                    the current span, and a new trace starts without one
+        """
+        if _exporter is None:
+            return NOOP_SPAN
+        if parent is None:
+            parent = _current_span.get()
+        if isinstance(parent, (Span, _NoopSpan)):
+            parent = parent.context
+
+        if parent is None:
+            context = SpanContext(_new_id(16), _new_id(8), random.random() < TRACE_SAMPLE_RATIO)
+            parent_id = None
+        else:
+            context = SpanContext(parent.trace_id, _new_id(8), parent.sampled)
+            parent_id = parent.span_id
+        return Span(name, context, parent_id, kind, self.service, attributes)
+
+    @contextmanager
+    def start_as_current_span(self, name, kind=INTERNAL, attributes=None, parent=None):
+        """Start a span, make it current for the block and end it afterwards
+
+        An exception (including cancellation) escaping the block marks the
+        span failed and is re-raised.
+        """
+        span = self.start_span(name, kind, attributes, parent)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.set_error(e)
+            raise
+        finally:
+            _current_span.reset(token)
+            span.end()
+
+
+@contextmanager
+def use_span(span):
+    """Make an already started span current for the block without ending it"""
+    token = _current_span.set(span)
+    try:
+        yield span
+    finally:
+        _current_span.reset(token)
+
+
+def get_tracer(service: str):
+    return Tracer(service)
+
+
+def current_span():
+    """The active span, or the no-op span outside any span"""
+    return _current_span.get() or NOOP_SPAN
+
+
+def inject(headers: dict, span=None):
+    """Add the traceparent header for span (default: the current span)
+
+    Returns:
+        headers, for use inline in a request call
+    """
+    context = (span or current_span()).context
+    if context is not None:
+        headers[TRACEPARENT_HEADER] = context.traceparent()
+    return headers
+
+
+def extract(headers):
+    """SpanContext from a traceparent header, or None when absent or malformed"""
+    if not headers:
+        return None
+    value = headers.get(TRACEPARENT_HEADER)
+    match = _TRACEPARENT.match(value.strip().lower()) if value else None
+    if not match or match.group(1) == "0" * 32 or match.group(2) == "0" * 16:
+        return None
+    return SpanContext(match.group(1), match.group(2), bool(int(match.group(3), 16) & 1))
+
+
+def request_headers(request_context):
+    """HTTP headers of the A2A request behind an AgentExecutor's RequestContext"""
+    call_context = getattr(request_context, 'call_context', None)
+    if call_context is None:
+        return {}
+    return call_context.state.get('headers') or {}
+
+
+def _new_id(num_bytes):
+    return random.getrandbits(num_bytes * 8).to_bytes(num_bytes, 'big').hex()
+
+
+# ---------------------------------------------------------------------------
+# Exporters
+# ---------------------------------------------------------------------------
+
+class InMemorySpanExporter:
+    """In-process collector keeping the most recent finished spans"""
+
+    def __init__(self, max_spans=TRACE_MEMORY_SPANS):
+        self.spans = deque(maxlen=max_spans)
+
+    def export(self, span):
+        self.spans.append(span)
+
+    def get_finished_spans(self):
+        return list(self.spans)
+
+    def clear(self):
+        self.spans.clear()
+
+    def flush(self):
+        pass
+
+
+class FileSpanExporter:
+    """Appends finished spans to a JSON-lines file in batches
+
+    Spans are buffered and written with one append per batch (when the buffer
+    fills, every flush_interval seconds from a background thread, and at
+    exit), so several processes can share a file without interleaving lines
+    and the event loop rarely touches the disk.
+    """
+
+    def __init__(self, path=TRACE_FILE, flush_spans=TRACE_FLUSH_SPANS, flush_interval=TRACE_FLUSH_INTERVAL):
+        self.path = path
+        self.flush_spans = flush_spans
+        self.flush_interval = flush_interval
+        self.buffer = []
+        self.lock = threading.Lock()
+        self.flusher = None
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        atexit.register(self.flush)
+
+    def export(self, span):
+        with self.lock:
+            self.buffer.append(span)
+            if self.flusher is None:
+                self.flusher = threading.Thread(target=self._flush_periodically, name="span-flusher", daemon=True)
+                self.flusher.start()
+            if len(self.buffer) < self.flush_spans:
+                return
+            batch, self.buffer = self.buffer, []
+        self._write(batch)
+
+    def flush(self):
+        with self.lock:
+            batch, self.buffer = self.buffer, []
+        self._write(batch)
+
+    def _flush_periodically(self):
+        while True:
+            time.sleep(self.flush_interval)
+            self.flush()
+
+    def _write(self, batch):
+        if not batch:
+            return
+        data = "".join(json.dumps(span.to_dict(), default=str) + "\n" for span in batch)
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(data)
+
+
+_exporter = None
+
+
+def configure(exporter=TRACE_EXPORTER, path=TRACE_FILE):
+    """Select the span exporter: 'none', 'file', 'memory' or an exporter object
+
+    Returns:
+        The active exporter (None when tracing is off)
+    """
+    global _exporter
+    if _exporter is not None:
+        _exporter.flush()
+    if exporter == "file":
+        _exporter = FileSpanExporter(path)
+    elif exporter == "memory":
+        _exporter = InMemorySpanExporter()
+    elif exporter in (None, "none", ""):
+        _exporter = None
+    elif isinstance(exporter, str):
+        raise ValueError(f"Unknown TRACE_EXPORTER: {exporter!r} (expected 'none', 'file' or 'memory')")
+    else:
+        _exporter = exporter
+    return _exporter
+
+
+def get_exporter():
+    return _exporter
+
+
+def _export(span):
+    exporter = _exporter
+    if exporter is not None:
+        exporter.export(span)
+
+
+configure()
@@ -3,8 +3,9 @@
 Email Agent - Remote SaaS agent for A2A multi-agent system
 Demonstrates remote agent integration with Context Forge
 """
-import asyncio
+import logging
 import os
+from contextlib import asynccontextmanager
 import uvicorn
 from a2a.server.apps import A2AStarletteApplication
 from a2a.server.request_handlers import DefaultRequestHandler
@@ -13,10 +14,44 @@ from a2a.types import (
     AgentCard,
     AgentSkill,
     AgentCapabilities,
+    AgentExtension,
 )
 from agent_executor import EmailAgentExecutor
+from reply import RESPONSE_CACHE_EXTENSION
 
-if __name__ == '__main__':
+try:
+    # agent_executor puts the repository root on sys.path
+    from common.log import configure_logging
+    from common.metrics import instrument_app
+    from common.server import agent_port, serve
+    from common.task_store import create_task_store
+except ImportError:
+    # Deployed on its own (Railway): plain-text logs, no /metrics, one
+    # process with in-memory tasks
+    instrument_app = None
+    
+    def configure_logging(service):
+        logging.basicConfig(level=os.getenv('LOG_LEVEL', 'INFO').upper(), format='%(message)s')
+    
+    def agent_port(service, default_port):
+        return int(os.getenv('PORT', default_port))
+    
+    def create_task_store(service):
+        return InMemoryTaskStore()
+    
+    def serve(service, create_app, default_port):
+        uvicorn.run(create_app(), host='0.0.0.0', port=agent_port(service, default_port), log_config=None)
+
+logger = logging.getLogger('email_agent')
+
+def public_url():
+    """AgentCard URL: the Railway domain when deployed, localhost otherwise"""
+    railway_url = os.getenv('RAILWAY_PUBLIC_DOMAIN', '')
+    return f'https://{railway_url}' if railway_url else f'http://localhost:{agent_port("email_agent", 5004)}'
+
+
+def create_app():
+    """Build the email agent's Starlette app (once per worker process)"""
     # Define agent skills
     send_email_skill = AgentSkill(
         id='send_email',
@@ -54,10 +89,30 @@ if __name__ == '__main__':
         ],
     )
     
-    # Get port and URL from environment
-    port = int(os.getenv('PORT', '5004'))
-    railway_url = os.getenv('RAILWAY_PUBLIC_DOMAIN', '')
-    base_url = f'https://{railway_url}' if railway_url else f'http://localhost:{port}'
+    bulk_send_skill = AgentSkill(
+        id='bulk_send_email',
+        name='Bulk Send Email',
+        description='Send one email to many recipients in a single request, with per-recipient results and a summary',
+        tags=['email', 'bulk', 'campaign', 'send', 'batch'],
+        examples=[
+            'Bulk send email to a@example.com, b@example.com with subject Launch and message We are live',
+            'Send email to the team: ann@corp.com bob@corp.com with subject Standup and message 10am',
+        ],
+    )
+    
+    bulk_validate_skill = AgentSkill(
+        id='bulk_validate_email',
+        name='Bulk Validate Email',
+        description='Validate a list of email addresses at once, with per-address results and a summary',
+        tags=['email', 'bulk', 'validation', 'verify', 'list'],
+        examples=[
+            'Validate emails john@example.com, sarah@company.com, bad@',
+            'Bulk validate this list: a@gmail.com b@startup.io',
+        ],
+    )
+    
+    # Public URL from the environment (Railway domain or local port)
+    base_url = public_url()
     
     # Create Agent Card
     agent_card = AgentCard(
@@ -67,31 +122,50 @@ if __name__ == '__main__':
         url=base_url,
         protocolVersion='0.3.0',
         capabilities=AgentCapabilities(
-            streaming=False,
+            streaming=True,
             pushNotifications=False,
+            extensions=[
+                AgentExtension(
+                    uri=RESPONSE_CACHE_EXTENSION,
+                    description='Per-skill response cache TTLs in seconds (0 = never cache) and side-effecting skills',
+                    params={
+                        'skills': {'send_email': 0, 'validate_email': 3600, 'check_email_status': 0,
+                                   'bulk_send_email': 0, 'bulk_validate_email': 3600},
+                        'side_effects': ['send_email', 'bulk_send_email'],
+                    },
+                ),
+            ],
         ),
         authentication={
             'schemes': [],
         },
         defaultInputModes=['text'],
         defaultOutputModes=['text'],
-        skills=[send_email_skill, validate_email_skill, check_status_skill],
+        skills=[send_email_skill, validate_email_skill, check_status_skill, bulk_send_skill, bulk_validate_skill],
     )
     
     # Create request handler
+    agent_executor = EmailAgentExecutor()
     request_handler = DefaultRequestHandler(
-        agent_executor=EmailAgentExecutor(),
-        task_store=InMemoryTaskStore(),
+        agent_executor=agent_executor,
+        task_store=create_task_store('email_agent'),  # SQLite behind an LRU, shared by every worker (TASK_STORE)
     )
     
     # Create A2A server application
-    app = server = A2AStarletteApplication(
+    server = A2AStarletteApplication(
         agent_card=agent_card,
         http_handler=request_handler,
     )
     
+    @asynccontextmanager
+    async def lifespan(app):
+        # Deliver from startup: emails a stopped worker left queued are recovered
+        # without waiting for this worker's first send (email_delivery.py)
+        agent_executor.agent.delivery.start()
+        yield
+    
     # Build the Starlette app
-    starlette_app = server.build()
+    starlette_app = server.build(lifespan=lifespan)
     
     # Add health check endpoint for Railway
     from starlette.responses import JSONResponse
@@ -103,16 +177,28 @@ if __name__ == '__main__':
     # Add health route to the app
     starlette_app.routes.append(Route('/health', health_check))
     
-    print(f"📧 Email Agent (Remote SaaS) starting on {base_url}")
-    print(f"📋 AgentCard: {base_url}/.well-known/agent.json")
-    print(f"🏥 Health check: {base_url}/health")
-    print("✨ This agent simulates a remote SaaS email service")
-    if railway_url:
-        print(f"🚀 Deployed on Railway: https://{railway_url}")
+    # Prometheus metrics at /metrics
+    if instrument_app is not None:
+        instrument_app(starlette_app, request_handler)
+    return starlette_app
+
+
+if __name__ == '__main__':
+    configure_logging('email_agent')
+    
+    base_url = public_url()
+    logger.info("📧 Email Agent (Remote SaaS) starting on %s", base_url)
+    logger.info("📋 AgentCard: %s/.well-known/agent.json", base_url)
+    logger.info("🏥 Health check: %s/health", base_url)
+    if instrument_app is not None:
+        logger.info("📈 Metrics: %s/metrics", base_url)
+    logger.info("✨ This agent simulates a remote SaaS email service")
+    if os.getenv('RAILWAY_PUBLIC_DOMAIN'):
+        logger.info("🚀 Deployed on Railway: %s", base_url)
     else:
-        print("🚀 Running locally - ready to be deployed to Railway.app!")
+        logger.info("🚀 Running locally - ready to be deployed to Railway.app!")
     
-    # Start server
-    uvicorn.run(starlette_app, host='0.0.0.0', port=port)
+    # Start server (EMAIL_AGENT_WORKERS or WORKERS worker processes)
+    serve('email_agent', create_app, default_port=5004)
 
 # Made with Bob
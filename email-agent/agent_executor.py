@@ -1,131 +1,354 @@
+import asyncio
+import logging
+import os
+import sys
+import time
+from contextlib import nullcontext
 from typing_extensions import override
 from a2a.server.agent_execution import AgentExecutor, RequestContext
 from a2a.server.events import EventQueue
-from a2a.utils import new_agent_text_message
 import re
 import uuid
 from datetime import datetime
 
+from email_delivery import DeliveryQueue, QueueFull
+from email_store import create_email_store, run_store
+from intent_parser import ADDRESS_TOKEN, EMAIL_PATTERN, ParsedQuery, parse_query
+from reply import stream_reply
+
+# Shared modules at the repository root. Railway deploys email-agent/ on its
+# own, so logging, tracing and metrics are optional there.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+try:
+    from common.log import REQUEST_ID_HEADER, request_context
+    from common.metrics import track_skill
+    from common.tracing import SERVER, extract, get_tracer, request_headers
+    tracer = get_tracer('email_agent')
+except ImportError:
+    tracer = None
+    request_context = None
+    
+    def track_skill(skill_id):
+        return nullcontext()
+
+logger = logging.getLogger('email_agent')
+
+
+def _request_scope(context):
+    """Log request scope continuing the caller's X-Request-ID, or a no-op without common.log"""
+    if request_context is None:
+        return nullcontext()
+    return request_context(request_headers(context).get(REQUEST_ID_HEADER))
+
+
+def _span(name, request_context=None, **attributes):
+    """Tracing span, or a no-op context when the shared tracing module is missing
+    
+    Given the RequestContext, the span is a server span continuing the
+    caller's trace (traceparent header).
+    """
+    if tracer is None:
+        return nullcontext()
+    if request_context is not None:
+        parent = extract(request_headers(request_context))
+        return tracer.start_as_current_span(name, kind=SERVER, parent=parent, attributes=attributes)
+    return tracer.start_as_current_span(name, attributes=attributes)
+
+
+STATUS_ICONS = {'queued': '⏳', 'sent': '✅', 'failed': '❌'}
+
+# Bulk skills: items handled (and streamed back) per chunk, and per request
+BULK_CHUNK_SIZE = int(os.getenv('EMAIL_BULK_CHUNK_SIZE', '500'))
+BULK_MAX_ITEMS = int(os.getenv('EMAIL_BULK_MAX_ITEMS', '10000'))
+BULK_SKILLS = ('bulk_send_email', 'bulk_validate_email')
+
+DOMAIN_LABEL = re.compile(r'(?!-)[a-z0-9-]{1,63}(?<!-)')
+COMMON_DOMAINS = frozenset({'gmail.com', 'yahoo.com', 'outlook.com', 'hotmail.com', 'example.com'})
+
+
+def check_domain(domain: str):
+    """(valid, common provider) for an email domain"""
+    domain = domain.lower()
+    labels = domain.split('.')
+    valid = len(labels) >= 2 and labels[-1].isalpha() and all(DOMAIN_LABEL.fullmatch(label) for label in labels)
+    return valid, domain in COMMON_DOMAINS
+
+
+def _chunks(items, size=BULK_CHUNK_SIZE):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
 
 class EmailAgent:
     """Mock email agent simulating SaaS email service (like SendGrid/Mailgun)"""
     
-    def __init__(self):
-        # Mock email storage for demo purposes
-        self.sent_emails = {}
+    def __init__(self, sent_emails=None, delivery=None):
+        # Mock email storage for demo purposes: indexed and bounded (email_store.py),
+        # shared by workers with EMAIL_STORE=sqlite
+        self.sent_emails = create_email_store() if sent_emails is None else sent_emails
+        # Outbound queue delivering in the background (email_delivery.py)
+        self.delivery = DeliveryQueue(self.sent_emails) if delivery is None else delivery
     
-    async def send_email(self, query: str) -> str:
-        """Send an email (mock implementation)"""
+    async def send_email(self, query: str | ParsedQuery) -> str:
+        """Queue an email for delivery and return its id right away"""
         try:
-            # Extract email details from query
+            # Email details from the parsed query
             # Pattern: "send email to john@example.com with subject Hello and message Hi there"
-            query_lower = query.lower()
+            parsed = query if isinstance(query, ParsedQuery) else parse_query(query)
             
-            # Extract recipient
-            to_match = re.search(r'(?:to|recipient)\s+([a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,})', query)
-            if not to_match:
+            recipient = parsed.recipient
+            if not recipient or not EMAIL_PATTERN.fullmatch(str(recipient)):
                 return "❌ Please specify recipient email (e.g., 'send email to john@example.com')"
             
-            recipient = to_match.group(1)
-            
-            # Extract subject
-            subject_match = re.search(r'(?:subject|title)\s+([^,\.]+?)(?:\s+(?:and|with|message|body)|$)', query, re.IGNORECASE)
-            subject = subject_match.group(1).strip() if subject_match else "No Subject"
-            
-            # Extract message/body
-            message_match = re.search(r'(?:message|body|text)\s+(.+?)(?:\s*$)', query, re.IGNORECASE)
-            message = message_match.group(1).strip() if message_match else "No message body"
+            subject = str(parsed.subject or "No Subject")
+            message = str(parsed.message or "No message body")
             
             # Generate email ID
             email_id = f"email_{uuid.uuid4().hex[:8]}"
             
-            # Store email (mock)
-            self.sent_emails[email_id] = {
+            if self.delivery.full():
+                return "❌ Too many emails waiting for delivery. Please try again shortly."
+            
+            # Store the email as queued; the delivery workers update its status
+            record = {
                 'to': recipient,
                 'subject': subject,
                 'message': message,
-                'status': 'sent',
+                'status': 'queued',
                 'timestamp': datetime.now().isoformat(),
-                'delivery_status': 'delivered'
+                'delivery_status': 'pending',
+                'attempts': 0,
+                'queued_by': self.delivery.owner,
             }
+            await run_store(self.sent_emails, self.sent_emails.add, email_id, record)
+            try:
+                self.delivery.submit(email_id, record)
+            except QueueFull:
+                await run_store(self.sent_emails, self.sent_emails.pop, email_id)
+                return "❌ Too many emails waiting for delivery. Please try again shortly."
             
-            return f"✅ Email sent successfully!\n\n📧 Email ID: {email_id}\n📨 To: {recipient}\n📝 Subject: {subject}\n💬 Message: {message}\n⏰ Sent at: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n\n✨ This is a mock email service (SaaS simulation)"
+            return f"📬 Email queued for delivery!\n\n📧 Email ID: {email_id}\n📨 To: {recipient}\n📝 Subject: {subject}\n💬 Message: {message}\n⏰ Queued at: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n\n💡 Use 'check status {email_id}' to follow its delivery\n✨ This is a mock email service (SaaS simulation)"
             
         except Exception as e:
             return f"❌ Error sending email: {str(e)}"
     
-    async def validate_email(self, query: str) -> str:
+    async def validate_email(self, query: str | ParsedQuery) -> str:
         """Validate email address format"""
         try:
-            # Extract email from query
-            email_match = re.search(r'([a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,})', query)
+            # Email address from the parsed query
+            parsed = query if isinstance(query, ParsedQuery) else parse_query(query)
+            email = parsed.address
             
-            if not email_match:
+            if not email:
                 return "❌ No email address found in query. Please provide an email to validate."
             
-            email = email_match.group(1)
-            
-            # Basic validation
-            if '@' not in email or '.' not in email.split('@')[1]:
+            # Basic validation (a data part's address has not been matched yet)
+            if not EMAIL_PATTERN.fullmatch(email):
                 return f"❌ Invalid email format: {email}"
             
             # Check common domains
             domain = email.split('@')[1]
-            common_domains = ['gmail.com', 'yahoo.com', 'outlook.com', 'hotmail.com', 'example.com']
-            is_common = domain in common_domains
+            is_common = domain in COMMON_DOMAINS
             
             return f"✅ Email validation result:\n\n📧 Email: {email}\n✓ Format: Valid\n🌐 Domain: {domain}\n{'⭐ Common provider' if is_common else '📍 Custom domain'}\n\n✨ This is a mock validation service"
             
         except Exception as e:
             return f"❌ Error validating email: {str(e)}"
     
-    async def check_status(self, query: str) -> str:
+    async def check_status(self, query: str | ParsedQuery) -> str:
         """Check email delivery status"""
         try:
-            # Extract email ID from query
-            id_match = re.search(r'email_[a-f0-9]{8}', query)
+            # Email ID, recipient and status word from the parsed query
+            parsed = query if isinstance(query, ParsedQuery) else parse_query(query)
             
-            if not id_match:
-                # Show recent emails if no ID provided
-                if not self.sent_emails:
-                    return "📭 No emails sent yet. Send an email first!"
+            if not parsed.email_id:
+                # Show recent emails if no ID provided: to a recipient, in a
+                # status, or overall (each an index lookup of 3 records)
+                if parsed.address:
+                    recipient = parsed.address
+                    recent = await run_store(self.sent_emails, self.sent_emails.by_recipient, recipient)
+                    if not recent:
+                        return f"📭 No emails found to {recipient}."
+                    heading = f"📊 Recent emails to {recipient}:"
+                elif parsed.status:
+                    status = parsed.status
+                    recent = await run_store(self.sent_emails, self.sent_emails.by_status, status)
+                    if not recent:
+                        return f"📭 No {status} emails found."
+                    heading = f"📊 Recent {status} emails:"
+                else:
+                    recent = await run_store(self.sent_emails, self.sent_emails.recent, 3)
+                    if not recent:
+                        return "📭 No emails sent yet. Send an email first!"
+                    heading = "📊 Recent email status:"
                 
-                recent = list(self.sent_emails.items())[-3:]  # Last 3 emails
-                result = "📊 Recent email status:\n\n"
+                result = heading + "\n\n"
                 for email_id, details in recent:
                     result += f"📧 {email_id}\n"
                     result += f"   To: {details['to']}\n"
-                    result += f"   Status: {details['status']} ✅\n"
+                    result += f"   Status: {details['status']} {STATUS_ICONS.get(details['status'], '')}\n"
                     result += f"   Delivery: {details['delivery_status']}\n\n"
                 return result + "💡 Tip: Use 'check status email_xxxxx' to check specific email"
             
-            email_id = id_match.group(0)
-            
-            if email_id not in self.sent_emails:
-                return f"❌ Email ID '{email_id}' not found. It may have been sent from a different session."
+            email_id = parsed.email_id
+            details = await run_store(self.sent_emails, self.sent_emails.get, email_id)
             
-            details = self.sent_emails[email_id]
+            if details is None:
+                return f"❌ Email ID '{email_id}' not found. It may have been sent from a different session or expired."
             
-            return f"📊 Email Status Report:\n\n📧 Email ID: {email_id}\n📨 To: {details['to']}\n📝 Subject: {details['subject']}\n✅ Status: {details['status']}\n📬 Delivery: {details['delivery_status']}\n⏰ Sent: {details['timestamp']}\n\n✨ This is a mock status check service"
+            sent = f"⏰ Sent: {details['sent_at']}\n" if details.get('sent_at') else ""
+            return f"📊 Email Status Report:\n\n📧 Email ID: {email_id}\n📨 To: {details['to']}\n📝 Subject: {details['subject']}\n{STATUS_ICONS.get(details['status'], '')} Status: {details['status']}\n📬 Delivery: {details['delivery_status']}\n🔁 Attempts: {details.get('attempts', 0)}\n🕐 Queued: {details['timestamp']}\n{sent}\n✨ This is a mock status check service"
             
         except Exception as e:
             return f"❌ Error checking status: {str(e)}"
     
-    async def process_query(self, query: str) -> str:
-        """Route query to appropriate email method"""
-        query_lower = query.lower()
+    def bulk_send_items(self, parsed: ParsedQuery):
+        """Emails [(recipient, subject, message)] of a bulk send request
         
-        # Check for send email
-        if 'send' in query_lower and ('email' in query_lower or 'mail' in query_lower):
-            return await self.send_email(query)
+        From a data part {"recipients": [...], "subject": ..., "message": ...}
+        (recipients as addresses or {"to", "subject", "message"} objects) or
+        {"emails": [{"to", "subject", "message"}, ...]}; else from the text:
+        every address before the subject/message, sharing one subject and message.
+        """
+        data = parsed.data
+        if data:
+            subject = str(data.get('subject') or 'No Subject')
+            message = str(data.get('message') or data.get('body') or 'No message body')
+            items = []
+            for item in data.get('recipients') or data.get('emails') or []:
+                if isinstance(item, dict):
+                    items.append((str(item.get('to', '')), str(item.get('subject') or subject),
+                                  str(item.get('message') or item.get('body') or message)))
+                else:
+                    items.append((str(item), subject, message))
+            return items
         
-        # Check for validate email
-        if 'validate' in query_lower or 'check' in query_lower and 'valid' in query_lower:
-            return await self.validate_email(query)
+        end = len(parsed.text) if parsed.slots_start is None else parsed.slots_start
+        recipients = ADDRESS_TOKEN.findall(parsed.text, 0, end)
+        subject = parsed.subject or "No Subject"
+        message = parsed.message or "No message body"
+        return [(recipient, subject, message) for recipient in recipients]
+    
+    def bulk_validate_items(self, parsed: ParsedQuery):
+        """Addresses of a bulk validate request: a data part {"addresses": [...]}, or every address in the text"""
+        if parsed.data:
+            return [str(address) for address in parsed.data.get('addresses') or parsed.data.get('emails') or []]
+        return ADDRESS_TOKEN.findall(parsed.text)
+    
+    async def bulk_send(self, items):
+        """Queue one email per item, chunk by chunk; yields per-recipient lines, then a summary"""
+        started = time.perf_counter()
+        queued = rejected = 0
+        yield f"📬 Bulk send: {len(items)} email(s)\n\n"
+        for chunk in _chunks(items):
+            timestamp = datetime.now().isoformat()
+            accepted, entries = [], []  # entries: per item, a reply line or an email to queue
+            for recipient, subject, message in chunk:
+                if not EMAIL_PATTERN.fullmatch(recipient):
+                    entries.append(f"❌ {recipient or '(empty)'}: invalid address\n")
+                    continue
+                if self.delivery.full(pending=len(accepted)):
+                    entries.append(f"❌ {recipient}: delivery queue full, try again shortly\n")
+                    continue
+                email_id = f"email_{uuid.uuid4().hex[:8]}"
+                record = {
+                    'to': recipient,
+                    'subject': subject,
+                    'message': message,
+                    'status': 'queued',
+                    'timestamp': timestamp,
+                    'delivery_status': 'pending',
+                    'attempts': 0,
+                    'queued_by': self.delivery.owner,
+                }
+                accepted.append((email_id, record))
+                entries.append((email_id, record))
+            
+            # Stored before they are queued, so a delivery never updates a missing record
+            await run_store(self.sent_emails, self.sent_emails.add_many, accepted)
+            lines, dropped = [], []
+            for entry in entries:
+                if isinstance(entry, str):
+                    lines.append(entry)
+                    continue
+                email_id, record = entry
+                try:
+                    self.delivery.submit(email_id, record)
+                    lines.append(f"⏳ {record['to']}: queued as {email_id}\n")
+                except QueueFull:  # Filled up by other requests while the chunk was stored
+                    dropped.append(email_id)
+                    lines.append(f"❌ {record['to']}: delivery queue full, try again shortly\n")
+            if dropped:
+                await run_store(self.sent_emails, lambda: [self.sent_emails.pop(email_id) for email_id in dropped])
+            queued += len(accepted) - len(dropped)
+            rejected += len(chunk) - len(accepted) + len(dropped)
+            yield ''.join(lines)
+            await asyncio.sleep(0)  # Let other requests (and the delivery workers) run between chunks
         
-        # Check for status check
-        if 'status' in query_lower or 'delivery' in query_lower or 'track' in query_lower:
-            return await self.check_status(query)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        yield (f"\n📊 Summary: {queued} queued, {rejected} rejected of {len(items)} in {elapsed_ms:.1f}ms\n"
+               f"💡 Use 'check status email_xxxxx' or 'check status failed' to follow delivery")
+    
+    async def bulk_validate(self, addresses):
+        """Validate addresses chunk by chunk (each domain checked once); yields per-address lines, then a summary"""
+        started = time.perf_counter()
+        domains = {}  # domain -> (valid, common provider), shared by the whole batch
+        valid = 0
+        yield f"✅ Bulk validation: {len(addresses)} address(es)\n\n"
+        for chunk in _chunks(addresses):
+            lines = []
+            for address in chunk:
+                if not EMAIL_PATTERN.fullmatch(address):
+                    lines.append(f"❌ {address or '(empty)'}: invalid format\n")
+                    continue
+                domain = address.rsplit('@', 1)[1].lower()
+                info = domains.get(domain)
+                if info is None:
+                    info = domains[domain] = check_domain(domain)
+                domain_valid, is_common = info
+                if not domain_valid:
+                    lines.append(f"❌ {address}: invalid domain {domain}\n")
+                    continue
+                valid += 1
+                lines.append(f"✓ {address}: {'⭐ common provider' if is_common else '📍 custom domain'}\n")
+            yield ''.join(lines)
+            await asyncio.sleep(0)
+        
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        yield (f"\n📊 Summary: {valid} valid, {len(addresses) - valid} invalid of {len(addresses)} "
+               f"({len(domains)} distinct domain(s)) in {elapsed_ms:.1f}ms")
+    
+    async def run_bulk(self, parsed: ParsedQuery):
+        """Stream a bulk skill's reply in chunks"""
+        if parsed.intent == 'bulk_send_email':
+            items, run, noun = self.bulk_send_items(parsed), self.bulk_send, 'recipients'
+        else:
+            items, run, noun = self.bulk_validate_items(parsed), self.bulk_validate, 'email addresses'
+        if not items:
+            yield f"❌ No {noun} found. Send a list in the message, or a data part (see the agent card examples)."
+            return
+        if len(items) > BULK_MAX_ITEMS:
+            yield f"❌ Too many items: {len(items)} (at most {BULK_MAX_ITEMS} per request). Please split the batch."
+            return
+        async for chunk in run(items):
+            yield chunk
+    
+    def classify(self, query: str, data: dict | None = None):
+        """Skill id a query (and its data part, if any) will run, or None for the help message"""
+        return parse_query(query, data).intent
+    
+    async def process_query(self, query: str, data: dict | None = None) -> str:
+        """Route query to appropriate email method"""
+        return await self.run_skill(parse_query(query, data))
+    
+    async def run_skill(self, parsed: ParsedQuery) -> str:
+        """Run the handler for a parsed query's skill (not the bulk ones: see run_bulk)"""
+        if parsed.intent == 'send_email':
+            return await self.send_email(parsed)
+        if parsed.intent == 'validate_email':
+            return await self.validate_email(parsed)
+        if parsed.intent == 'check_email_status':
+            return await self.check_status(parsed)
         
         # Default help message
         return """📧 Email Agent - Available Commands:
@@ -137,7 +360,11 @@ class EmailAgent:
    "validate email john@example.com"
 
 3️⃣ Check Status:
-   "check status email_xxxxx" or "check delivery status"
+   "check status email_xxxxx", "check delivery status" or "check status failed"
+
+4️⃣ Bulk Send / Bulk Validate:
+   "bulk send email to a@example.com, b@example.com with subject Hi and message Hello"
+   "validate emails a@example.com, b@company.com, c@startup.io"
 
 ✨ This is a mock SaaS email service for demonstration purposes."""
 
@@ -154,19 +381,38 @@ class EmailAgentExecutor(AgentExecutor):
         context: RequestContext,
         event_queue: EventQueue,
     ) -> None:
-        # Get the user's message
-        message_text = ""
-        if context.message and context.message.parts:
-            for part in context.message.parts:
-                if hasattr(part, 'root') and hasattr(part.root, 'text'):
-                    message_text = part.root.text
-                    break
-        
-        # Process the query
-        result = await self.agent.process_query(message_text)
-        
-        # Send response through event queue
-        await event_queue.enqueue_event(new_agent_text_message(result))
+        with _request_scope(context), _span('agent.execute', context, task_id=context.task_id):
+            # Get the user's message: its first text part and first data part
+            message_text = ""
+            data = None
+            if context.message and context.message.parts:
+                for part in context.message.parts:
+                    if not message_text and hasattr(part, 'root') and hasattr(part.root, 'text'):
+                        message_text = part.root.text
+                    elif data is None and hasattr(part, 'root') and isinstance(getattr(part.root, 'data', None), dict):
+                        data = part.root.data
+            
+            # Parse the query once: its skill and every slot
+            parsed = parse_query(message_text, data)
+            skill_id = parsed.intent
+            started = time.perf_counter()
+            # Report the skill that actually ran so the orchestrator never caches
+            # a side-effecting call (send_email) that was routed as another skill,
+            # nor the usage reply to a query no skill understood (skill_id None)
+            metadata = {'skill_id': skill_id}
+            if skill_id in BULK_SKILLS:
+                # Bulk skills stream each chunk's results as soon as it is processed
+                with _span('agent.process', skill=skill_id), track_skill(skill_id):
+                    await stream_reply(context, event_queue, self.agent.run_bulk(parsed), metadata)
+            else:
+                with _span('agent.process', skill=skill_id), track_skill(skill_id):
+                    result = await self.agent.run_skill(parsed)
+                
+                with _span('agent.reply'):
+                    await stream_reply(context, event_queue, result, metadata)
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            logger.info("✅ %s answered in %.1fms", skill_id, elapsed_ms,
+                        extra={'skill': skill_id, 'duration_ms': round(elapsed_ms, 1)})
     
     @override
     async def cancel(
@@ -0,0 +1,358 @@
+"""Background delivery of the email agent's outbound mail
+
+send_email only records the email as 'queued' and hands it to the
+DeliveryQueue, so request latency no longer depends on the mail transport.
+A pool of delivery workers takes queued emails in batches, waits for the
+rate limiter, and sends each batch through the transport. Emails that fail
+are retried with exponential backoff, then marked 'failed'; the store
+(email_store.py) always holds the real queued / sent / failed state.
+
+Transports:
+
+    file   Appends each email as a JSON line to EMAIL_OUTBOX (default; for testing)
+    smtp   Sends through an SMTP server, one connection per batch; for a local
+           sink run e.g. `python -m aiosmtpd -n -l localhost:1025`
+
+Configured from the environment:
+
+    EMAIL_TRANSPORT          'file' or 'smtp'
+    EMAIL_OUTBOX             File transport output (default: email-agent/data/outbox.jsonl)
+    SMTP_HOST / SMTP_PORT    SMTP server (default localhost:1025)
+    EMAIL_FROM               Sender address
+    EMAIL_DELIVERY_WORKERS   Concurrent delivery workers
+    EMAIL_BATCH_SIZE         Emails sent per transport call
+    EMAIL_RATE_LIMIT         Emails per second across the workers (0: unlimited)
+    EMAIL_MAX_ATTEMPTS       Deliveries tried before an email is 'failed'
+    EMAIL_RETRY_BACKOFF      Seconds before the first retry, doubled for each next one
+    EMAIL_QUEUE_SIZE         Emails waiting before send_email refuses new ones (0: unbounded)
+    EMAIL_RECOVER_INTERVAL   Seconds between sweeps for emails orphaned by a stopped process
+                             (0: only at startup)
+
+The queue lives in the worker process that accepted the email, and each
+email records that process (queued_by). With a shared store (SQLite), emails
+still queued when their process stops are claimed and delivered by another
+worker, or by the next one started: at startup, then every
+EMAIL_RECOVER_INTERVAL seconds.
+Self-contained (no repository imports) so the agent still deploys on its own.
+"""
+import asyncio
+import json
+import logging
+import os
+import random
+import smtplib
+import socket
+import time
+import uuid
+from collections import deque
+from datetime import datetime
+from email.message import EmailMessage
+
+from email_store import run_store
+
+EMAIL_TRANSPORT = os.getenv("EMAIL_TRANSPORT", "file").lower()
+EMAIL_OUTBOX = os.getenv(
+    "EMAIL_OUTBOX",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "outbox.jsonl"),
+)
+SMTP_HOST = os.getenv("SMTP_HOST", "localhost")
+SMTP_PORT = int(os.getenv("SMTP_PORT", "1025"))
+SMTP_TIMEOUT = float(os.getenv("SMTP_TIMEOUT", "10.0"))
+EMAIL_FROM = os.getenv("EMAIL_FROM", "noreply@a2a-email-agent.local")
+EMAIL_DELIVERY_WORKERS = int(os.getenv("EMAIL_DELIVERY_WORKERS", "4"))
+EMAIL_BATCH_SIZE = int(os.getenv("EMAIL_BATCH_SIZE", "50"))
+EMAIL_RATE_LIMIT = float(os.getenv("EMAIL_RATE_LIMIT", "100"))
+EMAIL_MAX_ATTEMPTS = int(os.getenv("EMAIL_MAX_ATTEMPTS", "5"))
+EMAIL_RETRY_BACKOFF = float(os.getenv("EMAIL_RETRY_BACKOFF", "1.0"))
+EMAIL_QUEUE_SIZE = int(os.getenv("EMAIL_QUEUE_SIZE", "10000"))
+EMAIL_RECOVER_INTERVAL = float(os.getenv("EMAIL_RECOVER_INTERVAL", "60"))
+
+RECOVER_BATCH = 1000  # Queued emails read per page when recovering (and recovered per sweep when the queue is unbounded)
+HOSTNAME = socket.gethostname()
+
+logger = logging.getLogger('email_agent.delivery')
+
+
+class FileTransport:
+    """Appends emails as JSON lines to a file (a local sink for testing)"""
+
+    def __init__(self, path=EMAIL_OUTBOX):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def _write(self, lines):
+        with open(self.path, "a", encoding="utf-8") as outbox:
+            outbox.write("".join(lines))
+
+    async def send_batch(self, emails):
+        """Deliver [(email_id, record)]; returns one error (or None) per email"""
+        lines = [
+            json.dumps({'email_id': email_id, 'from': EMAIL_FROM, 'to': record['to'],
+                        'subject': record['subject'], 'message': record['message']}) + "\n"
+            for email_id, record in emails
+        ]
+        await asyncio.to_thread(self._write, lines)
+        return [None] * len(emails)
+
+
+class SmtpTransport:
+    """Sends emails through an SMTP server, one connection per batch"""
+
+    def __init__(self, host=SMTP_HOST, port=SMTP_PORT):
+        self.host = host
+        self.port = port
+
+    def _send(self, emails):
+        errors = []
+        with smtplib.SMTP(self.host, self.port, timeout=SMTP_TIMEOUT) as smtp:
+            for email_id, record in emails:
+                message = EmailMessage()
+                message['From'] = EMAIL_FROM
+                message['To'] = record['to']
+                message['Subject'] = record['subject']
+                message['Message-ID'] = f"<{email_id}@{EMAIL_FROM.split('@')[-1]}>"
+                message.set_content(record['message'])
+                try:
+                    smtp.send_message(message)
+                    errors.append(None)
+                except smtplib.SMTPException as e:
+                    errors.append(e)  # This recipient only; the connection is still usable
+        return errors
+
+    async def send_batch(self, emails):
+        try:
+            return await asyncio.to_thread(self._send, emails)
+        except (OSError, smtplib.SMTPException) as e:
+            return [e] * len(emails)  # Connection failed: retry the whole batch
+
+
+def create_transport():
+    """The configured transport (EMAIL_TRANSPORT)"""
+    if EMAIL_TRANSPORT == "file":
+        return FileTransport()
+    if EMAIL_TRANSPORT == "smtp":
+        return SmtpTransport()
+    raise ValueError(f"Unknown EMAIL_TRANSPORT: {EMAIL_TRANSPORT!r} (expected 'file' or 'smtp')")
+
+
+class RateLimiter:
+    """Token bucket: rate emails per second, bursts of up to one second's worth"""
+
+    def __init__(self, rate):
+        self.rate = rate
+        self.tokens = rate
+        self.updated = time.monotonic()
+
+    async def acquire(self, n=1):
+        if self.rate <= 0:
+            return
+        while True:
+            now = time.monotonic()
+            self.tokens = min(self.rate, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= min(n, self.rate):
+                self.tokens -= n  # May go negative for a batch larger than the burst
+                return
+            await asyncio.sleep((min(n, self.rate) - self.tokens) / self.rate)
+
+
+def _process_owner():
+    """queued_by of this process: host, pid and a nonce telling it from an earlier process with its pid"""
+    return f"{HOSTNAME}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+def _owner_gone(owner, current):
+    """Whether the process that queued an email (its queued_by) has stopped"""
+    parts = (owner or '').rsplit(':', 2)
+    if len(parts) != 3 or not parts[1].isdigit():
+        return True  # Queued before emails recorded their process
+    host, pid, _ = parts
+    if host != HOSTNAME:
+        return False  # Another machine's process: cannot tell
+    if int(pid) == os.getpid():
+        return owner != current  # An earlier process that had this pid
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return True
+    except PermissionError:
+        pass
+    return False
+
+
+class QueueFull(Exception):
+    """The delivery queue holds EMAIL_QUEUE_SIZE emails already"""
+
+
+class DeliveryQueue:
+    """Queued emails and the worker pool that delivers them
+
+    Workers start with start() (at app startup) or the first email submitted
+    from inside the event loop. Emails stored for delivery carry
+    'queued_by': owner.
+    """
+
+    def __init__(self, store, transport=None, workers=EMAIL_DELIVERY_WORKERS, batch_size=EMAIL_BATCH_SIZE,
+                 rate_limit=EMAIL_RATE_LIMIT, max_attempts=EMAIL_MAX_ATTEMPTS,
+                 retry_backoff=EMAIL_RETRY_BACKOFF, max_queued=EMAIL_QUEUE_SIZE,
+                 recover_interval=EMAIL_RECOVER_INTERVAL):
+        self.store = store
+        self.owner = _process_owner()
+        self.transport = transport or create_transport()
+        self.workers = workers
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.retry_backoff = retry_backoff
+        self.max_queued = max_queued
+        self.recover_interval = recover_interval
+        self.rate_limiter = RateLimiter(rate_limit)
+        self._queue = deque()  # (email_id, record, attempt)
+        self._retrying = 0  # Emails waiting out a backoff
+        self._ready = None  # asyncio.Event, created in the loop
+        self._tasks = []
+
+    def __len__(self):
+        return len(self._queue) + self._retrying
+
+    def full(self, pending=0):
+        """Whether the queue has no room (left after pending more emails)"""
+        return self.max_queued > 0 and len(self) + pending >= self.max_queued
+
+    def start(self):
+        """Start the workers and the recovery of orphaned emails (from inside the event loop)"""
+        self._start()
+
+    def submit(self, email_id, record):
+        """Queue an email for delivery (raises QueueFull)"""
+        if self.full():
+            raise QueueFull(email_id)
+        self._queue.append((email_id, record, 1))
+        self._start()
+        if self._ready is not None:
+            self._ready.set()
+
+    def _start(self):
+        if self._tasks and not all(task.done() for task in self._tasks):
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return  # No event loop yet: the emails wait for the first submit inside one
+        self._ready = asyncio.Event()
+        self._tasks = [loop.create_task(self._worker()) for _ in range(self.workers)]
+        self._tasks.append(loop.create_task(self._recover_loop()))
+
+    async def _worker(self):
+        while True:
+            while not self._queue:
+                self._ready.clear()
+                await self._ready.wait()
+            batch = [self._queue.popleft() for _ in range(min(self.batch_size, len(self._queue)))]
+            await self.rate_limiter.acquire(len(batch))
+            try:
+                errors = await self.transport.send_batch([(email_id, record) for email_id, record, _ in batch])
+            except Exception as e:
+                errors = [e] * len(batch)
+            await self._store_outcomes(batch, errors)
+            logger.debug("📤 Delivered %d/%d email(s)", errors.count(None), len(batch),
+                         extra={'batch': len(batch), 'queued': len(self._queue)})
+
+    async def _store_outcomes(self, batch, errors, tries=1):
+        """Record a batch's delivery outcomes, then schedule its retries
+
+        Outcomes the store failed to record are recorded again after a
+        backoff (the emails are not delivered again): left 'queued' under
+        this live process, recovery would never pick them up.
+        """
+        try:
+            retries, unrecorded = await run_store(self.store, self._record, batch, errors)
+        except Exception:
+            logger.exception("❌ Recording a delivery batch failed (%d email(s))", len(batch))
+            retries, unrecorded = [], list(zip(batch, errors))
+        loop = asyncio.get_running_loop()
+        for email_id, record, attempt in retries:
+            delay = self.retry_backoff * 2 ** (attempt - 1) * random.uniform(0.8, 1.2)
+            self._retrying += 1
+            loop.call_later(delay, self._retry, email_id, record, attempt + 1)
+        if unrecorded:
+            delay = self.retry_backoff * 2 ** min(tries - 1, 6) * random.uniform(0.8, 1.2)
+            self._retrying += len(unrecorded)
+            loop.call_later(delay, self._record_again, unrecorded, tries + 1)
+
+    def _record_again(self, unrecorded, tries):
+        self._retrying -= len(unrecorded)
+        batch, errors = zip(*unrecorded)
+        asyncio.get_running_loop().create_task(self._store_outcomes(list(batch), list(errors), tries))
+
+    def _record(self, batch, errors):
+        """Store each email's delivery outcome; returns the emails to retry and the (entry, error) pairs not stored"""
+        retries = []
+        unrecorded = []
+        for entry, error in zip(batch, errors):
+            email_id, record, attempt = entry
+            try:
+                if error is None:
+                    self.store.update(email_id, status='sent', delivery_status='delivered', attempts=attempt,
+                                      sent_at=datetime.now().isoformat())
+                elif attempt >= self.max_attempts:
+                    self.store.update(email_id, status='failed', delivery_status=f'failed: {error}', attempts=attempt)
+                    logger.warning("❌ Email %s failed after %d attempt(s): %s", email_id, attempt, error,
+                                   extra={'email_id': email_id, 'attempts': attempt})
+                else:
+                    self.store.update(email_id, delivery_status=f'retrying (attempt {attempt} failed: {error})',
+                                      attempts=attempt)
+                    retries.append((email_id, record, attempt))
+            except Exception:
+                # The store keeps the previous status; the other emails of the batch are still recorded
+                logger.exception("❌ Recording delivery of %s failed", email_id, extra={'email_id': email_id})
+                unrecorded.append((entry, error))
+        return retries, unrecorded
+
+    async def _recover_loop(self):
+        """Queue the emails orphaned by stopped processes: now, then every recover_interval"""
+        while True:
+            try:
+                recovered = await run_store(self.store, self._recover)
+            except Exception:
+                logger.exception("❌ Recovering orphaned emails failed")
+            else:
+                if recovered:
+                    self._queue.extend(recovered)
+                    self._ready.set()
+                    logger.info("♻️  Re-queued %d email(s) left queued by a stopped process", len(recovered),
+                                extra={'recovered': len(recovered)})
+            if self.recover_interval <= 0:
+                return
+            await asyncio.sleep(self.recover_interval)
+
+    def _recover(self):
+        """Claim queued emails whose process has stopped, oldest first; returns them as queue entries
+
+        Pages past the emails that live processes still have queued, so
+        orphans queued after them are found too.
+        """
+        room = self.max_queued - len(self) if self.max_queued > 0 else RECOVER_BATCH
+        recovered = []
+        gone = {}  # {owner: stopped?}, one check per process
+        offset = 0
+        while len(recovered) < room:
+            page = self.store.by_status('queued', k=RECOVER_BATCH, oldest_first=True, offset=offset)
+            for email_id, record in page:
+                owner = record.get('queued_by')
+                if owner not in gone:
+                    gone[owner] = _owner_gone(owner, self.owner)
+                if gone[owner] and self.store.claim(email_id, owner, self.owner):
+                    recovered.append((email_id, {**record, 'queued_by': self.owner}, record.get('attempts', 0) + 1))
+                    if len(recovered) >= room:
+                        break
+            if len(page) < RECOVER_BATCH:
+                break
+            offset += len(page)
+        return recovered
+
+    def _retry(self, email_id, record, attempt):
+        self._retrying -= 1
+        self._queue.append((email_id, record, attempt))
+        self._ready.set()
@@ -0,0 +1,308 @@
+"""Storage for the email agent's sent-email records
+
+Records are indexed so a status check costs the same whether the agent has
+sent ten emails or ten million: lookup by email_id is O(1), the most recent
+k emails are O(k), and emails by recipient or by status come from their own
+indexes. Old records are evicted by count and by age.
+
+EmailStore keeps the records in process memory. Worker processes
+(EMAIL_AGENT_WORKERS / WORKERS) do not share memory, so an email sent through
+one worker would be unknown to the worker answering its status check:
+SqliteEmailStore keeps them in a SQLite file that every worker (and every
+restart) shares instead. Its calls block (a writer waits up to 5s for
+another worker's lock), so callers on the event loop go through
+run_store(), which runs them in a worker thread.
+
+    EMAIL_STORE        'memory' or 'sqlite' (default: sqlite with more than one worker)
+    EMAIL_DB           SQLite file (default: email-agent/data/emails.db)
+    EMAIL_MAX_RECORDS  Records kept; the oldest are evicted first (0: unbounded)
+    EMAIL_RETENTION    Seconds a record is kept (default 7 days; 0: forever)
+
+Self-contained (no repository imports) so the agent still deploys on its own.
+"""
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from itertools import islice
+
+EMAIL_DB = os.getenv(
+    "EMAIL_DB",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "emails.db"),
+)
+EMAIL_MAX_RECORDS = int(os.getenv("EMAIL_MAX_RECORDS", "100000"))
+EMAIL_RETENTION = float(os.getenv("EMAIL_RETENTION", str(7 * 86400)))
+
+# SqliteEmailStore applies retention every this many inserts
+EVICT_EVERY = 100
+
+
+def _workers():
+    return int(os.getenv("EMAIL_AGENT_WORKERS") or os.getenv("WORKERS") or "1")
+
+
+class EmailStore:
+    """In-memory email_id -> record dict, with recency, recipient and status indexes
+
+    Records are dicts with at least 'to' and 'status'. Every operation is
+    O(1) except the queries, which are O(k) in the records they return.
+    """
+
+    blocking = False  # Cheap enough to call on the event loop
+
+    def __init__(self, max_records=EMAIL_MAX_RECORDS, retention=EMAIL_RETENTION):
+        self.max_records = max_records
+        self.retention = retention
+        self._records = OrderedDict()  # email_id -> (created, record), oldest first
+        self._by_recipient = {}  # recipient -> OrderedDict of email_ids (ordered set)
+        self._by_status = {}  # status -> OrderedDict of email_ids
+
+    def _index(self, index, key, email_id):
+        index.setdefault(key, OrderedDict())[email_id] = None
+
+    def _unindex(self, index, key, email_id):
+        ids = index.get(key)
+        if ids is not None:
+            ids.pop(email_id, None)
+            if not ids:
+                del index[key]
+
+    def _evict(self):
+        now = time.time()
+        while self._records:
+            email_id, (created, _) = next(iter(self._records.items()))
+            too_many = self.max_records > 0 and len(self._records) > self.max_records
+            expired = self.retention > 0 and created < now - self.retention
+            if not (too_many or expired):
+                break
+            self.pop(email_id)
+
+    def add(self, email_id, record):
+        """Store a new record (as the most recent) and apply retention"""
+        self.pop(email_id)
+        self._records[email_id] = (time.time(), record)
+        self._index(self._by_recipient, record['to'].lower(), email_id)
+        self._index(self._by_status, record['status'], email_id)
+        self._evict()
+
+    def add_many(self, items):
+        """Store [(email_id, record)] in order"""
+        for email_id, record in items:
+            self.add(email_id, record)
+
+    def update(self, email_id, **fields):
+        """Change fields of a stored record (e.g. its status); returns the record or None"""
+        entry = self._records.get(email_id)
+        if entry is None:
+            return None
+        record = entry[1]
+        if 'status' in fields and fields['status'] != record['status']:
+            self._unindex(self._by_status, record['status'], email_id)
+            self._index(self._by_status, fields['status'], email_id)
+        record.update(fields)
+        return record
+
+    def get(self, email_id):
+        entry = self._records.get(email_id)
+        return entry[1] if entry is not None else None
+
+    def pop(self, email_id):
+        entry = self._records.pop(email_id, None)
+        if entry is None:
+            return None
+        record = entry[1]
+        self._unindex(self._by_recipient, record['to'].lower(), email_id)
+        self._unindex(self._by_status, record['status'], email_id)
+        return record
+
+    def recent(self, k=3):
+        """The k most recent (email_id, record) pairs, newest first"""
+        return [(email_id, entry[1]) for email_id, entry in islice(reversed(self._records.items()), k)]
+
+    def by_recipient(self, recipient, k=3):
+        """The k most recent emails sent to recipient, newest first"""
+        ids = self._by_recipient.get(recipient.lower(), ())
+        return [(email_id, self._records[email_id][1]) for email_id in islice(reversed(ids), k)]
+
+    def by_status(self, status, k=3, oldest_first=False, offset=0):
+        """The k most recent (or oldest) emails in a status, newest (oldest) first, skipping offset"""
+        ids = self._by_status.get(status, ())
+        ordered = iter(ids) if oldest_first else reversed(ids)
+        return [(email_id, self._records[email_id][1]) for email_id in islice(ordered, offset, offset + k)]
+
+    def claim(self, email_id, owner, new_owner):
+        """Hand a queued email from owner to new_owner (its 'queued_by'); False if no longer owner's"""
+        record = self.get(email_id)
+        if record is None or record['status'] != 'queued' or record.get('queued_by') != owner:
+            return False
+        record['queued_by'] = new_owner
+        return True
+
+    def __contains__(self, email_id):
+        return email_id in self._records
+
+    def __len__(self):
+        return len(self._records)
+
+
+class SqliteEmailStore:
+    """EmailStore's interface over a SQLite file (WAL) shared by every worker
+
+    email_id, recipient, status and creation time are indexed columns; the
+    record itself is a JSON blob.
+    """
+
+    blocking = True  # Call through run_store() from the event loop
+
+    def __init__(self, path=EMAIL_DB, max_records=EMAIL_MAX_RECORDS, retention=EMAIL_RETENTION):
+        self.path = path
+        self.max_records = max_records
+        self.retention = retention
+        self._inserts = 0
+        self._local = threading.local()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        connection = self._connection()
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.executescript(
+            "CREATE TABLE IF NOT EXISTS emails (seq INTEGER PRIMARY KEY AUTOINCREMENT, "
+            "email_id TEXT UNIQUE NOT NULL, recipient TEXT NOT NULL, status TEXT NOT NULL, "
+            "created REAL NOT NULL, record TEXT NOT NULL);"
+            "CREATE INDEX IF NOT EXISTS emails_recipient ON emails (recipient, seq);"
+            "CREATE INDEX IF NOT EXISTS emails_status ON emails (status, seq);"
+            "CREATE INDEX IF NOT EXISTS emails_created ON emails (created);"
+        )
+        self._evict()
+
+    def _connection(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    def _evict(self):
+        connection = self._connection()
+        if self.retention > 0:
+            connection.execute("DELETE FROM emails WHERE created < ?", (time.time() - self.retention,))
+        if self.max_records > 0:
+            connection.execute(
+                "DELETE FROM emails WHERE seq <= (SELECT MAX(seq) FROM emails) - ?", (self.max_records,)
+            )
+
+    def _rows(self, sql, args):
+        return [(email_id, json.loads(record)) for email_id, record in self._connection().execute(sql, args)]
+
+    def add(self, email_id, record):
+        self._connection().execute(
+            "INSERT OR REPLACE INTO emails (email_id, recipient, status, created, record) VALUES (?, ?, ?, ?, ?)",
+            (email_id, record['to'].lower(), record['status'], time.time(), json.dumps(record)),
+        )
+        self._inserts += 1
+        if self._inserts % EVICT_EVERY == 0:
+            self._evict()
+
+    def add_many(self, items):
+        """Store [(email_id, record)] in one transaction"""
+        now = time.time()
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            connection.executemany(
+                "INSERT OR REPLACE INTO emails (email_id, recipient, status, created, record) VALUES (?, ?, ?, ?, ?)",
+                [(email_id, record['to'].lower(), record['status'], now, json.dumps(record)) for email_id, record in items],
+            )
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        self._inserts += len(items)
+        self._evict()
+
+    def update(self, email_id, **fields):
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            row = connection.execute("SELECT record FROM emails WHERE email_id = ?", (email_id,)).fetchone()
+            if row is None:
+                connection.execute("COMMIT")
+                return None
+            record = {**json.loads(row[0]), **fields}
+            connection.execute(
+                "UPDATE emails SET status = ?, record = ? WHERE email_id = ?",
+                (record['status'], json.dumps(record), email_id),
+            )
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        return record
+
+    def get(self, email_id):
+        row = self._connection().execute("SELECT record FROM emails WHERE email_id = ?", (email_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def pop(self, email_id):
+        record = self.get(email_id)
+        self._connection().execute("DELETE FROM emails WHERE email_id = ?", (email_id,))
+        return record
+
+    def recent(self, k=3):
+        return self._rows("SELECT email_id, record FROM emails ORDER BY seq DESC LIMIT ?", (k,))
+
+    def by_recipient(self, recipient, k=3):
+        return self._rows(
+            "SELECT email_id, record FROM emails WHERE recipient = ? ORDER BY seq DESC LIMIT ?", (recipient.lower(), k)
+        )
+
+    def by_status(self, status, k=3, oldest_first=False, offset=0):
+        order = "ASC" if oldest_first else "DESC"
+        return self._rows(
+            f"SELECT email_id, record FROM emails WHERE status = ? ORDER BY seq {order} LIMIT ? OFFSET ?",
+            (status, k, offset),
+        )
+
+    def claim(self, email_id, owner, new_owner):
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")  # Two workers recovering the same email: one wins
+        try:
+            row = connection.execute("SELECT record FROM emails WHERE email_id = ?", (email_id,)).fetchone()
+            record = json.loads(row[0]) if row else None
+            claimed = record is not None and record['status'] == 'queued' and record.get('queued_by') == owner
+            if claimed:
+                record['queued_by'] = new_owner
+                connection.execute("UPDATE emails SET record = ? WHERE email_id = ?", (json.dumps(record), email_id))
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        return claimed
+
+    def __contains__(self, email_id):
+        return self._connection().execute("SELECT 1 FROM emails WHERE email_id = ?", (email_id,)).fetchone() is not None
+
+    def __len__(self):
+        return self._connection().execute("SELECT COUNT(*) FROM emails").fetchone()[0]
+
+
+async def run_store(store, function, *args, **kwargs):
+    """Call function (a store method, or code making several store calls)
+    without blocking the event loop: in a worker thread for a blocking store"""
+    if getattr(store, 'blocking', False):
+        return await asyncio.to_thread(function, *args, **kwargs)
+    return function(*args, **kwargs)
+
+
+def create_email_store():
+    """The configured sent-email store (see module docstring)"""
+    kind = os.getenv("EMAIL_STORE", "sqlite" if _workers() > 1 else "memory").lower()
+    if kind == "memory":
+        return EmailStore()
+    if kind == "sqlite":
+        return SqliteEmailStore()
+    raise ValueError(f"Unknown EMAIL_STORE: {kind!r} (expected 'memory' or 'sqlite')")
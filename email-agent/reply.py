@@ -0,0 +1,81 @@
+"""Streamed replies for the agent executors
+
+stream_reply() sends an agent's answer to message/stream as one task artifact,
+chunk by chunk, each chunk an artifact-update event as soon as it is enqueued.
+message/send clients get one Message with the whole text, as they always have.
+
+RESPONSE_CACHE_EXTENSION is the AgentCard extension through which an agent
+tells the orchestrator how long each skill's replies may be cached.
+
+Self-contained (no repository imports) so the email agent still deploys on its
+own; the other agents import it through common/reply.py.
+"""
+from uuid import uuid4
+
+from a2a.server.agent_execution import RequestContext
+from a2a.server.events import EventQueue
+from a2a.server.tasks import TaskUpdater
+from a2a.types import Part, TextPart
+from a2a.utils import new_agent_text_message, new_task
+
+RESPONSE_CACHE_EXTENSION = 'urn:a2a-orchestrator:ext:response-cache:v1'
+STREAMING_METHODS = frozenset({'message/stream'})
+
+
+async def stream_reply(context: RequestContext, event_queue: EventQueue, text, metadata: dict | None = None) -> None:
+    """Reply as a task artifact sent line by line (or chunk by chunk), or as a Message to message/send
+
+    text is a string, or an async iterator of chunks.
+    """
+    if not _streaming(context):
+        if not isinstance(text, str):
+            text = ''.join([chunk async for chunk in text])
+        message = new_agent_text_message(text)
+        message.metadata = metadata
+        await event_queue.enqueue_event(message)
+        return
+
+    task = context.current_task
+    if not task:
+        task = new_task(context.message)
+        await event_queue.enqueue_event(task)
+
+    updater = TaskUpdater(event_queue, task.id, task.context_id)
+    await updater.start_work()
+
+    if isinstance(text, str):
+        chunks = _aiter(text.splitlines(keepends=True) or [text])
+    else:
+        chunks = text
+    artifact_id = uuid4().hex
+    # One chunk of lookahead, so the last one is flagged as such
+    previous, i = None, 0
+    async for chunk in chunks:
+        if previous is not None:
+            await _add_chunk(updater, artifact_id, previous, metadata, i, last=False)
+            i += 1
+        previous = chunk
+    await _add_chunk(updater, artifact_id, previous or '', metadata, i, last=True)
+    await updater.complete()
+
+
+def _streaming(context: RequestContext):
+    """Whether the request is a message/stream call (the JSON-RPC app records its method)"""
+    call_context = context.call_context
+    return call_context is not None and call_context.state.get('method') in STREAMING_METHODS
+
+
+async def _aiter(items):
+    for item in items:
+        yield item
+
+
+async def _add_chunk(updater, artifact_id, chunk, metadata, i, last):
+    await updater.add_artifact(
+        [Part(root=TextPart(text=chunk))],
+        artifact_id=artifact_id,
+        name='response',
+        metadata=metadata,
+        append=i > 0,
+        last_chunk=last,
+    )
@@ -0,0 +1,203 @@
+"""Per-endpoint health: rolling latency percentiles, error rates and circuit breaking
+
+Each agent endpoint gets an EndpointHealth that moves between three states:
+
+    closed     requests flow; outcomes are recorded in a rolling window
+    open       requests fail fast until the cooldown expires
+    half_open  one probe request is let through; success closes the
+               circuit, failure re-opens it with a doubled cooldown
+
+Call timeouts are derived from the observed p99 latency instead of a
+constant, falling back to the full timeout until enough samples exist, for
+half-open probes, and after the endpoint has been idle (a scaled-to-zero
+service such as the Railway email agent needs the full timeout to cold start).
+
+HealthTracker also load-balances a logical agent's replicas: it picks the
+endpoint with the fewest outstanding requests (among all replicas, or two
+random ones for power-of-two-choices), skipping open circuits, and derives
+the hedging delay from an endpoint's p95.
+"""
+import math
+import random
+import time
+from collections import deque
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class EndpointHealth:
+    """Rolling health model and circuit breaker for one agent endpoint"""
+
+    def __init__(self, window=100, min_samples=20, failure_threshold=5, error_rate_threshold=0.5,
+                 cooldown=10.0, max_cooldown=120.0, timeout_multiplier=2.0, min_timeout=1.0,
+                 idle_reset=300.0, clock=time.monotonic):
+        self.min_samples = min_samples
+        self.failure_threshold = failure_threshold
+        self.error_rate_threshold = error_rate_threshold
+        self.base_cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.timeout_multiplier = timeout_multiplier
+        self.min_timeout = min_timeout
+        self.idle_reset = idle_reset
+        self.clock = clock
+
+        self.latencies = deque(maxlen=window)  # Seconds, successful calls only
+        self.outcomes = deque(maxlen=window)  # True = success
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.cooldown = cooldown
+        self.opened_at = 0.0
+        self.probe_in_flight = False
+        self.last_success_at = None
+        self.rejected = 0  # Calls failed fast while open
+        self.outstanding = 0  # Requests currently in flight
+        self._sorted_latencies = None  # Cached sorted copy, reset on record
+
+    def allow_request(self):
+        """Whether a call may go out now; claims the single probe slot when half-open"""
+        if self.state == OPEN:
+            if self.clock() - self.opened_at < self.cooldown:
+                self.rejected += 1
+                return False
+            self.state = HALF_OPEN
+        if self.state == HALF_OPEN:
+            if self.probe_in_flight:
+                self.rejected += 1
+                return False
+            self.probe_in_flight = True
+        return True
+
+    def record_success(self, latency: float):
+        self.latencies.append(latency)
+        self.outcomes.append(True)
+        self._sorted_latencies = None
+        self.consecutive_failures = 0
+        self.last_success_at = self.clock()
+        if self.state != CLOSED:
+            self.state = CLOSED
+            self.cooldown = self.base_cooldown
+        self.probe_in_flight = False
+
+    def record_failure(self):
+        self.outcomes.append(False)
+        self.consecutive_failures += 1
+        if self.state == HALF_OPEN:
+            self._open(min(self.cooldown * 2, self.max_cooldown))
+        elif self.state == CLOSED and (
+            self.consecutive_failures >= self.failure_threshold
+            or (len(self.outcomes) >= self.min_samples and self.error_rate() >= self.error_rate_threshold)
+        ):
+            self._open(self.base_cooldown)
+        self.probe_in_flight = False
+
+    def release(self):
+        """Give back a claimed probe slot without an outcome (e.g. caller cancelled)"""
+        self.probe_in_flight = False
+
+    def _open(self, cooldown):
+        self.state = OPEN
+        self.cooldown = cooldown
+        self.opened_at = self.clock()
+        # Judge the endpoint afresh once it recovers
+        self.outcomes.clear()
+
+    def retry_in(self):
+        """Seconds until an open circuit lets a probe through"""
+        if self.state != OPEN:
+            return 0.0
+        return max(0.0, self.cooldown - (self.clock() - self.opened_at))
+
+    def error_rate(self):
+        if not self.outcomes:
+            return 0.0
+        return self.outcomes.count(False) / len(self.outcomes)
+
+    def percentile(self, q: float):
+        """q-th percentile (0-100) of recent successful latencies, None without samples"""
+        if not self.latencies:
+            return None
+        if self._sorted_latencies is None:
+            self._sorted_latencies = sorted(self.latencies)
+        values = self._sorted_latencies
+        return values[min(len(values) - 1, max(0, math.ceil(q / 100 * len(values)) - 1))]
+
+    def timeout(self, default: float):
+        """Per-call timeout: multiplier x p99, clamped to [min_timeout, default]
+
+        The full default applies while samples are scarce, to half-open
+        probes, and after idle_reset seconds without a success.
+        """
+        if (
+            self.state != CLOSED
+            or len(self.latencies) < self.min_samples
+            or self.last_success_at is None
+            or self.clock() - self.last_success_at > self.idle_reset
+        ):
+            return default
+        return min(default, max(self.min_timeout, self.percentile(99) * self.timeout_multiplier))
+
+    def stats(self, default_timeout: float):
+        p50, p99 = self.percentile(50), self.percentile(99)
+        return {
+            'state': self.state,
+            'samples': len(self.latencies),
+            'p50': p50,
+            'p99': p99,
+            'error_rate': self.error_rate(),
+            'timeout': self.timeout(default_timeout),
+            'retry_in': self.retry_in(),
+            'rejected': self.rejected,
+            'outstanding': self.outstanding,
+        }
+
+
+class HealthTracker:
+    """EndpointHealth per endpoint URL, created on first use with shared settings"""
+
+    def __init__(self, rng=random, **settings):
+        self.rng = rng  # Replica sampling and tie-breaks
+        self.settings = settings
+        self.endpoints = {}  # {endpoint_url: EndpointHealth}
+
+    def get(self, endpoint_url: str):
+        health = self.endpoints.get(endpoint_url)
+        if health is None:
+            health = self.endpoints[endpoint_url] = EndpointHealth(**self.settings)
+        return health
+
+    def is_open(self, endpoint_url: str):
+        """True while calls to the endpoint would fail fast (no side effects)"""
+        health = self.endpoints.get(endpoint_url)
+        return health is not None and health.state == OPEN and health.retry_in() > 0
+
+    def pick(self, endpoints, strategy="p2c", exclude=()):
+        """Choose a replica endpoint for the next request
+
+        Open circuits are skipped unless every replica is open. 'p2c'
+        compares two random replicas, 'least_outstanding' all of them; the
+        one with fewer requests in flight wins, ties broken at random.
+
+        Returns:
+            An endpoint URL, or None when exclude leaves no candidate
+        """
+        candidates = [url for url in endpoints if url not in exclude]
+        if len(candidates) <= 1:
+            return candidates[0] if candidates else None
+
+        available = [url for url in candidates if not self.is_open(url)] or candidates
+        if strategy == "p2c" and len(available) > 2:
+            available = self.rng.sample(available, 2)
+
+        return min(available, key=lambda url: (self.get(url).outstanding, self.rng.random()))
+
+    def hedge_delay(self, endpoint_url: str, percentile=95.0, min_delay=0.05):
+        """Seconds to wait on endpoint_url before hedging, None until enough samples"""
+        health = self.get(endpoint_url)
+        if len(health.latencies) < health.min_samples:
+            return None
+        return max(min_delay, health.percentile(percentile))
+
+    def stats(self, default_timeout: float):
+        return {url: health.stats(default_timeout) for url, health in self.endpoints.items()}
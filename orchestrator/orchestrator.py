@@ -1,278 +1,1197 @@
 import httpx
 import asyncio
+import hashlib
+import json
+import logging
 import os
+import sys
+import threading
+import time
 from uuid import uuid4
 from a2a.client.client import Client
 from a2a.client.card_resolver import A2ACardResolver
-from a2a.types import MessageSendParams, SendMessageRequest
+from a2a.types import AgentCard, MessageSendParams, SendMessageRequest
+from httpx_sse import aconnect_sse
+
+# Sibling modules (works both as a script and when imported as orchestrator.orchestrator)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from routing import create_routing_engine
+from response_cache import ResponseCache, cache_policy_from_card, normalize_query, reply_ttl, side_effect_skills_from_card
+from health import HealthTracker
+
+# Shared modules at the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.log import (
+    configure_logging, flush_logs, get_logger, inject_request_id, log_enabled, new_request_id, request_context,
+)
+from common.tracing import CLIENT, current_span, get_tracer, inject, use_span
+
+tracer = get_tracer("orchestrator")
+logger = get_logger("orchestrator")
 
 # Configuration
 CONTEXT_FORGE_URL = "http://localhost:4444"
 VIRTUAL_SERVER_NAME = os.getenv("VIRTUAL_SERVER", "travel-suite")  # Virtual server to query
 
+# Discovery tuning
+DISCOVERY_CONCURRENCY = int(os.getenv("DISCOVERY_CONCURRENCY", "10"))  # Max parallel AgentCard fetches
+CARD_FETCH_TIMEOUT = float(os.getenv("CARD_FETCH_TIMEOUT", "5.0"))  # Seconds per AgentCard fetch
+DISCOVERY_CACHE_TTL = float(os.getenv("DISCOVERY_CACHE_TTL", "60.0"))  # Seconds before a cached registry is revalidated
+
+# On-disk registry snapshot for instant startup ('' disables): AgentCards and
+# registry fields as JSON, next to the other runtime data (DATA_DIR)
+DATA_DIR = os.getenv(
+    "DATA_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data"),
+)
+SNAPSHOT_PATH = os.getenv("AGENT_SNAPSHOT_PATH", os.path.join(DATA_DIR, "agent_snapshot.json"))
+SNAPSHOT_VERSION = 1  # JSON layout; bump only when the layout changes
+SNAPSHOT_REGISTRY_FIELDS = ('id', 'endpoint_url', 'updated_at', 'endpoints', 'replicas')
+
+# Routing tuning
+ROUTING_ENGINE = os.getenv("ROUTING_ENGINE", "bm25")  # 'bm25' (AgentCard skills) or 'keyword' (legacy table)
+ROUTE_DEADLINE = float(os.getenv("ROUTE_DEADLINE", "30.0"))  # Overall seconds to wait for matched agents
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "20"))  # Max in-flight agent calls in invoke_batch
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "1024"))  # LRU entries for cacheable skill responses (0 disables)
+SINGLE_FLIGHT = os.getenv("SINGLE_FLIGHT", "true").lower() == "true"  # Coalesce identical concurrent agent calls
+
+# HTTP connection pool (shared by discovery, invocation and the UI)
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", "20"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "30.0"))  # Seconds an idle connection is kept
+HTTP2_ENABLED = os.getenv("HTTP2_ENABLED", "true").lower() == "true"  # Negotiated via ALPN, HTTP/1.1 fallback
+INVOKE_TIMEOUT = float(os.getenv("INVOKE_TIMEOUT", "30.0"))  # Max seconds per agent JSON-RPC call
+
+# Per-endpoint circuit breaker and adaptive timeouts
+BREAKER_FAILURE_THRESHOLD = int(os.getenv("BREAKER_FAILURE_THRESHOLD", "5"))  # Consecutive failures that open the circuit
+BREAKER_ERROR_RATE = float(os.getenv("BREAKER_ERROR_RATE", "0.5"))  # Rolling error rate that opens the circuit
+BREAKER_COOLDOWN = float(os.getenv("BREAKER_COOLDOWN", "10.0"))  # Seconds open before a half-open probe (doubles per failed probe)
+BREAKER_MAX_COOLDOWN = float(os.getenv("BREAKER_MAX_COOLDOWN", "120.0"))
+HEALTH_WINDOW = int(os.getenv("HEALTH_WINDOW", "100"))  # Recent calls kept per endpoint
+HEALTH_MIN_SAMPLES = int(os.getenv("HEALTH_MIN_SAMPLES", "20"))  # Samples before p99 drives the timeout
+TIMEOUT_P99_MULTIPLIER = float(os.getenv("TIMEOUT_P99_MULTIPLIER", "2.0"))  # Adaptive timeout = multiplier x p99
+MIN_INVOKE_TIMEOUT = float(os.getenv("MIN_INVOKE_TIMEOUT", "1.0"))
+HEALTH_IDLE_RESET = float(os.getenv("HEALTH_IDLE_RESET", "300.0"))  # Idle seconds after which the full timeout applies (cold starts)
+
+# Replicated agents (registry entries whose AgentCards share a name)
+LOAD_BALANCER = os.getenv("LOAD_BALANCER", "p2c")  # 'p2c' (power of two choices) or 'least_outstanding'
+HEDGE_REQUESTS = os.getenv("HEDGE_REQUESTS", "false").lower() == "true"  # Race a second replica after a p95 delay
+HEDGE_PERCENTILE = float(os.getenv("HEDGE_PERCENTILE", "95.0"))  # Latency percentile to wait before hedging
+HEDGE_MIN_DELAY = float(os.getenv("HEDGE_MIN_DELAY", "0.05"))  # Floor on the hedge delay in seconds
+
+# Process-wide discovery cache, shared by every Orchestrator in the process
+# {(context_forge_url, virtual_server): {agents, fetched_at, etag, fingerprint}}
+DISCOVERY_CACHE = {}
+_REVALIDATION_TASKS = {}  # {cache key: asyncio.Task}
+NOT_MODIFIED = object()  # Registry listing answered 304 Not Modified
+
 def get_bearer_token():
     """Get bearer token from environment (read dynamically)"""
     return os.getenv("TOKEN")
 
+def create_http_client():
+    """Create the pooled keep-alive client used for all agent and registry traffic"""
+    http2 = HTTP2_ENABLED
+    if http2:
+        try:
+            import h2  # noqa: F401 - httpx needs the h2 package for HTTP/2
+        except ImportError:
+            http2 = False
+    
+    return httpx.AsyncClient(
+        http2=http2,
+        timeout=INVOKE_TIMEOUT,
+        limits=httpx.Limits(
+            max_connections=HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+            keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+        ),
+    )
+
+def _listing_fingerprint(registered_agents):
+    """Hash of the registry fields that affect discovery (ignores metrics)"""
+    fields = sorted(
+        (
+            str(a.get('id')),
+            str(a.get('name')),
+            str(a.get('endpoint_url') or a.get('endpointUrl')),
+            str(a.get('updated_at') or a.get('updatedAt')),
+            str(a.get('enabled')),
+        )
+        for a in registered_agents
+    )
+    return hashlib.sha256(json.dumps(fields).encode()).hexdigest()
+
+def _agent_info(agent_card, agent_name, agent):
+    """Registry entry of an agent built from its AgentCard (agent: its registry listing entry)"""
+    card_json = agent_card.model_dump_json()
+    return {
+        'name': agent_card.name or agent_name,  # Logical agent; replicas share it
+        'id': agent.get('id'),
+        'endpoint_url': agent.get('endpoint_url') or agent.get('endpointUrl'),
+        'updated_at': agent.get('updated_at') or agent.get('updatedAt'),
+        'card': agent_card,
+        'card_hash': hashlib.sha256(card_json.encode()).hexdigest(),
+        'cache_policy': cache_policy_from_card(agent_card),
+        'side_effects': side_effect_skills_from_card(agent_card),
+        'streaming': bool(agent_card.capabilities and agent_card.capabilities.streaming),
+        'skills': {
+            skill.id: {
+                'name': skill.name,
+                'description': skill.description,
+                'tags': skill.tags,
+                'examples': skill.examples
+            }
+            for skill in agent_card.skills
+        }
+    }
+
+def _parts_text(parts):
+    """Concatenated text of A2A message/artifact parts"""
+    return ''.join(part['text'] for part in parts if isinstance(part, dict) and 'text' in part)
+
+def _extract_reply(result_data):
+    """Text and metadata of a message/send result (a Message or a Task)
+    
+    Returns:
+        (text, metadata) - text is None when the result holds no text
+    """
+    if not isinstance(result_data, dict):
+        return str(result_data), {}
+    
+    if 'artifacts' in result_data or result_data.get('kind') == 'task':
+        artifacts = result_data.get('artifacts') or []
+        text = ''.join(_parts_text(artifact.get('parts', [])) for artifact in artifacts)
+        metadata = {}
+        for artifact in artifacts:
+            metadata.update(artifact.get('metadata') or {})
+        if result_data.get('status', {}).get('state') == 'failed':
+            return "Agent task failed", None
+        return (text or None), metadata
+    
+    if 'parts' in result_data:
+        texts = [part['text'] for part in result_data['parts'] if isinstance(part, dict) and 'text' in part]
+        return (' '.join(texts) if texts else None), result_data.get('metadata') or {}
+    
+    return str(result_data), {}
+
+def _circuit_open_reply(agent_name, health):
+    """Fast-failure text for a call rejected by an open circuit"""
+    return f"⚡ {agent_name} unavailable (circuit open, retry in {health.retry_in():.0f}s)"
+
+def _record_outcome(health, healthy, started):
+    """Feed one call's outcome to the endpoint's health model
+    
+    healthy is True/False for a finished call and None when the call was
+    abandoned (cancelled) before an outcome was known.
+    """
+    if healthy is None:
+        health.release()
+    elif healthy:
+        health.record_success(time.monotonic() - started)
+    else:
+        health.record_failure()
+
+def _registry_version(agent):
+    """(id, endpoint, updated_at) of a listing entry or registry entry"""
+    return (
+        agent.get('id'),
+        agent.get('endpoint_url') or agent.get('endpointUrl'),
+        agent.get('updated_at') or agent.get('updatedAt'),
+    )
+
 class Orchestrator:
     """Orchestrator that discovers and routes tasks to A2A agents via Context Forge"""
     
-    def __init__(self):
-        self.agents = {}  # {agent_name: {id, endpoint_url, card, skills}}
+    def __init__(self, discovery_concurrency=DISCOVERY_CONCURRENCY, card_timeout=CARD_FETCH_TIMEOUT,
+                 route_deadline=ROUTE_DEADLINE, routing_engine=ROUTING_ENGINE, cache_ttl=DISCOVERY_CACHE_TTL):
+        self.agents = {}  # {agent_name: {id, endpoint_url, endpoints, replicas, card, skills}}
+        self.routing_engine = routing_engine
+        self.router = create_routing_engine(routing_engine)  # Re-synced after each discovery
+        self.response_cache = ResponseCache(RESPONSE_CACHE_SIZE)
+        self.single_flight = SINGLE_FLIGHT
+        self._in_flight = {}  # {(agent_name, endpoint_url, normalized query): asyncio.Task}
+        self.coalesced_calls = 0  # Calls served by joining an identical in-flight request
+        self.health = HealthTracker(
+            window=HEALTH_WINDOW,
+            min_samples=HEALTH_MIN_SAMPLES,
+            failure_threshold=BREAKER_FAILURE_THRESHOLD,
+            error_rate_threshold=BREAKER_ERROR_RATE,
+            cooldown=BREAKER_COOLDOWN,
+            max_cooldown=BREAKER_MAX_COOLDOWN,
+            timeout_multiplier=TIMEOUT_P99_MULTIPLIER,
+            min_timeout=MIN_INVOKE_TIMEOUT,
+            idle_reset=HEALTH_IDLE_RESET,
+        )  # {endpoint_url: EndpointHealth}
+        self.load_balancer = LOAD_BALANCER
+        self.hedge_requests = HEDGE_REQUESTS
+        self.hedged_calls = 0  # Calls that raced a second replica
+        self.hedge_wins = 0  # Hedged calls answered by the second replica
+        self.discovery_concurrency = max(1, discovery_concurrency)
+        self.card_timeout = card_timeout
+        self.route_deadline = route_deadline
+        self.cache_ttl = cache_ttl
+        self.last_discovery_seconds = None  # Wall-clock time of the last discovery
+        self.client = None  # Long-lived pooled httpx client, see start()/close()
+    
+    async def start(self):
+        """Open the shared HTTP client (idempotent)"""
+        if self.client is None or self.client.is_closed:
+            self.client = create_http_client()
+        return self
+    
+    async def close(self):
+        """Close the shared HTTP client and release pooled connections"""
+        if self.client is not None and not self.client.is_closed:
+            await self.client.aclose()
+        self.client = None
+    
+    async def __aenter__(self):
+        return await self.start()
+    
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+    
+    async def _get_client(self):
+        """Return the shared client, opening it lazily for callers that skip start()"""
+        if self.client is None or self.client.is_closed:
+            await self.start()
+        return self.client
         
     async def discover_agents(self, use_virtual_server=True):
         """Discover agents from Context Forge registry
         
+        Builds a fresh registry and swaps it in when complete, then stores it
+        in the process-wide discovery cache.
+        
         Args:
             use_virtual_server: If True, filters agents by virtual server.
                               If False, queries all agents.
         """
-        print("\n🔍 Discovering agents from Context Forge...")
+        logger.info("🔍 Discovering agents from Context Forge...")
+        started = time.perf_counter()
         
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            # Get all agents first
-            token = get_bearer_token()
-            response = await client.get(
-                f"{CONTEXT_FORGE_URL}/a2a",
-                headers={"Authorization": f"Bearer {token}"}
-            )
+        with tracer.start_as_current_span('discover_agents') as span:
+            registered_agents, etag = await self._fetch_registry_listing(use_virtual_server)
+            if registered_agents is None:
+                span.set_error("registry listing unavailable")
+                return
             
-            if response.status_code != 200:
-                print(f"❌ Failed to fetch agents: {response.status_code}")
+            failed = await self._load_agent_cards(registered_agents)
+            self._store_discovery(use_virtual_server, registered_agents, etag, complete=not failed)
+            self.last_discovery_seconds = time.perf_counter() - started
+            
+            total_skills = sum(len(info['skills']) for info in self.agents.values())
+            span.set_attributes({'agents': len(self.agents), 'skills': total_skills})
+        logger.info("✨ Discovery complete: %d agents, %d skills in %.2fs",
+                    len(self.agents), total_skills, self.last_discovery_seconds,
+                    extra={'agents': len(self.agents), 'skills': total_skills,
+                           'duration_ms': round(self.last_discovery_seconds * 1000, 1)})
+    
+    async def ensure_agents(self, use_virtual_server=True):
+        """Load agents from the discovery cache, discovering only on a cold miss
+        
+        Fresh entries are used as-is. Stale entries are served immediately
+        while a background task revalidates them against Context Forge. On a
+        cold start the on-disk snapshot is loaded and treated as stale.
+        """
+        key = self._cache_key(use_virtual_server)
+        entry = DISCOVERY_CACHE.get(key)
+        if entry is None:
+            entry = self._load_snapshot(use_virtual_server)
+            if entry is None:
+                await self.discover_agents(use_virtual_server)
+                return
+            DISCOVERY_CACHE[key] = entry
+        
+        if entry['agents'] is not self.agents:
+            self.agents = entry['agents']
+            self.router.sync(self.agents)
+        
+        if time.monotonic() - entry['fetched_at'] > self.cache_ttl:
+            self._schedule_revalidation(use_virtual_server)
+    
+    async def revalidate_agents(self, use_virtual_server=True):
+        """Conditionally revalidate the cached registry against Context Forge
+        
+        Sends If-None-Match with the cached ETag and compares a fingerprint of
+        the listing (ids, endpoints, update times). AgentCards are refetched
+        only when the listing actually changed.
+        """
+        key = self._cache_key(use_virtual_server)
+        entry = DISCOVERY_CACHE.get(key)
+        if entry is None:
+            await self.discover_agents(use_virtual_server)
+            return
+        
+        with tracer.start_as_current_span('revalidate_agents') as span:
+            try:
+                registered_agents, etag = await self._fetch_registry_listing(
+                    use_virtual_server, etag=entry['etag'], quiet=True
+                )
+            except Exception as e:
+                span.set_error(e)
+                logger.warning("⚠️  Registry revalidation failed, serving cached agents: %s", e)
                 return
+            if registered_agents is None:
+                return  # Keep serving stale results; the next request retries
             
-            all_agents = response.json()
+            if registered_agents is NOT_MODIFIED or _listing_fingerprint(registered_agents) == entry['fingerprint']:
+                span.set_attribute('changed', False)
+                entry['fetched_at'] = time.monotonic()
+                entry['etag'] = etag or entry['etag']
+                return
             
-            # Filter by virtual server if configured
-            if use_virtual_server and VIRTUAL_SERVER_NAME:
-                print(f"   Filtering by virtual server: {VIRTUAL_SERVER_NAME}")
-                
-                # Get virtual server details
-                token = get_bearer_token()
+            span.set_attribute('changed', True)
+            logger.info("🔄 Agent registry changed, refreshing changed agents...")
+            failed = await self._load_agent_cards(registered_agents, incremental=True)
+            self._store_discovery(use_virtual_server, registered_agents, etag, complete=not failed)
+    
+    async def refresh_agents(self, use_virtual_server=True):
+        """Incrementally refresh the registry from the current Context Forge listing
+        
+        Only agents that are new or whose id, endpoint or updated_at changed
+        have their AgentCard fetched; removed agents are dropped. The new
+        registry and routing index are swapped in at once, so queries in
+        flight keep working and cost scales with the change set.
+        """
+        logger.info("🔄 Refreshing agents from Context Forge...")
+        started = time.perf_counter()
+        
+        with tracer.start_as_current_span('refresh_agents') as span:
+            registered_agents, etag = await self._fetch_registry_listing(use_virtual_server, quiet=True)
+            if registered_agents is None:
+                span.set_error("registry listing unavailable")
+                return
+            
+            failed = await self._load_agent_cards(registered_agents, incremental=True)
+            self._store_discovery(use_virtual_server, registered_agents, etag, complete=not failed)
+            self.last_discovery_seconds = time.perf_counter() - started
+            span.set_attribute('agents', len(self.agents))
+        logger.info("✨ Refresh complete: %d agents in %.2fs", len(self.agents), self.last_discovery_seconds,
+                    extra={'agents': len(self.agents), 'duration_ms': round(self.last_discovery_seconds * 1000, 1)})
+    
+    def invalidate_discovery_cache(self, use_virtual_server=True):
+        """Drop the cached registry so the next ensure_agents() rediscovers"""
+        DISCOVERY_CACHE.pop(self._cache_key(use_virtual_server), None)
+    
+    def _cache_key(self, use_virtual_server):
+        """Discovery cache key: Context Forge URL and virtual server filter"""
+        return (CONTEXT_FORGE_URL, VIRTUAL_SERVER_NAME if use_virtual_server else None)
+    
+    def _schedule_revalidation(self, use_virtual_server):
+        """Start one background revalidation per cache key"""
+        key = self._cache_key(use_virtual_server)
+        task = _REVALIDATION_TASKS.get(key)
+        if task is not None and not task.done():
+            return
+        _REVALIDATION_TASKS[key] = asyncio.create_task(self.revalidate_agents(use_virtual_server))
+    
+    def _store_discovery(self, use_virtual_server, registered_agents, etag, complete=True):
+        """Record the current registry in the discovery cache and on-disk snapshot
+        
+        An incomplete registry (some AgentCards failed to load) is stored
+        without ETag or fingerprint, so the next revalidation treats the
+        listing as changed and retries the failed fetches.
+        """
+        entry = {
+            'agents': self.agents,
+            'fetched_at': time.monotonic(),
+            'etag': etag if complete else None,
+            'fingerprint': _listing_fingerprint(registered_agents) if complete else None,
+        }
+        DISCOVERY_CACHE[self._cache_key(use_virtual_server)] = entry
+        self._save_snapshot(use_virtual_server, entry)
+    
+    def _save_snapshot(self, use_virtual_server, entry):
+        """Persist the registry as JSON: each agent's AgentCard and registry fields, plus the ETag
+        
+        Plain data only, so loading a snapshot never runs code; the routing
+        index is rebuilt from the cards on load.
+        """
+        if not SNAPSHOT_PATH:
+            return
+        if any(info.get('card') is None for info in entry['agents'].values()):
+            return  # Nothing to rebuild those agents from
+        snapshot = {
+            'version': SNAPSHOT_VERSION,
+            'key': list(self._cache_key(use_virtual_server)),
+            'saved_at': time.time(),
+            'agents': {
+                agent_name: {
+                    'card': info['card'].model_dump(mode='json'),
+                    'registry': {field: info.get(field) for field in SNAPSHOT_REGISTRY_FIELDS},
+                }
+                for agent_name, info in entry['agents'].items()
+            },
+            'etag': entry['etag'],
+            'fingerprint': entry['fingerprint'],
+        }
+        tmp_path = f"{SNAPSHOT_PATH}.tmp"
+        try:
+            directory = os.path.dirname(SNAPSHOT_PATH)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(tmp_path, 'w') as f:
+                json.dump(snapshot, f)
+            os.replace(tmp_path, SNAPSHOT_PATH)  # Atomic: readers never see a partial file
+        except Exception as e:
+            logger.warning("⚠️  Failed to save agent snapshot: %s", e)
+    
+    def _load_snapshot(self, use_virtual_server):
+        """Load the on-disk snapshot as a stale cache entry, or None if unusable"""
+        if not SNAPSHOT_PATH or not os.path.exists(SNAPSHOT_PATH):
+            return None
+        try:
+            with open(SNAPSHOT_PATH) as f:
+                snapshot = json.load(f)
+            if snapshot.get('version') != SNAPSHOT_VERSION or snapshot.get('key') != list(self._cache_key(use_virtual_server)):
+                return None
+            agents = {
+                agent_name: {
+                    **_agent_info(AgentCard.model_validate(saved['card']), agent_name, {}),
+                    **saved['registry'],
+                }
+                for agent_name, saved in snapshot['agents'].items()
+            }
+        except Exception as e:
+            logger.warning("⚠️  Ignoring unreadable agent snapshot: %s", e)
+            return None
+        
+        age = time.time() - snapshot['saved_at']
+        logger.info("⚡ Loaded %d agents from snapshot (%.0fs old), reconciling with Context Forge in the background",
+                    len(agents), age, extra={'agents': len(agents)})
+        return {
+            'agents': agents,
+            'fetched_at': float('-inf'),  # Always stale: revalidate right away
+            'etag': snapshot['etag'],
+            'fingerprint': snapshot['fingerprint'],
+        }
+    
+    async def _fetch_registry_listing(self, use_virtual_server, etag=None, quiet=False):
+        """Fetch the registered agents from Context Forge, filtered by virtual server
+        
+        Returns:
+            (registered_agents, etag) - registered_agents is NOT_MODIFIED when
+            the server answered 304, or None when the listing could not be fetched
+        """
+        client = await self._get_client()
+        
+        # Get all agents first
+        token = get_bearer_token()
+        headers = {"Authorization": f"Bearer {token}"}
+        if etag:
+            headers["If-None-Match"] = etag
+        with tracer.start_as_current_span('context_forge.list_agents', kind=CLIENT) as span:
+            response = await client.get(f"{CONTEXT_FORGE_URL}/a2a", headers=headers)
+            span.set_attribute('http.status_code', response.status_code)
+        
+        if response.status_code == 304:
+            return NOT_MODIFIED, etag
+        
+        if response.status_code != 200:
+            logger.error("❌ Failed to fetch agents: %s", response.status_code, extra={'status_code': response.status_code})
+            return None, None
+        
+        all_agents = response.json()
+        etag = response.headers.get("ETag")
+        
+        # Filter by virtual server if configured
+        if use_virtual_server and VIRTUAL_SERVER_NAME:
+            if not quiet:
+                logger.info("Filtering by virtual server: %s", VIRTUAL_SERVER_NAME)
+            
+            # Get virtual server details
+            token = get_bearer_token()
+            with tracer.start_as_current_span('context_forge.list_servers', kind=CLIENT) as span:
                 servers_response = await client.get(
                     f"{CONTEXT_FORGE_URL}/servers",
                     headers={"Authorization": f"Bearer {token}"}
                 )
+                span.set_attribute('http.status_code', servers_response.status_code)
+            
+            if servers_response.status_code == 200:
+                servers = servers_response.json()
+                target_server = next((s for s in servers if s['name'] == VIRTUAL_SERVER_NAME), None)
                 
-                if servers_response.status_code == 200:
-                    servers = servers_response.json()
-                    target_server = next((s for s in servers if s['name'] == VIRTUAL_SERVER_NAME), None)
-                    
-                    if target_server and 'associatedA2aAgents' in target_server:
-                        associated_ids = set(target_server['associatedA2aAgents'])
-                        registered_agents = [a for a in all_agents if a.get('id') in associated_ids]
-                        print(f"   ✅ Found {len(registered_agents)} agents in virtual server")
-                    else:
-                        print(f"   ⚠️  Virtual server '{VIRTUAL_SERVER_NAME}' not found or has no agents")
-                        print(f"   Falling back to all agents")
-                        registered_agents = all_agents
+                if target_server and 'associatedA2aAgents' in target_server:
+                    associated_ids = set(target_server['associatedA2aAgents'])
+                    registered_agents = [a for a in all_agents if a.get('id') in associated_ids]
+                    if not quiet:
+                        logger.info("✅ Found %d agents in virtual server", len(registered_agents))
                 else:
-                    print(f"   ⚠️  Failed to fetch virtual servers, using all agents")
+                    logger.warning("⚠️  Virtual server '%s' not found or has no agents, falling back to all agents",
+                                   VIRTUAL_SERVER_NAME)
                     registered_agents = all_agents
             else:
-                print(f"   Using all agents")
+                logger.warning("⚠️  Failed to fetch virtual servers, using all agents",
+                               extra={'status_code': servers_response.status_code})
                 registered_agents = all_agents
-            
-            print(f"✅ Discovered {len(registered_agents)} agents total\n")
-            
-            # Fetch AgentCard from each agent
-            for agent in registered_agents:
-                agent_id = agent.get('id')
-                agent_name = agent.get('name')
-                # Handle both snake_case and camelCase
-                endpoint_url = agent.get('endpoint_url') or agent.get('endpointUrl')
-                
-                if not endpoint_url:
-                    print(f"  ⚠️  Skipping {agent_name}: No endpoint URL")
+        else:
+            if not quiet:
+                logger.info("Using all agents")
+            registered_agents = all_agents
+        
+        if not quiet:
+            logger.info("✅ Discovered %d agents total", len(registered_agents))
+        return registered_agents, etag
+    
+    async def _load_agent_cards(self, registered_agents, incremental=False):
+        """Fetch AgentCards for a listing and atomically swap in the new registry
+        
+        Registry entries whose AgentCards share a name are replicas of one
+        logical agent: they are grouped under that name with every endpoint
+        in 'endpoints', and the first replica in listing order supplies the
+        card and skills. Agents whose card is unchanged keep their previous
+        skills, so the routing engine only re-indexes what actually changed.
+        
+        Args:
+            registered_agents: Agent listing from Context Forge
+            incremental: If True, only fetch cards for entries that are new or
+                         whose id, endpoint or updated_at changed
+        
+        Returns:
+            Registry names of the agents whose AgentCard failed to load
+        """
+        client = await self._get_client()
+        
+        # {registry version: logical name} and {registry name: (logical name,
+        # replica)} for the replicas of the current registry
+        known = {}
+        by_registry_name = {}
+        for agent_name, agent_info in self.agents.items():
+            for replica in agent_info.get('replicas', ()):
+                known[_registry_version(replica)] = agent_name
+                by_registry_name[replica['name']] = (agent_name, replica)
+        
+        to_fetch = [
+            agent for agent in registered_agents
+            if not (incremental and _registry_version(agent) in known)
+        ]
+        
+        # Fetch AgentCards concurrently over the pooled client so a slow
+        # agent only costs its own timeout instead of delaying the others
+        semaphore = asyncio.Semaphore(self.discovery_concurrency)
+        results = await asyncio.gather(*[
+            self._fetch_agent_card(client, semaphore, agent)
+            for agent in to_fetch
+        ])
+        fetched = {}  # {registry version: agent_info}
+        failed = []
+        for agent, (registry_name, agent_info, error) in zip(to_fetch, results):
+            if agent_info is not None:
+                fetched[_registry_version(agent)] = agent_info
+                skill_count = len(agent_info['skills'])
+                logger.info("✅ Loaded %s: %d skills", registry_name, skill_count,
+                            extra={'agent': registry_name, 'skills': skill_count})
+            elif error:
+                failed.append(registry_name)
+                logger.warning("❌ Failed to load %s: %s", registry_name, error, extra={'agent': registry_name})
+        
+        # Group replicas by logical agent, keeping listing order
+        groups = {}  # {logical name: [(replica, agent_info)]}
+        for agent in registered_agents:
+            registry_name = agent.get('name')
+            agent_info = fetched.get(_registry_version(agent))
+            replica = {
+                'id': agent.get('id'),
+                'name': registry_name,
+                'endpoint_url': agent.get('endpoint_url') or agent.get('endpointUrl'),
+                'updated_at': agent.get('updated_at') or agent.get('updatedAt'),
+            }
+            if agent_info is not None:
+                agent_name = agent_info['name']
+            else:
+                # Unchanged entry, or (incremental) a failed fetch that keeps
+                # serving the last known card
+                agent_name = known.get(_registry_version(agent)) if incremental else None
+                if agent_name is None and incremental and registry_name in failed:
+                    agent_name, previous_replica = by_registry_name.get(registry_name, (None, None))
+                    if previous_replica is not None:
+                        # Keep the version the card was fetched for, so the
+                        # next refresh sees a change and retries the fetch
+                        replica = {**replica, 'id': previous_replica['id'],
+                                   'endpoint_url': previous_replica['endpoint_url'],
+                                   'updated_at': previous_replica['updated_at']}
+                if agent_name is None or agent_name not in self.agents:
                     continue
-                
+                agent_info = self.agents[agent_name]
+            groups.setdefault(agent_name, []).append((replica, agent_info))
+        
+        agents = {}
+        for agent_name, members in groups.items():
+            replicas = [replica for replica, _ in members]
+            primary = members[0][1]
+            previous = self.agents.get(agent_name)
+            if previous is not None and previous.get('card_hash') == primary['card_hash']:
+                if previous.get('replicas') == replicas:
+                    agents[agent_name] = previous
+                    continue
+                primary = previous  # Same card: keep its skills (and index entry)
+            agents[agent_name] = {
+                **primary,
+                'id': replicas[0]['id'],
+                'endpoint_url': replicas[0]['endpoint_url'],
+                'updated_at': replicas[0]['updated_at'],
+                'endpoints': [replica['endpoint_url'] for replica in replicas],
+                'replicas': replicas,
+            }
+            if len(replicas) > 1:
+                logger.info("🔁 %s: %d replicas", agent_name, len(replicas), extra={'agent': agent_name})
+        
+        if incremental:
+            removed = [name for name in self.agents if name not in agents]
+            unchanged = len(registered_agents) - len(to_fetch)
+            logger.info("%d unchanged, %d fetched, %d removed%s", unchanged, len(to_fetch), len(removed),
+                        f" ({', '.join(removed)})" if removed else "")
+        if failed:
+            logger.warning("⚠️  %d agent(s) unavailable: %s", len(failed), ', '.join(failed), extra={'failed': failed})
+        
+        # Swap in the new registry, then re-index only agents whose skills
+        # changed. Neither step awaits, so queries on the event loop see
+        # either the old or the new registry and index, never a mix.
+        self.agents = agents
+        self.router.sync(self.agents)
+        return failed
+    
+    async def _fetch_agent_card(self, httpx_client, semaphore, agent):
+        """Fetch one AgentCard, bounded by the discovery semaphore and timeout
+        
+        Returns:
+            (agent_name, agent_info, error) - agent_info is None on failure
+        """
+        agent_name = agent.get('name')
+        # Handle both snake_case and camelCase
+        endpoint_url = agent.get('endpoint_url') or agent.get('endpointUrl')
+        
+        if not endpoint_url:
+            logger.warning("⚠️  Skipping %s: No endpoint URL", agent_name)
+            return agent_name, None, None
+        
+        async with semaphore:
+            logger.debug("📋 Fetching AgentCard from %s", agent_name)
+            with tracer.start_as_current_span(
+                'agent_card.fetch', kind=CLIENT, attributes={'agent': agent_name, 'endpoint': endpoint_url}
+            ) as span:
                 try:
-                    print(f"  📋 Fetching AgentCard from {agent_name}")
-                    
-                    # Use A2A SDK to fetch AgentCard
-                    async with httpx.AsyncClient() as httpx_client:
-                        resolver = A2ACardResolver(
-                            httpx_client=httpx_client,
-                            base_url=endpoint_url,
-                        )
-                        
-                        # This fetches from /.well-known/agent.json
-                        agent_card = await resolver.get_agent_card()
-                        
-                        # Store agent info
-                        self.agents[agent_name] = {
-                            'id': agent_id,
-                            'endpoint_url': endpoint_url,
-                            'card': agent_card,
-                            'skills': {
-                                skill.id: {
-                                    'name': skill.name,
-                                    'description': skill.description,
-                                    'examples': skill.examples
-                                }
-                                for skill in agent_card.skills
-                            }
-                        }
-                        
-                        skill_count = len(agent_card.skills)
-                        print(f"  ✅ Loaded {agent_name}: {skill_count} skills")
-                        
+                    # Use A2A SDK to fetch AgentCard from /.well-known/agent.json
+                    resolver = A2ACardResolver(
+                        httpx_client=httpx_client,
+                        base_url=endpoint_url,
+                    )
+                    agent_card = await asyncio.wait_for(
+                        resolver.get_agent_card(),
+                        timeout=self.card_timeout,
+                    )
+                except asyncio.TimeoutError:
+                    span.set_error("timeout")
+                    return agent_name, None, f"timed out after {self.card_timeout:.1f}s"
                 except Exception as e:
-                    print(f"  ❌ Failed to load {agent_name}: {e}")
+                    span.set_error(e)
+                    return agent_name, None, str(e)
         
-        total_skills = sum(len(info['skills']) for info in self.agents.values())
-        print(f"\n✨ Discovery complete: {len(self.agents)} agents, {total_skills} skills\n")
+        return agent_name, _agent_info(agent_card, agent_name, agent), None
     
     def match_query_to_skills(self, query: str):
-        """Match user query to agent skills using improved keyword matching"""
-        query_lower = query.lower()
-        matched = []
+        """Match user query to agent skills using the configured routing engine
         
-        # Define stop words to ignore
-        stop_words = {'a', 'an', 'the', 'in', 'on', 'at', 'to', 'for', 'of', 'and', 'or', 'is', 'are', 'was', 'were', 'be', 'been', 'being', 'have', 'has', 'had', 'do', 'does', 'did', 'will', 'would', 'should', 'could', 'may', 'might', 'can', 'what', 'when', 'where', 'who', 'how', 'i', 'you', 'me', 'my', 'your'}
+        Returns:
+            Matches sorted by score (highest first), one per agent
+        """
+        with tracer.start_as_current_span('routing.match', attributes={'engine': self.routing_engine}) as span:
+            matches = self.router.match(query)
+            if span.recording:
+                span.set_attribute('matches', [f"{m['agent_name']}.{m['skill_id']}" for m in matches])
+            return matches
+    
+    def route_batch(self, queries):
+        """Match many queries at once (one vectorized pass per chunk for bm25)
         
-        # Extract meaningful keywords from query (filter out stop words and numbers)
-        query_words = [w for w in query_lower.split() if w not in stop_words and not w.replace('.', '').replace('-', '').isdigit()]
+        Returns:
+            One match list per query, in the same order as queries
+        """
+        return self.router.match_batch(queries)
+    
+    async def invoke_batch(self, queries, matches=None, concurrency=BATCH_CONCURRENCY):
+        """Dispatch the agent calls for many routed queries with bounded concurrency
         
-        # Define strong keyword mappings for each agent type
-        agent_keywords = {
-            'weather_agent': ['weather', 'temperature', 'forecast', 'rain', 'sunny', 'cloudy', 'pack', 'packing', 'climate'],
-            'calculator_agent': ['calculate', 'convert', 'currency', 'usd', 'eur', 'gbp', 'jpy', 'fahrenheit', 'celsius', 'math', 'add', 'subtract', 'multiply', 'divide'],
-            'travel_agent': ['travel', 'destination', 'recommend', 'trip', 'visit', 'budget', 'tips', 'romantic', 'adventure', 'vacation']
-        }
+        Args:
+            queries: Queries to answer
+            matches: Per-query match lists from route_batch (computed if omitted)
+            concurrency: Max agent calls in flight at once
         
-        for agent_name, agent_info in self.agents.items():
-            agent_score = 0
-            matched_skills = []
+        Returns:
+            Per query, a list of {agent_name, skill_id, result} in score order
+        """
+        queries = list(queries)
+        if matches is None:
+            matches = self.route_batch(queries)
+        semaphore = asyncio.Semaphore(max(1, concurrency))
+        
+        async def call(query, match):
+            async with semaphore:
+                result = await self.invoke_agent(match['agent_name'], query, match['endpoint'], match['skill_id'])
+            return {'agent_name': match['agent_name'], 'skill_id': match['skill_id'], 'result': result}
+        
+        calls = [
+            asyncio.gather(*[call(query, match) for match in query_matches])
+            for query, query_matches in zip(queries, matches)
+        ]
+        return [list(results) for results in await asyncio.gather(*calls)]
+    
+    async def invoke_agent(self, agent_name: str, query: str, endpoint_url: str = None, skill_id: str = None):
+        """Invoke an agent using direct JSON-RPC 2.0 call
+        
+        Responses for skills the agent marks cacheable are served from the
+        response cache. Replicated agents are load-balanced (and optionally
+        hedged) across their endpoints.
+        
+        Args:
+            endpoint_url: Endpoint captured at routing time, so a query in
+                          flight survives a registry refresh
+            skill_id: Skill chosen by routing, used for the cache policy
+        """
+        with tracer.start_as_current_span('invoke_agent', attributes={'agent': agent_name, 'skill': skill_id}) as span:
+            agent_info = self.agents.get(agent_name)
+            endpoints = self._replica_endpoints(agent_info, endpoint_url)
+            if not endpoints:
+                span.set_error("agent not found")
+                return f"Agent {agent_name} not found"
             
-            # Check if query contains agent-specific keywords
-            if agent_name in agent_keywords:
-                for keyword in agent_keywords[agent_name]:
-                    if keyword in query_lower:
-                        agent_score += 10  # Strong match
+            policy = agent_info.get('cache_policy', {}) if agent_info else {}
+            cache_key = None
+            if skill_id and policy.get(skill_id, 0) > 0:
+                cache_key = ResponseCache.key(agent_name, skill_id, query)
+                cached = self.response_cache.get(cache_key)
+                span.set_attribute('cache', 'miss' if cached is None else 'hit')
+                if cached is not None:
+                    return cached
             
-            # Check each skill
-            for skill_id, skill in agent_info['skills'].items():
-                skill_score = 0
-                desc_lower = skill['description'].lower()
-                name_lower = skill['name'].lower()
-                
-                # Check skill name and description for meaningful keywords
-                for word in query_words:
-                    if len(word) > 2:  # Only consider words longer than 2 chars
-                        if word in name_lower:
-                            skill_score += 5
-                        if word in desc_lower:
-                            skill_score += 3
-                
-                # If skill has a good score, add it
-                if skill_score > 0:
-                    matched_skills.append({
-                        'skill_id': skill_id,
-                        'skill_name': skill['name'],
-                        'score': skill_score
-                    })
+            # Agents with side-effecting skills are never coalesced or hedged:
+            # routing may pick the wrong skill, and each send must happen exactly once
+            idempotent = agent_info is not None and not agent_info.get('side_effects')
+            text, metadata = await self._send_coalesced(
+                agent_name, endpoints, query, self.single_flight and idempotent, self.hedge_requests and idempotent
+            )
+            if metadata is None:
+                span.set_error(text)
             
-            # If agent has matched skills or strong keyword match, add to results
-            if matched_skills or agent_score > 0:
-                total_score = agent_score + sum(s['score'] for s in matched_skills)
-                matched.append({
-                    'agent_name': agent_name,
-                    'skill_id': matched_skills[0]['skill_id'] if matched_skills else list(agent_info['skills'].keys())[0],
-                    'skill_name': matched_skills[0]['skill_name'] if matched_skills else list(agent_info['skills'].values())[0]['name'],
-                    'endpoint': agent_info['endpoint_url'],
-                    'score': total_score
-                })
-        
-        # Sort by score (highest first) and return only high-scoring matches
-        matched.sort(key=lambda x: x['score'], reverse=True)
-        
-        # Filter: only return matches with score > 5 (meaningful matches)
-        return [m for m in matched if m['score'] > 5]
-    
-    async def invoke_agent(self, agent_name: str, query: str):
-        """Invoke an agent using direct JSON-RPC 2.0 call"""
-        agent_info = self.agents.get(agent_name)
+            if cache_key and metadata is not None:
+                # Agents may report the skill they actually ran (or that none
+                # did); its policy wins, so a mis-routed side-effecting call or
+                # a usage reply is never cached
+                self.response_cache.put(cache_key, text, reply_ttl(policy, skill_id, metadata))
+            return text
+    
+    @staticmethod
+    def _replica_endpoints(agent_info, endpoint_url=None):
+        """Endpoints to balance a call over
+        
+        All of the agent's replicas, unless endpoint_url (captured at routing
+        time) is no longer one of them after a refresh: then only it.
+        """
         if not agent_info:
-            return f"Agent {agent_name} not found"
+            return [endpoint_url] if endpoint_url else []
+        endpoints = agent_info.get('endpoints') or [agent_info['endpoint_url']]
+        if endpoint_url is not None and endpoint_url not in endpoints:
+            return [endpoint_url]
+        return endpoints
+    
+    async def _send_coalesced(self, agent_name: str, endpoints, query: str, coalesce: bool, hedge: bool = False):
+        """Send a message, sharing one in-flight request among identical concurrent calls
         
-        endpoint_url = agent_info['endpoint_url']
+        The shared request is shielded, so a caller hitting its deadline
+        does not cancel the call for the other waiters.
+        """
+        if not coalesce:
+            return await self._send_balanced(agent_name, endpoints, query, hedge)
+        
+        key = (agent_name, tuple(endpoints), normalize_query(query))
+        task = self._in_flight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._send_balanced(agent_name, endpoints, query, hedge))
+            self._in_flight[key] = task
+            task.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        else:
+            self.coalesced_calls += 1
+            current_span().set_attribute('coalesced', True)  # The call's spans belong to the first caller's trace
+        return await asyncio.shield(task)
+    
+    async def _send_balanced(self, agent_name: str, endpoints, query: str, hedge: bool = False):
+        """Send to one replica picked by the load balancer, hedging to a second one
+        
+        With hedging, if the first replica has not answered within its p95
+        latency, the same request goes to another replica and the first
+        successful reply wins; the other request is cancelled. Only callers
+        for agents without side effects may hedge.
+        """
+        primary = self.health.pick(endpoints, self.load_balancer)
+        delay = None
+        if hedge and len(endpoints) > 1:
+            delay = self.health.hedge_delay(primary, HEDGE_PERCENTILE, HEDGE_MIN_DELAY)
+        if delay is None:
+            return await self._send_message(agent_name, primary, query)
+        
+        first = asyncio.ensure_future(self._send_message(agent_name, primary, query))
+        pending = {first}
+        try:
+            done, _ = await asyncio.wait(pending, timeout=delay)
+            if done:
+                return first.result()
+            
+            secondary = self.health.pick(endpoints, self.load_balancer, exclude=(primary,))
+            self.hedged_calls += 1
+            current_span().set_attribute('hedged_after_ms', delay * 1000)
+            pending.add(asyncio.ensure_future(self._send_message(agent_name, secondary, query)))
+            while True:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    text, metadata = task.result()
+                    # A failed reply only counts once no other request is left
+                    if metadata is not None or not pending:
+                        if task is not first:
+                            self.hedge_wins += 1
+                            current_span().set_attribute('hedge_won', True)
+                        return text, metadata
+        finally:
+            for task in pending:
+                task.cancel()
+    
+    async def _send_message(self, agent_name: str, endpoint_url: str, query: str):
+        """Send one JSON-RPC message/send request through the endpoint's circuit breaker
+        
+        Returns:
+            (text, metadata) - metadata is the response message metadata
+            (possibly empty) on success, None on any failure
+        """
+        with tracer.start_as_current_span(
+            'a2a.send', kind=CLIENT, attributes={'agent': agent_name, 'endpoint': endpoint_url}
+        ) as span:
+            text, metadata = await self._post_message(agent_name, endpoint_url, query, span)
+            if metadata is None:
+                span.set_error(text)
+            return text, metadata
+    
+    async def _post_message(self, agent_name: str, endpoint_url: str, query: str, span):
+        """Breaker check and POST for _send_message, annotating its a2a.send span"""
+        health = self.health.get(endpoint_url)
+        if not health.allow_request():
+            span.set_attribute('circuit', health.state)
+            return _circuit_open_reply(agent_name, health), None
+        
+        client = await self._get_client()
+        timeout = health.timeout(INVOKE_TIMEOUT)
+        span.set_attribute('timeout_s', timeout)
+        started = time.monotonic()
+        healthy = None  # Unknown until the call finishes (stays None if cancelled)
+        health.outstanding += 1
         
         try:
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                # Create JSON-RPC 2.0 request
-                payload = {
-                    "jsonrpc": "2.0",
-                    "method": "message/send",
-                    "params": {
-                        "message": {
-                            "role": "user",
-                            "parts": [{"type": "text", "text": query}],
-                            "messageId": uuid4().hex
-                        }
-                    },
-                    "id": uuid4().hex
+            # Create JSON-RPC 2.0 request
+            payload = {
+                "jsonrpc": "2.0",
+                "method": "message/send",
+                "params": {
+                    "message": {
+                        "role": "user",
+                        "parts": [{"type": "text", "text": query}],
+                        "messageId": uuid4().hex
+                    }
+                },
+                "id": uuid4().hex
+            }
+            
+            # Send request to agent (root endpoint for A2A agents)
+            response = await client.post(
+                endpoint_url,
+                json=payload,
+                headers=inject_request_id(inject({"Content-Type": "application/json"})),
+                timeout=timeout,
+            )
+            span.set_attribute('http.status_code', response.status_code)
+            
+            if response.status_code != 200:
+                healthy = response.status_code < 500 and response.status_code != 429
+                return f"HTTP {response.status_code}: {response.text}", None
+            
+            result = response.json()
+            healthy = True
+            
+            # Extract text from JSON-RPC response
+            if 'result' in result:
+                text, metadata = _extract_reply(result['result'])
+                if text is None:
+                    return "No text in response", None
+                return text, metadata
+            elif 'error' in result:
+                return f"Agent error: {result['error']}", None
+            
+            return "Unexpected response format", None
+            
+        except httpx.TimeoutException:
+            healthy = False
+            return f"Error invoking {agent_name}: timed out after {timeout:.1f}s", None
+        except Exception as e:
+            healthy = False
+            return f"Error invoking {agent_name}: {str(e)}", None
+        finally:
+            health.outstanding -= 1
+            _record_outcome(health, healthy, started)
+    
+    async def stream_agent(self, agent_name: str, query: str, endpoint_url: str = None, skill_id: str = None):
+        """Invoke an agent via message/stream, yielding text chunks as they arrive
+        
+        Cached responses and agents that do not advertise streaming yield
+        their whole reply as one chunk.
+        """
+        agent_info = self.agents.get(agent_name)
+        endpoints = self._replica_endpoints(agent_info, endpoint_url)
+        if not endpoints:
+            yield f"Agent {agent_name} not found"
+            return
+        
+        policy = agent_info.get('cache_policy', {}) if agent_info else {}
+        cache_key = None
+        if skill_id and policy.get(skill_id, 0) > 0:
+            cache_key = ResponseCache.key(agent_name, skill_id, query)
+            cached = self.response_cache.get(cache_key)
+            if cached is not None:
+                yield cached
+                return
+        
+        if not (agent_info and agent_info.get('streaming')):
+            yield await self.invoke_agent(agent_name, query, endpoint_url, skill_id)
+            return
+        
+        # Streams are load-balanced but not hedged (chunks cannot be raced)
+        endpoint_url = self.health.pick(endpoints, self.load_balancer)
+        health = self.health.get(endpoint_url)
+        # Not made current: the generator's steps run in the consumer's context
+        span = tracer.start_span('a2a.stream', kind=CLIENT, attributes={'agent': agent_name, 'endpoint': endpoint_url})
+        if not health.allow_request():
+            span.set_attribute('circuit', health.state)
+            span.set_error("circuit open")
+            span.end()
+            yield _circuit_open_reply(agent_name, health)
+            return
+        
+        client = await self._get_client()
+        payload = {
+            "jsonrpc": "2.0",
+            "method": "message/stream",
+            "params": {
+                "message": {
+                    "role": "user",
+                    "parts": [{"type": "text", "text": query}],
+                    "messageId": uuid4().hex
                 }
+            },
+            "id": uuid4().hex
+        }
+        
+        # Health records the latency to the first event: later chunks pace
+        # with generation, and the timeout bounds each read
+        timeout = health.timeout(INVOKE_TIMEOUT)
+        started = time.monotonic()
+        healthy = None
+        health.outstanding += 1
+        chunks = []
+        metadata = None
+        try:
+            async with aconnect_sse(
+                client, "POST", endpoint_url, json=payload, headers=inject_request_id(inject({}, span)), timeout=timeout
+            ) as event_source:
+                span.set_attribute('http.status_code', event_source.response.status_code)
+                if event_source.response.status_code != 200:
+                    status_code = event_source.response.status_code
+                    healthy = status_code < 500 and status_code != 429
+                    span.set_error(f"HTTP {status_code}")
+                    yield f"HTTP {status_code}"
+                    return
                 
-                # Send request to agent (root endpoint for A2A agents)
-                response = await client.post(
-                    endpoint_url,
-                    json=payload,
-                    headers={"Content-Type": "application/json"}
-                )
-                
-                if response.status_code != 200:
-                    return f"HTTP {response.status_code}: {response.text}"
-                
-                result = response.json()
-                
-                # Extract text from JSON-RPC response
-                if 'result' in result:
-                    result_data = result['result']
-                    if isinstance(result_data, dict) and 'parts' in result_data:
-                        texts = []
-                        for part in result_data['parts']:
-                            if isinstance(part, dict) and 'text' in part:
-                                texts.append(part['text'])
-                        return ' '.join(texts) if texts else "No text in response"
-                    return str(result_data)
-                elif 'error' in result:
-                    return f"Agent error: {result['error']}"
-                
-                return "Unexpected response format"
-                
+                async for sse in event_source.aiter_sse():
+                    event = json.loads(sse.data)
+                    if healthy is None:
+                        healthy = True
+                        _record_outcome(health, healthy, started)
+                        span.set_attribute('first_event_ms', (time.monotonic() - started) * 1000)
+                    if 'error' in event:
+                        span.set_error(f"Agent error: {event['error']}")
+                        yield f"Agent error: {event['error']}"
+                        return
+                    
+                    result = event.get('result') or {}
+                    kind = result.get('kind')
+                    if kind == 'artifact-update':
+                        artifact = result.get('artifact') or {}
+                        metadata = artifact.get('metadata') or metadata or {}
+                        text = _parts_text(artifact.get('parts', []))
+                    elif kind in ('message', 'task'):
+                        text, reply_metadata = _extract_reply(result)
+                        metadata = reply_metadata if text is not None else metadata
+                    elif kind == 'status-update' and result.get('status', {}).get('state') == 'failed':
+                        span.set_error("Agent task failed")
+                        yield "Agent task failed"
+                        return
+                    else:
+                        continue
+                    
+                    if text:
+                        chunks.append(text)
+                        yield text
         except Exception as e:
-            return f"Error invoking {agent_name}: {str(e)}"
-    
-    async def route_query(self, query: str):
-        """Route user query to appropriate agent(s)"""
-        print(f"\n📥 Query: {query}")
+            if healthy is None:
+                healthy = False
+            span.set_error(e)
+            yield f"Error invoking {agent_name}: {str(e)}"
+            return
+        finally:
+            health.outstanding -= 1
+            if healthy is not True:
+                # Successes were recorded at the first event
+                _record_outcome(health, healthy, started)
+            span.set_attribute('chunks', len(chunks))
+            span.end()
         
-        # Match query to agent skills
-        matches = self.match_query_to_skills(query)
+        if cache_key and chunks and metadata is not None:
+            self.response_cache.put(cache_key, ''.join(chunks), reply_ttl(policy, skill_id, metadata))
+    
+    async def stream_matches(self, matches, query: str, parent=None, request_id=None):
+        """Stream several matched agents concurrently under the route deadline
         
-        if not matches:
-            return "❌ No agent found to handle this request"
+        Args:
+            parent: Span the per-agent stream spans belong to (default: the
+                    span current when streaming starts)
+            request_id: Request id for the agent calls' logs and X-Request-ID
+                        header (default: the enclosing request's, if any)
         
-        print(f"🎯 Matched {len(matches)} agent(s):")
-        for match in matches:
-            print(f"   • {match['agent_name']}.{match['skill_id']}")
+        Yields:
+            (agent_name, text_chunk) in arrival order; agents still running at
+            the deadline yield a timeout notice and are cancelled
+        """
+        queue = asyncio.Queue()
+        done = object()
         
-        # Invoke matched agents
-        results = []
-        for match in matches:
+        async def pump(match):
             agent_name = match['agent_name']
-            print(f"\n🔄 Calling {agent_name}...")
-            
-            result = await self.invoke_agent(agent_name, query)
-            results.append(f"{agent_name}: {result}")
-            print(f"✅ {agent_name}: {result}")
+            try:
+                with request_context(request_id), tracer.start_as_current_span(
+                    'stream_agent', attributes={'agent': agent_name, 'skill': match.get('skill_id')}, parent=parent
+                ):
+                    async for chunk in self.stream_agent(agent_name, query, match.get('endpoint'), match.get('skill_id')):
+                        await queue.put((agent_name, chunk))
+            finally:
+                await queue.put((agent_name, done))
+        
+        tasks = {match['agent_name']: asyncio.create_task(pump(match)) for match in matches}
+        pending = set(tasks)
+        deadline = asyncio.get_running_loop().time() + self.route_deadline
+        try:
+            while pending:
+                remaining = deadline - asyncio.get_running_loop().time()
+                try:
+                    agent_name, chunk = await asyncio.wait_for(queue.get(), timeout=max(remaining, 0))
+                except asyncio.TimeoutError:
+                    for agent_name in sorted(pending):
+                        yield agent_name, f"⏱️ Timed out after {self.route_deadline:.1f}s"
+                    return
+                if chunk is done:
+                    pending.discard(agent_name)
+                else:
+                    yield agent_name, chunk
+        finally:
+            for task in tasks.values():
+                task.cancel()
+    
+    async def route_query_stream(self, query: str):
+        """Route a query and stream the matched agents' replies
         
-        return "\n".join(results)
+        Yields:
+            (agent_name, text_chunk) as chunks arrive; (None, message) when no
+            agent matches
+        """
+        span = tracer.start_span('route_query_stream', attributes={'query': query})
+        request_id = new_request_id()
+        try:
+            with use_span(span), request_context(request_id):
+                # DEBUG: the streamed reply is the caller's output
+                logger.debug("📥 Query: %s", query, extra={'query': query})
+                matches = self.match_query_to_skills(query)
+                self._log_matches(matches, logging.DEBUG)
+            if not matches:
+                yield None, "❌ No agent found to handle this request"
+                return
+            
+            async for agent_name, chunk in self.stream_matches(matches, query, parent=span, request_id=request_id):
+                yield agent_name, chunk
+        finally:
+            span.end()
+    
+    async def route_query(self, query: str):
+        """Route user query to appropriate agent(s)"""
+        with request_context(), tracer.start_as_current_span('route_query', attributes={'query': query}) as span:
+            logger.info("📥 Query: %s", query, extra={'query': query})
+            
+            # Match query to agent skills
+            matches = self.match_query_to_skills(query)
+            self._log_matches(matches)
+            
+            if not matches:
+                return "❌ No agent found to handle this request"
+            
+            # Invoke matched agents concurrently under one overall deadline
+            tasks = {
+                match['agent_name']: asyncio.create_task(
+                    self.invoke_agent(match['agent_name'], query, match['endpoint'], match['skill_id'])
+                )
+                for match in matches
+            }
+            logger.debug("🔄 Calling %s...", ', '.join(tasks))
+            
+            started = time.perf_counter()
+            done, pending = await asyncio.wait(tasks.values(), timeout=self.route_deadline)
+            for task in pending:
+                task.cancel()
+            
+            # Report results in score order (matches are already sorted)
+            results = []
+            for match in matches:
+                agent_name = match['agent_name']
+                task = tasks[agent_name]
+                if task in done:
+                    result = task.result()
+                    logger.info("✅ %s: %s", agent_name, result, extra={'agent': agent_name})
+                else:
+                    result = f"⏱️ Timed out after {self.route_deadline:.1f}s"
+                    logger.warning("⏱️  %s: timed out", agent_name, extra={'agent': agent_name})
+                    span.set_error(f"{agent_name} timed out")
+                results.append(f"{agent_name}: {result}")
+            
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            logger.info("🏁 Answered by %d agent(s) in %.1fms", len(matches), elapsed_ms,
+                        extra={'duration_ms': round(elapsed_ms, 1)})
+            return "\n".join(results)
+    
+    def _log_matches(self, matches, level=logging.INFO):
+        """Log a query's routing decision, flagging agents whose circuits are open"""
+        if not log_enabled(logger, level):
+            return
+        if not matches:
+            logger.log(level, "❌ No agent matched")
+            return
+        labels = []
+        for match in matches:
+            # Open circuits fail fast in invoke_agent (cached replies still serve)
+            endpoints = self._replica_endpoints(self.agents.get(match['agent_name']), match['endpoint'])
+            circuit = " ⚡ circuit open" if all(self.health.is_open(url) for url in endpoints) else ""
+            labels.append(f"{match['agent_name']}.{match['skill_id']}{circuit}")
+        logger.log(level, "🎯 Matched %d agent(s): %s", len(matches), ", ".join(labels), extra={'matches': labels})
 
 
 async def main():
     """Main interactive loop"""
+    configure_logging("orchestrator")
+    
     # Check for bearer token
     token = get_bearer_token()
     if not token:
@@ -280,24 +1199,63 @@ async def main():
         print("Run: export TOKEN='your-jwt-token'")
         return
     
-    orchestrator = Orchestrator()
+    # One orchestrator (and one pooled HTTP client) for the whole session
+    async with Orchestrator() as orchestrator:
+        await run_repl(orchestrator)
+
+
+async def read_line(prompt):
+    """input() off the event loop, on a daemon thread
+    
+    Not asyncio.to_thread: loop shutdown joins the default executor, which
+    would hang on a thread still blocked in input() after Ctrl-C.
+    """
+    loop = asyncio.get_running_loop()
+    future = loop.create_future()
+    
+    def resolve(result, error):
+        if future.done():
+            return  # The REPL was cancelled meanwhile
+        if error:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+    
+    def read():
+        try:
+            result, error = input(prompt), None
+        except BaseException as e:  # EOFError, KeyboardInterrupt
+            result, error = None, e
+        try:
+            loop.call_soon_threadsafe(resolve, result, error)
+        except RuntimeError:
+            pass  # Loop already closed
     
-    # Initial discovery
-    await orchestrator.discover_agents()
+    threading.Thread(target=read, name="repl-input", daemon=True).start()
+    return await future
+
+
+async def run_repl(orchestrator):
+    """Interactive query loop for a started orchestrator"""
+    # Initial discovery (instant from the snapshot when one exists)
+    await orchestrator.ensure_agents()
+    flush_logs()  # Discovery lines before the banner
     
     print("="*60)
     print("🤖 Orchestrator Ready")
     print("="*60)
     print("Commands:")
     print("  - Type your query to route to agents")
-    print("  - 'refresh' - Rediscover agents")
+    print("  - 'refresh' - Refresh new/changed agents")
     print("  - 'list' - Show all agents and skills")
+    print("  - 'stats' - Show response cache, coalescing, hedging and endpoint health")
     print("  - 'quit' - Exit")
     print("="*60 + "\n")
     
     while True:
         try:
-            user_input = input("Query> ").strip()
+            # Read input off the event loop so background reconciliation keeps running
+            user_input = (await read_line("Query> ")).strip()
             
             if not user_input:
                 continue
@@ -307,14 +1265,32 @@ async def main():
                 break
             
             if user_input.lower() == 'refresh':
-                orchestrator.agents = {}
-                await orchestrator.discover_agents()
+                await orchestrator.refresh_agents()
+                flush_logs()
+                continue
+            
+            if user_input.lower() == 'stats':
+                stats = orchestrator.response_cache.stats()
+                print(f"\n📦 Response cache: {stats['entries']}/{stats['max_entries']} entries, "
+                      f"{stats['hits']} hits, {stats['misses']} misses "
+                      f"({stats['hit_rate']:.0%} hit rate), {stats['evictions']} evictions")
+                print(f"🔗 Coalesced calls: {orchestrator.coalesced_calls}")
+                print(f"🏁 Hedged calls: {orchestrator.hedged_calls} ({orchestrator.hedge_wins} won by the hedge)")
+                print("🩺 Endpoint health:")
+                for endpoint_url, health in orchestrator.health.stats(INVOKE_TIMEOUT).items():
+                    p99 = f"{health['p99'] * 1000:.0f}ms" if health['p99'] is not None else "n/a"
+                    retry = f", retry in {health['retry_in']:.0f}s" if health['retry_in'] else ""
+                    print(f"   • {endpoint_url}: {health['state']}{retry}, p99 {p99} "
+                          f"over {health['samples']} calls, {health['error_rate']:.0%} errors, "
+                          f"timeout {health['timeout']:.1f}s, {health['outstanding']} in flight, "
+                          f"{health['rejected']} rejected")
+                print()
                 continue
             
             if user_input.lower() == 'list':
                 print("\n📋 Available Agents and Skills:")
                 for agent_name, info in orchestrator.agents.items():
-                    print(f"\n  🤖 {agent_name} ({info['endpoint_url']})")
+                    print(f"\n  🤖 {agent_name} ({', '.join(info.get('endpoints') or [info['endpoint_url']])})")
                     for skill_id, skill in info['skills'].items():
                         print(f"    • {skill['name']}: {skill['description']}")
                         if skill.get('examples'):
@@ -322,11 +1298,18 @@ async def main():
                 print()
                 continue
             
-            # Route query
-            response = await orchestrator.route_query(user_input)
-            print(f"\n💬 Response:\n{response}\n")
+            # Route query, printing each agent's reply as it streams in
+            print("\n💬 Response:")
+            current_agent = None
+            async for agent_name, chunk in orchestrator.route_query_stream(user_input):
+                if agent_name != current_agent:
+                    print(f"\n🤖 {agent_name}:" if agent_name else "")
+                    current_agent = agent_name
+                print(chunk, end='' if chunk.endswith('\n') else '\n', flush=True)
+            print()
             
-        except KeyboardInterrupt:
+        except (KeyboardInterrupt, asyncio.CancelledError, EOFError):
+            # Under asyncio.run, Ctrl-C cancels the main task
             print("\n👋 Goodbye!")
             break
         except Exception as e:
@@ -0,0 +1,122 @@
+"""Orchestrator-side cache of agent responses for idempotent skills
+
+Agents opt skills in through an AgentCard capability extension:
+
+    AgentExtension(
+        uri=CACHE_POLICY_EXTENSION,
+        params={
+            'skills': {'get_current_weather': 300, 'send_email': 0},
+            'side_effects': ['send_email'],
+        },
+    )
+
+'skills' values are TTLs in seconds; 0 (or an unlisted skill) means never
+cache. Skills listed in 'side_effects' are never cached, and calls to an
+agent declaring any of them are never coalesced (single-flight).
+
+A reply may name the skill that actually ran in its artifact metadata
+({'skill_id': ...}); that skill's TTL replaces the routed one's, and
+'skill_id': None (no skill ran, e.g. a usage reply) is never cached.
+"""
+import re
+import time
+from collections import OrderedDict
+
+CACHE_POLICY_EXTENSION = "urn:a2a-orchestrator:ext:response-cache:v1"
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_query(query: str):
+    """Case-, whitespace- and trailing-punctuation-insensitive form of a query"""
+    return _WHITESPACE.sub(" ", query.strip().lower()).rstrip("?!. ")
+
+
+def _cache_extension_params(agent_card):
+    capabilities = getattr(agent_card, 'capabilities', None)
+    for extension in (getattr(capabilities, 'extensions', None) or []):
+        if extension.uri == CACHE_POLICY_EXTENSION:
+            return extension.params or {}
+    return {}
+
+
+def cache_policy_from_card(agent_card):
+    """Per-skill TTLs declared in an AgentCard's response-cache extension
+
+    Returns:
+        {skill_id: ttl_seconds} - empty when the agent declares nothing;
+        side-effecting skills always get 0
+    """
+    params = _cache_extension_params(agent_card)
+    side_effects = set(params.get('side_effects', []))
+    return {
+        skill_id: 0.0 if skill_id in side_effects else float(ttl)
+        for skill_id, ttl in params.get('skills', {}).items()
+    }
+
+
+def side_effect_skills_from_card(agent_card):
+    """Skills the agent declares as side-effecting (never cached or coalesced)"""
+    return frozenset(_cache_extension_params(agent_card).get('side_effects', []))
+
+
+def reply_ttl(policy, skill_id, metadata):
+    """Seconds to cache a reply to a call routed to skill_id (0: don't cache)"""
+    executed_skill = metadata.get('skill_id', skill_id) if metadata else skill_id
+    return policy.get(executed_skill, 0) if executed_skill else 0
+
+
+class ResponseCache:
+    """LRU cache of agent responses with per-entry TTLs and hit/miss counters
+
+    Entries are keyed by (agent, skill, normalized query).
+    """
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()  # {key: (expires_at, response)}, least recently used first
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def key(agent_name: str, skill_id: str, query: str):
+        return (agent_name, skill_id, normalize_query(query))
+
+    def get(self, key):
+        """Cached response for a key, or None (expired entries count as misses)"""
+        entry = self.entries.get(key)
+        if entry is not None:
+            expires_at, response = entry
+            if expires_at > time.monotonic():
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return response
+            del self.entries[key]
+        self.misses += 1
+        return None
+
+    def put(self, key, response, ttl: float):
+        """Store a response for ttl seconds (ttl <= 0 stores nothing)"""
+        if ttl <= 0 or self.max_entries <= 0:
+            return
+        self.entries[key] = (time.monotonic() + ttl, response)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        self.entries.clear()
+
+    def stats(self):
+        """Hit/miss counters and current size"""
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self.entries),
+            'max_entries': self.max_entries,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+        }
@@ -0,0 +1,457 @@
+"""Skill routing engines used by the Orchestrator to match queries to agents
+
+Every engine exposes the same interface:
+    sync(agents)  - (re)index the orchestrator registry after discovery
+    match(query)  - agent-level matches, sorted by score (highest first)
+"""
+import re
+from collections import defaultdict
+
+import numpy as np
+from scipy import sparse
+
+# Words ignored when matching a query against skill names and descriptions
+STOP_WORDS = frozenset({
+    'a', 'an', 'the', 'in', 'on', 'at', 'to', 'for', 'of', 'and', 'or', 'is', 'are', 'was', 'were',
+    'be', 'been', 'being', 'have', 'has', 'had', 'do', 'does', 'did', 'will', 'would', 'should',
+    'could', 'may', 'might', 'can', 'what', 'when', 'where', 'who', 'how', 'i', 'you', 'me', 'my',
+    'your',
+})
+
+# Strong keyword mappings for each agent type
+AGENT_KEYWORDS = {
+    'weather_agent': ['weather', 'temperature', 'forecast', 'rain', 'sunny', 'cloudy', 'pack', 'packing', 'climate'],
+    'calculator_agent': ['calculate', 'convert', 'currency', 'usd', 'eur', 'gbp', 'jpy', 'fahrenheit', 'celsius', 'math', 'add', 'subtract', 'multiply', 'divide'],
+    'travel_agent': ['travel', 'destination', 'recommend', 'trip', 'visit', 'budget', 'tips', 'romantic', 'adventure', 'vacation']
+}
+
+KEYWORD_SCORE = 10  # Agent keyword found anywhere in the query
+NAME_SCORE = 5  # Query word found in a skill name
+DESCRIPTION_SCORE = 3  # Query word found in a skill description
+MIN_WORD_LENGTH = 3  # Shorter query words are ignored
+MIN_MATCH_SCORE = 5  # Only matches scoring above this are returned
+BATCH_CHUNK_SIZE = 1024  # Queries scored per vectorized pass in match_batch
+
+
+def query_words(query_lower: str):
+    """Meaningful words of a lowercased query (no stop words, numbers or short words)"""
+    return [
+        w for w in query_lower.split()
+        if w not in STOP_WORDS
+        and not w.replace('.', '').replace('-', '').isdigit()
+        and len(w) >= MIN_WORD_LENGTH
+    ]
+
+
+def _fragments(text: str):
+    """Every substring of every whitespace token long enough to match a query word
+
+    Query words never contain whitespace, so ``word in text`` holds exactly
+    when ``word`` is one of these fragments.
+    """
+    fragments = set()
+    for token in text.split():
+        for start in range(len(token) - MIN_WORD_LENGTH + 1):
+            for end in range(start + MIN_WORD_LENGTH, len(token) + 1):
+                fragments.add(token[start:end])
+    return fragments
+
+
+class KeywordSkillIndex:
+    """Inverted index (fragment -> [(agent, skill, weight)]) over agent skills
+
+    Scores are identical to scanning every skill name and description with
+    substring checks, but scoring a query only touches the postings of its
+    own words, so routing cost does not grow with the number of skills.
+    """
+
+    def __init__(self, agent_keywords=AGENT_KEYWORDS):
+        self.postings = defaultdict(list)  # {fragment: [(agent_name, skill_pos, weight)]}
+        self.keyword_agents = defaultdict(list)  # {keyword: [agent_name]}
+        for agent_name, keywords in agent_keywords.items():
+            for keyword in set(keywords):
+                self.keyword_agents[keyword].append(agent_name)
+        self.keyword_lengths = sorted({len(k) for k in self.keyword_agents})
+
+        self.agents = {}  # {agent_name: agent_info} as last indexed
+        self.skills = {}  # {agent_name: [(skill_id, skill_name)]} in card order
+        self.order = {}  # {agent_name: position in the orchestrator registry}
+        self._agent_fragments = {}  # {agent_name: fragments it posted}, for removal
+
+    def add_agent(self, agent_name: str, agent_info: dict):
+        """Index (or re-index) one agent's skills"""
+        if agent_name in self.agents:
+            self.remove_agent(agent_name)
+
+        skills = []
+        posted = set()
+        for skill_pos, (skill_id, skill) in enumerate(agent_info['skills'].items()):
+            skills.append((skill_id, skill['name']))
+            name_fragments = _fragments(skill['name'].lower())
+            desc_fragments = _fragments(skill['description'].lower())
+            for fragment in name_fragments | desc_fragments:
+                weight = 0
+                if fragment in name_fragments:
+                    weight += NAME_SCORE
+                if fragment in desc_fragments:
+                    weight += DESCRIPTION_SCORE
+                self.postings[fragment].append((agent_name, skill_pos, weight))
+                posted.add(fragment)
+
+        self.agents[agent_name] = agent_info
+        self.skills[agent_name] = skills
+        self._agent_fragments[agent_name] = posted
+        self.order.setdefault(agent_name, len(self.order))
+
+    def remove_agent(self, agent_name: str):
+        """Drop one agent's postings"""
+        if agent_name not in self.agents:
+            return
+        for fragment in self._agent_fragments.pop(agent_name):
+            remaining = [p for p in self.postings[fragment] if p[0] != agent_name]
+            if remaining:
+                self.postings[fragment] = remaining
+            else:
+                del self.postings[fragment]
+        del self.agents[agent_name]
+        del self.skills[agent_name]
+        self.order.pop(agent_name, None)
+
+    def sync(self, agents: dict):
+        """Bring the index in line with a registry, re-indexing only what changed
+
+        Agents are re-indexed when their skills dict is a different object
+        than the one last indexed, so an unchanged registry costs O(agents).
+        """
+        for agent_name in [name for name in self.agents if name not in agents]:
+            self.remove_agent(agent_name)
+        for agent_name, agent_info in agents.items():
+            indexed = self.agents.get(agent_name)
+            if indexed is None or indexed['skills'] is not agent_info['skills']:
+                self.add_agent(agent_name, agent_info)
+            else:
+                self.agents[agent_name] = agent_info
+        # Ties are broken by registry order, as a linear scan would
+        self.order = {agent_name: pos for pos, agent_name in enumerate(agents)}
+
+    def _matched_keywords(self, query_lower: str):
+        """Agent keywords occurring anywhere in the query (substring semantics)"""
+        found = set()
+        for token in query_lower.split():
+            for length in self.keyword_lengths:
+                if length > len(token):
+                    break
+                for start in range(len(token) - length + 1):
+                    fragment = token[start:start + length]
+                    if fragment in self.keyword_agents:
+                        found.add(fragment)
+        return found
+
+    def match(self, query: str):
+        """Score a query against every indexed skill
+
+        Returns:
+            Matches sorted by score (highest first), filtered to score > MIN_MATCH_SCORE
+        """
+        query_lower = query.lower()
+        agent_scores = defaultdict(int)
+        first_skill = {}  # {agent_name: lowest matching skill position}
+
+        for keyword in self._matched_keywords(query_lower):
+            for agent_name in self.keyword_agents[keyword]:
+                if agent_name in self.agents:
+                    agent_scores[agent_name] += KEYWORD_SCORE
+
+        for word in query_words(query_lower):
+            for agent_name, skill_pos, weight in self.postings.get(word, ()):
+                agent_scores[agent_name] += weight
+                if skill_pos < first_skill.get(agent_name, skill_pos + 1):
+                    first_skill[agent_name] = skill_pos
+
+        matched = []
+        for agent_name, score in agent_scores.items():
+            skills = self.skills[agent_name]
+            if not skills:
+                continue
+            skill_id, skill_name = skills[first_skill.get(agent_name, 0)]
+            matched.append({
+                'agent_name': agent_name,
+                'skill_id': skill_id,
+                'skill_name': skill_name,
+                'endpoint': self.agents[agent_name]['endpoint_url'],
+                'score': score
+            })
+
+        matched.sort(key=lambda m: (-m['score'], self.order.get(m['agent_name'], 0)))
+        return [m for m in matched if m['score'] > MIN_MATCH_SCORE]
+
+    def match_batch(self, queries):
+        """Match many queries; each costs only its own postings lookups"""
+        cache = {}
+        return [cache[q] if q in cache else cache.setdefault(q, self.match(q)) for q in queries]
+
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+|[+*/×÷^°]")  # Operators and degrees route bare arithmetic and "12°C"
+
+
+def _normalize(token: str):
+    """Cheap plural folding so 'emails' matches 'email' and 'cities' matches 'city'"""
+    if len(token) > 4 and token.endswith('ies'):
+        return token[:-3] + 'y'
+    if len(token) > 3 and token.endswith('s') and not token.endswith('ss'):
+        return token[:-1]
+    return token
+
+
+# BM25 also ignores 'like' ("what is the climate like"); the keyword engine
+# keeps scoring it, as it always has
+BM25_STOP_WORDS = STOP_WORDS | {'like'}
+
+
+def analyze(text: str):
+    """Lowercased, stop-word-free, plural-folded terms of a text"""
+    return [
+        _normalize(token) for token in TOKEN_PATTERN.findall(text.lower())
+        if token not in BM25_STOP_WORDS and not token.isdigit()
+    ]
+
+
+class Bm25RoutingEngine:
+    """BM25 over each skill's name, description, tags and examples
+
+    At sync time every skill becomes one row of a sparse (skills x terms)
+    matrix of precomputed BM25 term weights, so scoring a query against all
+    skills is a single sparse matrix-vector product. No hand-maintained
+    keyword table is involved; new agents are routed from their AgentCard.
+    """
+
+    # Field boosts: how many times a field's terms count towards term frequency
+    FIELD_WEIGHTS = {'name': 3, 'tags': 2, 'description': 1, 'examples': 1}
+
+    def __init__(self, k1=1.2, b=0.75, min_score=1.0, relative_cutoff=0.35):
+        self.k1 = k1
+        self.b = b
+        self.min_score = min_score  # Absolute floor for an agent match
+        self.relative_cutoff = relative_cutoff  # Keep agents scoring >= cutoff * best score
+
+        self.agents = {}  # {agent_name: agent_info} as last indexed
+        self.vocabulary = {}  # {term: column}
+        self.weights = sparse.csr_matrix((0, 0))  # (skills x terms) BM25 weights
+        self.skill_rows = []  # [(agent_name, skill_id, skill_name)] per matrix row
+        self.row_terms = []  # [frozenset of term columns] per matrix row
+        self.agent_names = []  # Agents in registry order
+        self.agent_starts = np.zeros(0, dtype=np.intp)  # First row of each agent's skills
+
+    def _skill_terms(self, agent_name: str, skill: dict):
+        """Weighted bag of terms for one skill"""
+        counts = defaultdict(int)
+        fields = {
+            'name': skill.get('name') or '',
+            'tags': ' '.join(skill.get('tags') or []) + ' ' + agent_name.replace('_', ' '),
+            'description': skill.get('description') or '',
+            'examples': ' '.join(skill.get('examples') or []),
+        }
+        for field, text in fields.items():
+            for term in analyze(text):
+                counts[term] += self.FIELD_WEIGHTS[field]
+        return counts
+
+    def sync(self, agents: dict):
+        """Rebuild the term matrix when the registry changed (IDF is corpus-wide)"""
+        unchanged = (
+            list(agents) == list(self.agents)
+            and all(self.agents[name]['skills'] is info['skills'] for name, info in agents.items())
+        )
+        if unchanged:
+            self.agents = dict(agents)
+            return
+
+        vocabulary = {}
+        rows, cols, tfs = [], [], []
+        skill_rows = []
+        agent_names = []
+        agent_starts = []
+        for agent_name, agent_info in agents.items():
+            if not agent_info['skills']:
+                continue
+            agent_names.append(agent_name)
+            agent_starts.append(len(skill_rows))
+            for skill_id, skill in agent_info['skills'].items():
+                row = len(skill_rows)
+                skill_rows.append((agent_name, skill_id, skill['name']))
+                for term, count in self._skill_terms(agent_name, skill).items():
+                    rows.append(row)
+                    cols.append(vocabulary.setdefault(term, len(vocabulary)))
+                    tfs.append(count)
+
+        n_skills, n_terms = len(skill_rows), len(vocabulary)
+        tf = sparse.csr_matrix(
+            (np.asarray(tfs, dtype=np.float64), (rows, cols)),
+            shape=(n_skills, n_terms),
+        )
+        if n_skills:
+            doc_len = np.asarray(tf.sum(axis=1)).ravel()
+            avg_len = doc_len.mean() or 1.0
+            doc_freq = np.bincount(tf.indices, minlength=n_terms)
+            idf = np.log1p((n_skills - doc_freq + 0.5) / (doc_freq + 0.5))
+
+            # BM25 saturation, applied to the stored non-zeros only
+            norm = self.k1 * (1 - self.b + self.b * doc_len / avg_len)
+            row_norm = np.repeat(norm, np.diff(tf.indptr))
+            tf.data = idf[tf.indices] * tf.data * (self.k1 + 1) / (tf.data + row_norm)
+
+        self.agents = dict(agents)
+        self.vocabulary = vocabulary
+        self.weights = tf
+        self.skill_rows = skill_rows
+        self.row_terms = [frozenset(tf.indices[tf.indptr[row]:tf.indptr[row + 1]]) for row in range(n_skills)]
+        self.agent_names = agent_names
+        self.agent_starts = np.asarray(agent_starts, dtype=np.intp)
+
+    def _query_vector(self, query: str):
+        """Dense term-count vector of a query over the indexed vocabulary"""
+        vector = np.zeros(len(self.vocabulary))
+        for term in analyze(query):
+            column = self.vocabulary.get(term)
+            if column is not None:
+                vector[column] += 1.0
+        return vector
+
+    def _query_matrix(self, queries):
+        """Sparse (queries x terms) term-count matrix over the indexed vocabulary"""
+        rows, cols = [], []
+        for row, query in enumerate(queries):
+            for term in analyze(query):
+                column = self.vocabulary.get(term)
+                if column is not None:
+                    rows.append(row)
+                    cols.append(column)
+        return sparse.csr_matrix(
+            (np.ones(len(rows)), (rows, cols)),
+            shape=(len(queries), len(self.vocabulary)),
+        )
+
+    def score(self, query: str):
+        """BM25 score of every skill row for a query (one sparse mat-vec)"""
+        if not self.skill_rows:
+            return np.zeros(0)
+        return self.weights @ self._query_vector(query)
+
+    def _skill_match(self, row: int, score: float):
+        agent_name, skill_id, skill_name = self.skill_rows[row]
+        return {
+            'agent_name': agent_name,
+            'skill_id': skill_id,
+            'skill_name': skill_name,
+            'endpoint': self.agents[agent_name]['endpoint_url'],
+            'score': round(float(score), 3)
+        }
+
+    def top_k(self, query: str, k: int = 5):
+        """Best k skills across all agents, with scores"""
+        scores = self.score(query)
+        k = min(k, len(scores))
+        if k <= 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind='stable')]
+        return [self._skill_match(row, scores[row]) for row in top if scores[row] > 0]
+
+    def _select(self, rows, scores, query_columns):
+        """Matches for the agents passing the cutoffs, given each one's best row and score
+
+        The best-scoring agent is always kept. Another agent is kept only if
+        its skill matches a query term the best skill does not: one that only
+        shares the best agent's terms (a city both cards' examples name) has
+        nothing to add to the answer.
+        """
+        if len(rows) == 1:
+            return [self._skill_match(rows[0], scores[0])]
+        order = sorted(range(len(rows)), key=lambda i: scores[i], reverse=True)
+        best_terms = self.row_terms[rows[order[0]]].intersection(query_columns)
+        matched = [self._skill_match(rows[order[0]], scores[order[0]])]
+        for i in order[1:]:
+            if not best_terms.issuperset(self.row_terms[rows[i]].intersection(query_columns)):
+                matched.append(self._skill_match(rows[i], scores[i]))
+        return matched
+
+    def _agent_matches(self, scores, query_columns):
+        """Best skill per agent, filtered by the absolute and relative cutoffs"""
+        if not len(scores):
+            return []
+        best_scores = np.maximum.reduceat(scores, self.agent_starts)
+        best_score = best_scores.max()
+        cutoff = max(self.min_score, self.relative_cutoff * best_score)
+
+        rows, agent_scores = [], []
+        for agent_pos in np.flatnonzero(best_scores >= cutoff):
+            start = self.agent_starts[agent_pos]
+            end = self.agent_starts[agent_pos + 1] if agent_pos + 1 < len(self.agent_starts) else len(scores)
+            rows.append(start + int(np.argmax(scores[start:end])))
+            agent_scores.append(best_scores[agent_pos])
+        return self._select(rows, agent_scores, query_columns) if rows else []
+
+    def match(self, query: str):
+        """Agent-level matches: each agent's best skill, sorted by score"""
+        vector = self._query_vector(query) if self.skill_rows else np.zeros(0)
+        scores = self.weights @ vector if self.skill_rows else vector
+        return self._agent_matches(scores, set(np.flatnonzero(vector)))
+
+    def match_batch(self, queries, chunk_size=BATCH_CHUNK_SIZE):
+        """Agent-level matches for many queries, same results as match() per query
+
+        Duplicate queries are scored once, and each chunk of distinct queries
+        is scored against every skill with one sparse matrix product.
+        """
+        queries = list(queries)
+        if not self.skill_rows:
+            return [[] for _ in queries]
+
+        distinct = list(dict.fromkeys(queries))
+        results = {}
+        weights_t = self.weights.T.tocsr()
+        n_skills = len(self.skill_rows)
+        agent_ends = np.append(self.agent_starts[1:], n_skills)
+
+        for offset in range(0, len(distinct), chunk_size):
+            chunk = distinct[offset:offset + chunk_size]
+            query_matrix = self._query_matrix(chunk)
+            scores = (query_matrix @ weights_t).toarray()  # (queries x skills)
+
+            best_scores = np.maximum.reduceat(scores, self.agent_starts, axis=1)  # (queries x agents)
+            cutoffs = np.maximum(self.min_score, self.relative_cutoff * best_scores.max(axis=1))
+            keep = best_scores >= cutoffs[:, None]
+
+            best_rows = np.empty(best_scores.shape, dtype=np.intp)
+            for agent_pos, (start, end) in enumerate(zip(self.agent_starts, agent_ends)):
+                best_rows[:, agent_pos] = start + scores[:, start:end].argmax(axis=1)
+
+            kept = [[] for _ in chunk]
+            for query_pos, agent_pos in zip(*np.nonzero(keep)):
+                kept[query_pos].append(agent_pos)
+            for query_pos, (query, agent_positions) in enumerate(zip(chunk, kept)):
+                if not agent_positions:
+                    results[query] = []
+                    continue
+                columns = query_matrix.indices[query_matrix.indptr[query_pos]:query_matrix.indptr[query_pos + 1]]
+                results[query] = self._select(
+                    best_rows[query_pos, agent_positions].tolist(),
+                    best_scores[query_pos, agent_positions].tolist(),
+                    set(columns.tolist()) if len(agent_positions) > 1 else (),
+                )
+
+        return [results[query] for query in queries]
+
+
+ROUTING_ENGINES = {
+    'keyword': KeywordSkillIndex,
+    'bm25': Bm25RoutingEngine,
+}
+
+
+def create_routing_engine(name: str):
+    """Instantiate a routing engine by name ('keyword' or 'bm25')"""
+    try:
+        return ROUTING_ENGINES[name.lower()]()
+    except KeyError:
+        raise ValueError(f"Unknown routing engine '{name}'. Choose from: {', '.join(ROUTING_ENGINES)}")
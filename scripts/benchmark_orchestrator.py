@@ -0,0 +1,420 @@
+#!/usr/bin/env python3
+"""
+Load generator and latency benchmark for the orchestrator
+
+Starts the weather, calculator, travel and email agents plus a local stand-in
+for Context Forge's /a2a and /servers endpoints, then drives
+Orchestrator.route_query at a configurable concurrency with a query mix built
+from the agents' skill examples. Reports throughput and p50/p95/p99 latency
+per phase (discovery, routing, invocation, end-to-end) and can write the
+results as JSON and compare them against an earlier run.
+
+Usage:
+    python3 scripts/benchmark_orchestrator.py --concurrency 20 --requests 2000 --output bench.json
+    python3 scripts/benchmark_orchestrator.py --baseline bench.json
+    python3 scripts/benchmark_orchestrator.py --external   # running agents + real Context Forge (needs TOKEN)
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import platform
+import random
+import subprocess
+import sys
+import threading
+import time
+
+import httpx
+import uvicorn
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Route
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, REPO_ROOT)
+
+from common.log import configure_logging
+from orchestrator import orchestrator as orchestrator_module
+from orchestrator.orchestrator import Orchestrator
+
+# (registry name, working directory, script) - each agent reads PORT
+AGENT_SCRIPTS = [
+    ("weather_agent", "weather-agent", "__main__.py"),
+    ("calculator_agent", "agents", "calculator_agent.py"),
+    ("travel_agent", "agents", "travel_agent.py"),
+    ("email_agent", "email-agent", "__main__.py"),
+]
+BASE_PORT = int(os.getenv("BENCH_BASE_PORT", "5101"))  # Agents use BASE_PORT, BASE_PORT + 1, ...
+CONTEXT_FORGE_PORT = int(os.getenv("BENCH_CONTEXT_FORGE_PORT", "4544"))
+VIRTUAL_SERVER = "benchmark-suite"
+AGENT_STARTUP_TIMEOUT = 30.0
+
+# Reply prefixes the orchestrator uses for failed agent calls
+FAILURE_PREFIXES = (
+    "Error invoking", "HTTP ", "Agent error", "Agent task failed", "No text in response",
+    "Unexpected response format", "⚡",
+)
+
+
+def start_agents(base_port, verbose=False):
+    """Launch every agent as a subprocess on consecutive ports
+
+    Returns:
+        [(agent_name, port, process)]
+    """
+    output = None if verbose else subprocess.DEVNULL
+    agents = []
+    for offset, (agent_name, directory, script) in enumerate(AGENT_SCRIPTS):
+        port = base_port + offset
+        env = {**os.environ, "PORT": str(port)}
+        env.pop("RAILWAY_PUBLIC_DOMAIN", None)  # Advertise the local URL
+        process = subprocess.Popen(
+            [sys.executable, script],
+            cwd=os.path.join(REPO_ROOT, directory),
+            env=env,
+            stdout=output,
+            stderr=output,
+        )
+        agents.append((agent_name, port, process))
+    return agents
+
+
+def stop_agents(agents):
+    for _, _, process in agents:
+        process.terminate()
+    for _, _, process in agents:
+        try:
+            process.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+async def wait_for_agents(agents, timeout=AGENT_STARTUP_TIMEOUT):
+    """Poll each agent's AgentCard until it answers"""
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient(timeout=2.0) as client:
+        for agent_name, port, process in agents:
+            while True:
+                if process.poll() is not None:
+                    raise RuntimeError(f"{agent_name} exited with code {process.returncode} (port {port} in use?)")
+                try:
+                    response = await client.get(f"http://localhost:{port}/.well-known/agent-card.json")
+                    if response.status_code == 200:
+                        break
+                except httpx.TransportError:
+                    pass
+                if time.monotonic() > deadline:
+                    raise RuntimeError(f"{agent_name} did not start within {timeout:.0f}s")
+                await asyncio.sleep(0.2)
+
+
+def create_context_forge_app(agents):
+    """Minimal stand-in for Context Forge's /a2a listing and /servers endpoints"""
+    listing = [
+        {
+            "id": f"bench-{agent_name}",
+            "name": agent_name,
+            "endpoint_url": f"http://localhost:{port}",
+            "updated_at": "benchmark",
+            "enabled": True,
+        }
+        for agent_name, port, _ in agents
+    ]
+    etag = '"benchmark"'
+
+    async def a2a(request):
+        if request.headers.get("if-none-match") == etag:
+            return Response(status_code=304, headers={"ETag": etag})
+        return JSONResponse(listing, headers={"ETag": etag})
+
+    async def servers(request):
+        return JSONResponse([{"name": VIRTUAL_SERVER, "associatedA2aAgents": [a["id"] for a in listing]}])
+
+    return Starlette(routes=[Route("/a2a", a2a), Route("/servers", servers)])
+
+
+def start_context_forge(agents, port):
+    """Serve the stand-in registry from its own thread and event loop"""
+    server = uvicorn.Server(uvicorn.Config(
+        create_context_forge_app(agents), host="127.0.0.1", port=port, log_level="warning",
+    ))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        if not thread.is_alive():
+            raise RuntimeError(f"Context Forge stand-in failed to start on port {port}")
+        time.sleep(0.05)
+    return server, thread
+
+
+def summarize(samples):
+    """count, mean, p50/p95/p99 and max of latency samples (seconds in, ms out)"""
+    if not samples:
+        return {"count": 0}
+    values = sorted(samples)
+
+    def percentile(q):
+        index = min(len(values) - 1, max(0, math.ceil(q / 100 * len(values)) - 1))
+        return values[index] * 1000
+
+    return {
+        "count": len(values),
+        "mean_ms": sum(values) / len(values) * 1000,
+        "p50_ms": percentile(50),
+        "p95_ms": percentile(95),
+        "p99_ms": percentile(99),
+        "max_ms": values[-1] * 1000,
+    }
+
+
+def build_query_mix(agents):
+    """Every skill example of every discovered agent, as (agent_name, skill_id, query)"""
+    return [
+        (agent_name, skill_id, example)
+        for agent_name, info in agents.items()
+        for skill_id, skill in info["skills"].items()
+        for example in (skill.get("examples") or [])
+    ]
+
+
+def instrument(orchestrator, samples):
+    """Record routing and per-agent invocation latencies from inside route_query"""
+    match = orchestrator.match_query_to_skills
+    invoke = orchestrator.invoke_agent
+
+    def timed_match(query):
+        started = time.perf_counter()
+        try:
+            return match(query)
+        finally:
+            samples["routing"].append(time.perf_counter() - started)
+
+    async def timed_invoke(agent_name, query, *args, **kwargs):
+        started = time.perf_counter()
+        failed = True
+        try:
+            result = await invoke(agent_name, query, *args, **kwargs)
+            failed = result.startswith(FAILURE_PREFIXES)
+            return result
+        finally:
+            elapsed = time.perf_counter() - started
+            samples["invocation"].append(elapsed)
+            samples["by_agent"].setdefault(agent_name, []).append(elapsed)
+            if failed:
+                samples["failed_calls"] += 1
+
+    orchestrator.match_query_to_skills = timed_match
+    orchestrator.invoke_agent = timed_invoke
+
+
+async def measure_discovery(runs):
+    """Cold discovery: fresh orchestrator (and connection pool), empty cache"""
+    latencies = []
+    for _ in range(runs):
+        orchestrator_module.DISCOVERY_CACHE.clear()
+        async with Orchestrator() as orchestrator:
+            started = time.perf_counter()
+            await orchestrator.discover_agents()
+            latencies.append(time.perf_counter() - started)
+    return latencies
+
+
+async def run_load(orchestrator, queries, total, concurrency):
+    """Closed-loop load: `concurrency` workers issue `total` route_query calls
+
+    Returns:
+        (end-to-end latencies, wall-clock seconds, outcome counts)
+    """
+    latencies = []
+    outcomes = {"ok": 0, "unrouted": 0, "timed_out": 0}
+    remaining = iter(range(total))
+
+    async def worker():
+        for _ in remaining:
+            _, _, query = random.choice(queries)
+            started = time.perf_counter()
+            result = await orchestrator.route_query(query)
+            latencies.append(time.perf_counter() - started)
+            if result.startswith("❌"):
+                outcomes["unrouted"] += 1
+            elif "⏱️" in result:
+                outcomes["timed_out"] += 1
+            else:
+                outcomes["ok"] += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(max(1, concurrency))])
+    return latencies, time.perf_counter() - started, outcomes
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT, capture_output=True, text=True, timeout=5,
+        ).stdout.strip() or None
+    except Exception:
+        return None
+
+
+async def run_benchmark(args):
+    agents = []
+    context_forge = None
+    if not args.external:
+        os.environ.setdefault("TOKEN", "benchmark")  # The stand-in registry ignores it
+        orchestrator_module.CONTEXT_FORGE_URL = f"http://127.0.0.1:{args.context_forge_port}"
+        orchestrator_module.VIRTUAL_SERVER_NAME = VIRTUAL_SERVER
+        print(f"🚀 Starting {len(AGENT_SCRIPTS)} agents on ports {args.base_port}-{args.base_port + len(AGENT_SCRIPTS) - 1}...")
+        agents = start_agents(args.base_port, args.verbose)
+    orchestrator_module.SNAPSHOT_PATH = ""  # Always measure real discovery
+
+    try:
+        if agents:
+            await wait_for_agents(agents)
+            context_forge = start_context_forge(agents, args.context_forge_port)
+            print(f"🗂️  Context Forge stand-in on {orchestrator_module.CONTEXT_FORGE_URL}")
+
+        # The orchestrator logs as in production (queued, LOG_LEVEL), into the void
+        quiet = open(os.devnull, "w")
+        configure_logging("orchestrator", stream=sys.stderr if args.verbose else quiet)
+        samples = {"routing": [], "invocation": [], "by_agent": {}, "failed_calls": 0}
+
+        print(f"🔍 Measuring cold discovery ({args.discovery_runs} runs)...")
+        discovery = await measure_discovery(args.discovery_runs)
+
+        async with Orchestrator() as orchestrator:
+            await orchestrator.discover_agents()
+            if not orchestrator.agents:
+                raise RuntimeError("No agents discovered")
+            if args.no_cache:
+                orchestrator.response_cache.max_entries = 0
+            queries = build_query_mix(orchestrator.agents)
+            print(f"🧪 Query mix: {len(queries)} skill examples from {len(orchestrator.agents)} agents")
+
+            random.seed(args.seed)
+            if args.warmup:
+                print(f"🔥 Warming up ({args.warmup} queries)...")
+                await run_load(orchestrator, queries, args.warmup, args.concurrency)
+                orchestrator.response_cache.hits = orchestrator.response_cache.misses = 0
+
+            print(f"📈 Driving route_query: {args.requests} queries at concurrency {args.concurrency}...")
+            instrument(orchestrator, samples)
+            end_to_end, elapsed, outcomes = await run_load(orchestrator, queries, args.requests, args.concurrency)
+
+            results = {
+                "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+                "git_commit": git_commit(),
+                "python": platform.python_version(),
+                "config": {
+                    "requests": args.requests,
+                    "concurrency": args.concurrency,
+                    "warmup": args.warmup,
+                    "seed": args.seed,
+                    "external": args.external,
+                    "routing_engine": orchestrator_module.ROUTING_ENGINE,
+                    "response_cache": not args.no_cache,
+                    "single_flight": orchestrator.single_flight,
+                    "hedge_requests": orchestrator.hedge_requests,
+                },
+                "throughput_qps": len(end_to_end) / elapsed if elapsed else 0.0,
+                "duration_s": elapsed,
+                "outcomes": {**outcomes, "failed_agent_calls": samples["failed_calls"]},
+                "phases": {
+                    "discovery": summarize(discovery),
+                    "routing": summarize(samples["routing"]),
+                    "invocation": summarize(samples["invocation"]),
+                    "end_to_end": summarize(end_to_end),
+                },
+                "invocation_by_agent": {
+                    agent_name: summarize(latencies) for agent_name, latencies in sorted(samples["by_agent"].items())
+                },
+                "response_cache": orchestrator.response_cache.stats(),
+                "coalesced_calls": orchestrator.coalesced_calls,
+                "hedged_calls": orchestrator.hedged_calls,
+            }
+        return results
+    finally:
+        if context_forge is not None:
+            server, thread = context_forge
+            server.should_exit = True
+            thread.join(timeout=5)
+        stop_agents(agents)
+
+
+def print_report(results, baseline=None):
+    """Human-readable summary, with % change against a baseline run when given"""
+    def change(current, previous, lower_is_better=True):
+        if not previous:
+            return ""
+        delta = (current - previous) / previous * 100
+        better = delta < 0 if lower_is_better else delta > 0
+        return f" ({'✅' if better else '⚠️ '} {delta:+.1f}%)" if abs(delta) >= 0.05 else " (=)"
+
+    base_phases = (baseline or {}).get("phases", {})
+    print("\n" + "=" * 72)
+    print(f"📊 Orchestrator benchmark @ {results['git_commit'] or 'unknown commit'}")
+    print("=" * 72)
+    if baseline and baseline.get("config") != results["config"]:
+        print(f"⚠️  Baseline ({baseline.get('git_commit')}) ran with a different config: {baseline.get('config')}")
+    width = 24 if baseline else 11
+    print((f"{'phase':<12}{'count':>8}  " + "".join(f"{name:>9}".ljust(width) for name in ("p50 ms", "p95 ms", "p99 ms"))).rstrip())
+    for phase, stats in results["phases"].items():
+        if not stats.get("count"):
+            continue
+        base = base_phases.get(phase, {})
+        cells = []
+        for key in ("p50_ms", "p95_ms", "p99_ms"):
+            cells.append((f"{stats[key]:>9.2f}" + (change(stats[key], base.get(key)) if baseline else "")).ljust(width))
+        print((f"{phase:<12}{stats['count']:>8}  " + "".join(cells)).rstrip())
+
+    for agent_name, stats in results["invocation_by_agent"].items():
+        print(f"  • {agent_name:<18} p50 {stats['p50_ms']:.2f} ms, p99 {stats['p99_ms']:.2f} ms over {stats['count']} calls")
+
+    qps = results["throughput_qps"]
+    print(f"\n⚡ Throughput: {qps:.1f} queries/s over {results['duration_s']:.2f}s"
+          + (change(qps, baseline.get("throughput_qps"), lower_is_better=False) if baseline else ""))
+    outcomes = results["outcomes"]
+    print(f"✅ {outcomes['ok']} ok, {outcomes['unrouted']} unrouted, {outcomes['timed_out']} timed out, "
+          f"{outcomes['failed_agent_calls']} failed agent calls")
+    cache = results["response_cache"]
+    print(f"📦 Response cache: {cache['hit_rate']:.0%} hit rate; 🔗 {results['coalesced_calls']} coalesced calls")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Load-test Orchestrator.route_query against local agents")
+    parser.add_argument("--requests", type=int, default=1000, help="Queries to send (default: 1000)")
+    parser.add_argument("--concurrency", type=int, default=10, help="Concurrent route_query callers (default: 10)")
+    parser.add_argument("--warmup", type=int, default=50, help="Unmeasured warm-up queries (default: 50)")
+    parser.add_argument("--discovery-runs", type=int, default=5, help="Cold discoveries to time (default: 5)")
+    parser.add_argument("--seed", type=int, default=1, help="Query mix random seed (default: 1)")
+    parser.add_argument("--no-cache", action="store_true", help="Disable the response cache during the run")
+    parser.add_argument("--base-port", type=int, default=BASE_PORT, help=f"First agent port (default: {BASE_PORT})")
+    parser.add_argument("--context-forge-port", type=int, default=CONTEXT_FORGE_PORT,
+                        help=f"Context Forge stand-in port (default: {CONTEXT_FORGE_PORT})")
+    parser.add_argument("--external", action="store_true",
+                        help="Use already running agents and the configured Context Forge instead")
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    parser.add_argument("--baseline", help="Earlier --output file to compare against")
+    parser.add_argument("--verbose", action="store_true", help="Show agent process output and orchestrator logs")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    results = asyncio.run(run_benchmark(args))
+    print_report(results, baseline)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\n💾 Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -5,8 +5,13 @@ Create a virtual server in Context Forge and associate all registered agents
 import httpx
 import asyncio
 import os
+import re
 import sys
 
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from common.log import configure_logging, get_logger
+
+logger = get_logger('create_virtual_server')
 
 CONTEXT_FORGE_URL = "http://localhost:4444"
 BEARER_TOKEN = os.getenv("TOKEN")
@@ -17,26 +22,26 @@ async def create_virtual_server():
     """Create virtual server and associate agents"""
     
     if not BEARER_TOKEN:
-        print("❌ Error: TOKEN environment variable not set")
+        logger.error("❌ Error: TOKEN environment variable not set")
         print("Run: export TOKEN=$(curl -s -X POST http://localhost:4444/auth/login \\")
         print("  -H 'Content-Type: application/json' \\")
         print("  -d '{\"email\":\"admin@example.com\",\"password\":\"mvhari123\"}' | jq -r '.access_token')")
         sys.exit(1)
     
-    print("🔐 Using authentication token")
-    print(f"🌐 Context Forge URL: {CONTEXT_FORGE_URL}")
-    print(f"\n🏗️  Creating virtual server: {VIRTUAL_SERVER_NAME}\n")
+    logger.info("🔐 Using authentication token")
+    logger.info("🌐 Context Forge URL: %s", CONTEXT_FORGE_URL)
+    logger.info("🏗️  Creating virtual server: %s", VIRTUAL_SERVER_NAME)
     
     async with httpx.AsyncClient(timeout=30.0) as client:
         # First, get all registered agents
-        print("  📋 Fetching registered agents...")
+        logger.info("📋 Fetching registered agents...")
         response = await client.get(
             f"{CONTEXT_FORGE_URL}/a2a",
             headers={"Authorization": f"Bearer {BEARER_TOKEN}"}
         )
         
         if response.status_code != 200:
-            print(f"  ❌ Failed to fetch agents: {response.status_code}")
+            logger.error("❌ Failed to fetch agents: %s", response.status_code)
             sys.exit(1)
         
         agents = response.json()
@@ -44,16 +49,17 @@ async def create_virtual_server():
         agent_ids = []
         
         for agent in agents:
-            if agent.get('name') in agent_names:
+            # Replicas register as <name>_2, <name>_3, ... (see register_agents.py)
+            if re.sub(r'_\d+$', '', agent.get('name', '')) in agent_names:
                 agent_ids.append(agent.get('id'))
-                print(f"  ✅ Found {agent.get('name')} (ID: {agent.get('id')})")
+                logger.info("✅ Found %s (ID: %s)", agent.get('name'), agent.get('id'))
         
-        if len(agent_ids) != 3:
-            print(f"  ⚠️  Warning: Expected 3 agents, found {len(agent_ids)}")
-            print("  Make sure all agents are registered first (run register_agents.py)")
+        if len(agent_ids) < 3:
+            logger.warning("⚠️  Warning: Expected 3 agents, found %s. Make sure all agents are registered first "
+                           "(run register_agents.py)", len(agent_ids))
         
         # Check if virtual server already exists
-        print(f"\n  🔍 Checking if virtual server '{VIRTUAL_SERVER_NAME}' exists...")
+        logger.info("🔍 Checking if virtual server '%s' exists...", VIRTUAL_SERVER_NAME)
         try:
             response = await client.get(
                 f"{CONTEXT_FORGE_URL}/servers",
@@ -66,10 +72,10 @@ async def create_virtual_server():
                 
                 if existing:
                     server_id = existing.get('id')
-                    print(f"  ✅ Virtual server already exists (ID: {server_id})")
+                    logger.info("✅ Virtual server already exists (ID: %s)", server_id)
                     
                     # Update associations
-                    print(f"  🔄 Updating agent associations...")
+                    logger.info("🔄 Updating agent associations...")
                     update_response = await client.put(
                         f"{CONTEXT_FORGE_URL}/servers/{server_id}",
                         headers={
@@ -86,16 +92,16 @@ async def create_virtual_server():
                     )
                     
                     if update_response.status_code in [200, 204]:
-                        print(f"  ✅ Virtual server updated successfully")
+                        logger.info("✅ Virtual server updated successfully")
                     else:
-                        print(f"  ⚠️  Update status: {update_response.status_code}")
+                        logger.warning("⚠️  Update status: %s", update_response.status_code)
                     
                     return server_id
         except Exception as e:
-            print(f"  ⚠️  Could not check existing servers: {e}")
+            logger.warning("⚠️  Could not check existing servers: %s", e)
         
         # Create new virtual server
-        print(f"\n  🏗️  Creating new virtual server...")
+        logger.info("🏗️  Creating new virtual server...")
         try:
             response = await client.post(
                 f"{CONTEXT_FORGE_URL}/servers",
@@ -115,23 +121,23 @@ async def create_virtual_server():
             if response.status_code in [200, 201]:
                 result = response.json()
                 server_id = result.get('id')
-                print(f"  ✅ Virtual server created successfully (ID: {server_id})")
-                print(f"\n✨ Setup complete!")
-                print(f"   Virtual server: {VIRTUAL_SERVER_NAME}")
-                print(f"   Associated agents: {len(agent_ids)}")
-                print(f"   Endpoint: {CONTEXT_FORGE_URL}/servers/{VIRTUAL_SERVER_NAME}/agents\n")
+                logger.info("✅ Virtual server created successfully (ID: %s)", server_id)
+                logger.info("✨ Setup complete!")
+                logger.info("Virtual server: %s", VIRTUAL_SERVER_NAME)
+                logger.info("Associated agents: %s", len(agent_ids))
+                logger.info("Endpoint: %s/servers/%s/agents", CONTEXT_FORGE_URL, VIRTUAL_SERVER_NAME)
                 return server_id
             else:
-                print(f"  ❌ Failed to create virtual server: {response.status_code}")
-                print(f"     Response: {response.text}")
+                logger.error("❌ Failed to create virtual server: %s %s", response.status_code, response.text)
                 sys.exit(1)
                 
         except Exception as e:
-            print(f"  ❌ Error creating virtual server: {e}")
+            logger.error("❌ Error creating virtual server: %s", e)
             sys.exit(1)
 
 
 if __name__ == "__main__":
+    configure_logging('create_virtual_server', use_queue=False)  # In order with the printed instructions
     asyncio.run(create_virtual_server())
 
 # Made with Bob
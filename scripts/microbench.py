@@ -0,0 +1,404 @@
+#!/usr/bin/env python3
+"""
+Microbenchmarks for the CPU-bound hot paths run on every request
+
+Covers query routing (Orchestrator.match_query_to_skills per engine and the
+batch path) and each agent's query parsing:
+CalculatorAgent.process_query / convert_currency / convert_temperature,
+TravelAgent.process_query, WeatherAgent.get_weather and
+EmailAgent.process_query. The email agent's intent/slot parser is also timed
+alone (email.parse) next to the chained checks and per-handler regexes it
+replaced (email.parse.legacy), on the same corpora.
+
+Every benchmark runs over generated query corpora at increasing size and
+vocabulary (small / medium / large; routing also grows the agent registry).
+It reports ops/sec (best of --repeat passes) and, from one extra pass under
+tracemalloc, peak and retained memory per op. Results can be appended to a
+JSONL history and compared against a baseline, failing on regressions.
+
+Usage:
+    python3 scripts/microbench.py
+    python3 scripts/microbench.py --only routing --levels small,medium
+    python3 scripts/microbench.py --history bench_history.jsonl --baseline bench_history.jsonl --max-regression 0.15
+"""
+import argparse
+import importlib.util
+import json
+import os
+import random
+import re
+import subprocess
+import sys
+import time
+import tracemalloc
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, REPO_ROOT)
+
+from orchestrator.orchestrator import Orchestrator
+from orchestrator.routing import AGENT_KEYWORDS
+
+# Corpus levels: queries per corpus, distinct filler words, agents in the routing registry
+LEVELS = {
+    "small": {"queries": 200, "vocabulary": 100, "agents": 4},
+    "medium": {"queries": 2000, "vocabulary": 1000, "agents": 40},
+    "large": {"queries": 10000, "vocabulary": 10000, "agents": 200},
+}
+
+CITIES = ["Dallas", "Chicago", "New York", "Tokyo", "Paris", "London", "Maldives", "Thailand"]
+CURRENCIES = ["USD", "EUR", "GBP", "JPY"]
+EMAIL_DOMAINS = ["gmail.com", "yahoo.com", "outlook.com", "example.com"]
+
+
+def load_module(name, relative_path):
+    """Import an agent module by path (agent directories are not packages)"""
+    if name in sys.modules:
+        return sys.modules[name]
+    path = os.path.join(REPO_ROOT, relative_path)
+    sys.path.insert(0, os.path.dirname(path))
+    try:
+        spec = importlib.util.spec_from_file_location(name, path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        sys.modules[name] = module
+        return module
+    finally:
+        sys.path.pop(0)
+
+
+def run_sync(coroutine):
+    """Drive a coroutine that never suspends (the agents' parsing methods) without an event loop"""
+    try:
+        coroutine.send(None)
+    except StopIteration as done:
+        return done.value
+    coroutine.close()
+    raise RuntimeError("benchmarked coroutine awaited real I/O")
+
+
+def make_vocabulary(size, rng):
+    """Pseudo-words for query filler and synthetic skills; size grows the vocabulary"""
+    syllables = ["ka", "lo", "mi", "ren", "tas", "vo", "qui", "zen", "dor", "pel", "sun", "bra"]
+    words = set()
+    while len(words) < size:
+        words.add("".join(rng.choice(syllables) for _ in range(rng.randint(2, 4))))
+    return sorted(words)
+
+
+def filler(vocabulary, rng, max_words=6):
+    return " ".join(rng.choice(vocabulary) for _ in range(rng.randint(0, max_words)))
+
+
+def with_filler(query, vocabulary, rng):
+    """Surround a query with random vocabulary, as free-form user text would"""
+    return f"{filler(vocabulary, rng, 3)} {query} {filler(vocabulary, rng, 3)}".strip()
+
+
+# --- Query generators (one per skill family) ---
+
+def weather_query(rng):
+    city = rng.choice(CITIES)
+    return rng.choice([f"What's the weather in {city}?", f"Weather forecast for {city}", f"Is it sunny in {city}"])
+
+
+def currency_query(rng):
+    amount = rng.choice([str(rng.randint(1, 5000)), f"{rng.uniform(1, 999):.2f}"])
+    source, target = rng.choice(CURRENCIES + ["CHF"]), rng.choice(CURRENCIES)
+    return rng.choice([f"Convert {amount} {source} to {target}", f"{amount}{source} to {target}", f"{amount} {source} in {target}"])
+
+
+def temperature_query(rng):
+    value = rng.randint(-20, 110)
+    return rng.choice([f"{value}°C to F", f"{value}°F to C", f"Convert {value} celsius to fahrenheit"])
+
+
+def math_query(rng):
+    return rng.choice([
+        f"{rng.randint(1, 999)} * {rng.randint(1, 99)} + {rng.randint(0, 500)}",
+        f"Calculate {rng.randint(1, 9999)} / {rng.randint(1, 99)}",
+        f"({rng.randint(1, 99)} + {rng.randint(1, 99)}) * {rng.randint(1, 9)}",
+    ])
+
+
+def travel_query(rng):
+    city = rng.choice(CITIES)
+    return rng.choice([
+        f"Budget for {rng.randint(2, 21)} days in {city}",
+        f"Travel tips for {city}",
+        f"Recommend a {rng.choice(['romantic', 'adventure', 'beach', 'cultural', 'cheap'])} destination",
+        f"How expensive is {city}?",
+    ])
+
+
+def email_address(vocabulary, rng):
+    return f"{rng.choice(vocabulary)}.{rng.randint(1, 999)}@{rng.choice(EMAIL_DOMAINS + [rng.choice(vocabulary) + '.io'])}"
+
+
+def email_query(vocabulary, rng, email_ids):
+    address = email_address(vocabulary, rng)
+    return rng.choice([
+        f"Send email to {address} with subject {filler(vocabulary, rng, 3) or 'Hello'} and message {filler(vocabulary, rng)}",
+        f"Validate email {address}",
+        f"Is {address} a valid email? check it",
+        f"Check status {rng.choice(email_ids)}" if email_ids else "What is the delivery status?",
+        "Track email delivery",
+        f"{filler(vocabulary, rng)} help",
+    ])
+
+
+# --- Synthetic routing registry ---
+
+def make_registry(n_agents, vocabulary, rng):
+    """Orchestrator registry of n_agents; the first ones carry the real agents' keywords"""
+    domain_words = {name: words for name, words in AGENT_KEYWORDS.items()}
+    domain_words["email_agent"] = ["email", "send", "validate", "delivery", "status", "track", "recipient"]
+    names = list(domain_words)[:n_agents] + [f"agent_{i:03d}" for i in range(max(0, n_agents - len(domain_words)))]
+
+    registry = {}
+    for agent_name in names:
+        words = domain_words.get(agent_name) or rng.sample(vocabulary, min(8, len(vocabulary)))
+        skills = {}
+        for skill_pos in range(rng.randint(2, 4)):
+            pick = lambda k: " ".join(rng.choice(words if rng.random() < 0.6 else vocabulary) for _ in range(k))
+            skills[f"{agent_name}_skill_{skill_pos}"] = {
+                "name": pick(2).title(),
+                "description": pick(rng.randint(8, 15)),
+                "tags": [rng.choice(words) for _ in range(3)],
+                "examples": [pick(5), pick(6)],
+            }
+        registry[agent_name] = {"endpoint_url": f"http://{agent_name}.local", "skills": skills}
+    return registry
+
+
+def routing_query(rng, vocabulary):
+    query = rng.choice([weather_query, currency_query, temperature_query, math_query, travel_query])(rng)
+    return with_filler(query, vocabulary, rng)
+
+
+# --- Benchmarks: each setup returns (per-query callable, corpus, batch callable) for a level ---
+
+def bench_routing(engine, batch=False):
+    def setup(level, rng):
+        vocabulary = make_vocabulary(level["vocabulary"], rng)
+        orchestrator = Orchestrator(routing_engine=engine)
+        orchestrator.agents = make_registry(level["agents"], vocabulary, rng)
+        orchestrator.router.sync(orchestrator.agents)
+        corpus = [routing_query(rng, vocabulary) for _ in range(level["queries"])]
+        if batch:
+            return None, corpus, lambda queries: orchestrator.route_batch(queries)
+        return orchestrator.match_query_to_skills, corpus, None
+    return setup
+
+
+def bench_agent(module_name, path, class_name, method, generators):
+    def setup(level, rng):
+        module = load_module(module_name, path)
+        agent = getattr(module, class_name)()
+        vocabulary = make_vocabulary(level["vocabulary"], rng)
+        corpus = [with_filler(rng.choice(generators)(rng), vocabulary, rng) for _ in range(level["queries"])]
+        handler = getattr(agent, method)
+        return (lambda query: run_sync(handler(query))), corpus, None
+    return setup
+
+
+def bench_email(level, rng):
+    module = load_module("email_agent_executor", "email-agent/agent_executor.py")
+    agent = module.EmailAgent()
+    # No event loop here, so queued emails are never delivered: keep them all
+    agent.delivery.max_queued = 0
+    vocabulary = make_vocabulary(level["vocabulary"], rng)
+    # Seed some sent emails so status checks hit real ids
+    for _ in range(20):
+        run_sync(agent.send_email(f"send email to {email_address(vocabulary, rng)} with subject Hi and message Hello"))
+    email_ids = [email_id for email_id, _ in agent.sent_emails.recent(20)]
+    corpus = [email_query(vocabulary, rng, email_ids) for _ in range(level["queries"])]
+    return (lambda query: run_sync(agent.process_query(query))), corpus, None
+
+
+def legacy_email_parse(query):
+    """EmailAgent's parsing before intent_parser: chained `in` checks, then each handler's inline re.search calls
+    
+    Kept as the reference email.parse is measured against.
+    """
+    query_lower = query.lower()
+    bulk = 'bulk' in query_lower or query.count('@') > 1
+    if 'send' in query_lower and ('email' in query_lower or 'mail' in query_lower):
+        if bulk:
+            return 'bulk_send_email', None
+        to_match = re.search(r'(?:to|recipient)\s+([a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,})', query)
+        subject_match = re.search(r'(?:subject|title)\s+([^,\.]+?)(?:\s+(?:and|with|message|body)|$)', query, re.IGNORECASE)
+        message_match = re.search(r'(?:message|body|text)\s+(.+?)(?:\s*$)', query, re.IGNORECASE)
+        return 'send_email', (to_match and to_match.group(1),
+                              subject_match.group(1).strip() if subject_match else None,
+                              message_match.group(1).strip() if message_match else None)
+    if 'validate' in query_lower or 'check' in query_lower and 'valid' in query_lower:
+        if bulk:
+            return 'bulk_validate_email', None
+        email_match = re.search(r'([a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,})', query)
+        return 'validate_email', email_match and email_match.group(1)
+    if 'status' in query_lower or 'delivery' in query_lower or 'track' in query_lower:
+        id_match = re.search(r'email_[a-f0-9]{8}', query)
+        if id_match:
+            return 'check_email_status', id_match.group(0)
+        recipient_match = re.search(r'[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}', query)
+        status_match = re.search(r'\b(queued|sent|failed)\b', query, re.IGNORECASE)
+        return 'check_email_status', (recipient_match and recipient_match.group(0), status_match and status_match.group(1))
+    return None, None
+
+
+def bench_email_parse(legacy):
+    def setup(level, rng):
+        module = load_module("email_intent_parser", "email-agent/intent_parser.py")
+        vocabulary = make_vocabulary(level["vocabulary"], rng)
+        email_ids = [f"email_{rng.getrandbits(32):08x}" for _ in range(20)]
+        corpus = [email_query(vocabulary, rng, email_ids) for _ in range(level["queries"])]
+        return (legacy_email_parse if legacy else module.parse_query), corpus, None
+    return setup
+
+
+BENCHMARKS = {
+    "routing.bm25.match": bench_routing("bm25"),
+    "routing.bm25.match_batch": bench_routing("bm25", batch=True),
+    "routing.keyword.match": bench_routing("keyword"),
+    "calculator.process_query": bench_agent(
+        "calculator_agent", "agents/calculator_agent.py", "CalculatorAgent", "process_query",
+        [math_query, currency_query, temperature_query]),
+    "calculator.convert_currency": bench_agent(
+        "calculator_agent", "agents/calculator_agent.py", "CalculatorAgent", "convert_currency", [currency_query]),
+    "calculator.convert_temperature": bench_agent(
+        "calculator_agent", "agents/calculator_agent.py", "CalculatorAgent", "convert_temperature", [temperature_query]),
+    "travel.process_query": bench_agent(
+        "travel_agent", "agents/travel_agent.py", "TravelAgent", "process_query", [travel_query]),
+    "weather.get_weather": bench_agent(
+        "weather_agent_executor", "weather-agent/agent_executor.py", "WeatherAgent", "get_weather", [weather_query]),
+    "email.process_query": bench_email,
+    "email.parse": bench_email_parse(legacy=False),
+    "email.parse.legacy": bench_email_parse(legacy=True),
+}
+
+
+def run_pass(handler, batch_handler, corpus):
+    if batch_handler is not None:
+        batch_handler(corpus)
+    else:
+        for query in corpus:
+            handler(query)
+
+
+def measure(setup, level, repeat, seed):
+    """ops/sec (best of repeat) plus tracemalloc peak/retained bytes for one pass"""
+    rng = random.Random(seed)
+    handler, corpus, batch_handler = setup(level, rng)
+    run_pass(handler, batch_handler, corpus)  # Warm caches and lazy imports
+
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        run_pass(handler, batch_handler, corpus)
+        best = min(best, time.perf_counter() - started)
+
+    tracemalloc.start()
+    baseline, _ = tracemalloc.get_traced_memory()
+    tracemalloc.reset_peak()
+    run_pass(handler, batch_handler, corpus)
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    n = len(corpus)
+    return {
+        "queries": n,
+        "ops_per_sec": n / best if best else float("inf"),
+        "us_per_op": best / n * 1e6,
+        "peak_kib": (peak - baseline) / 1024,
+        "retained_bytes_per_op": (current - baseline) / n,
+    }
+
+
+def load_baseline(path):
+    """Results of a --output file, or of the last run in a --history file"""
+    with open(path) as f:
+        lines = [line for line in f.read().splitlines() if line.strip()]
+    if path.endswith(".jsonl"):
+        return json.loads(lines[-1])
+    return json.loads("\n".join(lines))
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT, capture_output=True, text=True, timeout=5,
+        ).stdout.strip() or None
+    except Exception:
+        return None
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Microbenchmark routing and agent query parsing")
+    parser.add_argument("--only", help="Run benchmarks whose name contains this text")
+    parser.add_argument("--levels", default=",".join(LEVELS), help=f"Comma-separated corpus levels (default: all of {', '.join(LEVELS)})")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed passes per benchmark; the best counts (default: 5)")
+    parser.add_argument("--seed", type=int, default=1, help="Corpus random seed (default: 1)")
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    parser.add_argument("--history", help="Append results as one JSON line to this file")
+    parser.add_argument("--baseline", help="Earlier --output or --history file to compare against")
+    parser.add_argument("--max-regression", type=float, default=None,
+                        help="Exit 1 if any ops/sec drops by more than this fraction vs the baseline (e.g. 0.15)")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    levels = [level.strip() for level in args.levels.split(",") if level.strip()]
+    unknown = [level for level in levels if level not in LEVELS]
+    if unknown:
+        print(f"❌ Unknown level(s): {', '.join(unknown)}")
+        sys.exit(2)
+    baseline = load_baseline(args.baseline)["results"] if args.baseline else {}
+
+    print(f"{'benchmark':<32}{'level':<8}{'queries':>8}{'ops/sec':>13}{'µs/op':>9}{'peak KiB':>10}{'B/op kept':>11}")
+    results = {}
+    regressions = []
+    for name, setup in BENCHMARKS.items():
+        if args.only and args.only not in name:
+            continue
+        for level in levels:
+            key = f"{name}[{level}]"
+            stats = measure(setup, LEVELS[level], args.repeat, args.seed)
+            results[key] = stats
+
+            line = (f"{name:<32}{level:<8}{stats['queries']:>8}{stats['ops_per_sec']:>13,.0f}"
+                    f"{stats['us_per_op']:>9.2f}{stats['peak_kib']:>10.1f}{stats['retained_bytes_per_op']:>11.1f}")
+            previous = baseline.get(key)
+            if previous:
+                delta = stats["ops_per_sec"] / previous["ops_per_sec"] - 1
+                line += f"  {'✅' if delta >= 0 else '⚠️ '} {delta:+.1%}"
+                if args.max_regression is not None and -delta > args.max_regression:
+                    regressions.append((key, delta))
+            print(line, flush=True)
+
+    record = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "git_commit": git_commit(),
+        "python": sys.version.split()[0],
+        "repeat": args.repeat,
+        "seed": args.seed,
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(record, f, indent=2)
+        print(f"\n💾 Results written to {args.output}")
+    if args.history:
+        with open(args.history, "a") as f:
+            f.write(json.dumps(record) + "\n")
+        print(f"📜 Appended to history {args.history}")
+
+    if regressions:
+        print(f"\n❌ {len(regressions)} benchmark(s) regressed by more than {args.max_regression:.0%}:")
+        for key, delta in regressions:
+            print(f"   • {key}: {delta:+.1%} ops/sec")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
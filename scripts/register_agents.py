@@ -7,6 +7,10 @@ import asyncio
 import os
 import sys
 
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from common.log import configure_logging, get_logger
+
+logger = get_logger('register_agents')
 
 CONTEXT_FORGE_URL = "http://localhost:4444"
 BEARER_TOKEN = os.getenv("TOKEN")
@@ -38,27 +42,35 @@ AGENTS = [
     }
 ]
 
+# Extra replicas per agent, as comma-separated endpoint URLs, e.g.
+# WEATHER_AGENT_REPLICAS=http://localhost:5011,http://localhost:5021
+# Each registers as <name>_2, <name>_3, ...; the orchestrator groups them by AgentCard name
+for base_agent in list(AGENTS):
+    replica_urls = os.getenv(f"{base_agent['name'].upper()}_REPLICAS", "")
+    for index, endpoint_url in enumerate(filter(None, replica_urls.split(",")), start=2):
+        AGENTS.append({**base_agent, "name": f"{base_agent['name']}_{index}", "endpoint_url": endpoint_url.strip()})
+
 
 async def register_agents():
     """Register all agents with Context Forge"""
     
     if not BEARER_TOKEN:
-        print("❌ Error: TOKEN environment variable not set")
+        logger.error("❌ Error: TOKEN environment variable not set")
         print("Run: export TOKEN=$(curl -s -X POST http://localhost:4444/auth/login \\")
         print("  -H 'Content-Type: application/json' \\")
         print("  -d '{\"email\":\"admin@example.com\",\"password\":\"mvhari123\"}' | jq -r '.access_token')")
         sys.exit(1)
     
-    print("🔐 Using authentication token")
-    print(f"🌐 Context Forge URL: {CONTEXT_FORGE_URL}")
-    print(f"\n📝 Registering {len(AGENTS)} agents...\n")
+    logger.info("🔐 Using authentication token")
+    logger.info("🌐 Context Forge URL: %s", CONTEXT_FORGE_URL)
+    logger.info("📝 Registering %s agents...", len(AGENTS))
     
     registered_ids = {}
     
     async with httpx.AsyncClient(timeout=30.0) as client:
         for agent in AGENTS:
             agent_name = agent["name"]
-            print(f"  📋 Registering {agent_name}...")
+            logger.info("📋 Registering %s...", agent_name)
             
             try:
                 # Check if agent already exists
@@ -73,7 +85,7 @@ async def register_agents():
                     
                     if existing:
                         agent_id = existing.get('id')
-                        print(f"  ✅ {agent_name} already registered (ID: {agent_id})")
+                        logger.info("✅ %s already registered (ID: %s)", agent_name, agent_id)
                         registered_ids[agent_name] = agent_id
                         continue
                 
@@ -91,27 +103,27 @@ async def register_agents():
                     result = response.json()
                     agent_id = result.get('id')
                     registered_ids[agent_name] = agent_id
-                    print(f"  ✅ {agent_name} registered successfully (ID: {agent_id})")
+                    logger.info("✅ %s registered successfully (ID: %s)", agent_name, agent_id)
                 else:
-                    print(f"  ❌ Failed to register {agent_name}: {response.status_code}")
-                    print(f"     Response: {response.text}")
+                    logger.error("❌ Failed to register %s: %s %s", agent_name, response.status_code, response.text)
                     
             except Exception as e:
-                print(f"  ❌ Error registering {agent_name}: {e}")
+                logger.error("❌ Error registering %s: %s", agent_name, e)
     
-    print(f"\n✨ Registration complete: {len(registered_ids)}/{len(AGENTS)} agents registered\n")
+    logger.info("✨ Registration complete: %s/%s agents registered", len(registered_ids), len(AGENTS))
     
     # Save agent IDs for virtual server creation
     if len(registered_ids) == len(AGENTS):
         with open('.agent_ids', 'w') as f:
             for name, agent_id in registered_ids.items():
                 f.write(f"{name}={agent_id}\n")
-        print("💾 Agent IDs saved to .agent_ids\n")
+        logger.info("💾 Agent IDs saved to .agent_ids")
     
     return registered_ids
 
 
 if __name__ == "__main__":
+    configure_logging('register_agents', use_queue=False)  # In order with the printed instructions
     asyncio.run(register_agents())
 
 # Made with Bob
@@ -8,6 +8,10 @@ import asyncio
 import os
 import sys
 
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from common.log import configure_logging, get_logger
+
+logger = get_logger('register_remote_agent')
 
 CONTEXT_FORGE_URL = "http://localhost:4444"
 BEARER_TOKEN = os.getenv("TOKEN")
@@ -34,15 +38,15 @@ async def register_remote_agent():
     """Register the remote email agent with Context Forge"""
     
     if not BEARER_TOKEN:
-        print("❌ Error: TOKEN environment variable not set")
+        logger.error("❌ Error: TOKEN environment variable not set")
         print("Run: export TOKEN=$(curl -s -X POST http://localhost:4444/auth/login \\")
         print("  -H 'Content-Type: application/json' \\")
         print("  -d '{\"email\":\"admin@example.com\",\"password\":\"mvhari123\"}' | jq -r '.access_token')")
         sys.exit(1)
     
-    print("🔐 Using authentication token")
-    print(f"🌐 Context Forge URL: {CONTEXT_FORGE_URL}")
-    print(f"\n📝 Registering remote agent: {REMOTE_AGENT['name']}...\n")
+    logger.info("🔐 Using authentication token")
+    logger.info("🌐 Context Forge URL: %s", CONTEXT_FORGE_URL)
+    logger.info("📝 Registering remote agent: %s...", REMOTE_AGENT['name'])
     
     async with httpx.AsyncClient(timeout=30.0) as client:
         agent_name = REMOTE_AGENT["name"]
@@ -60,8 +64,8 @@ async def register_remote_agent():
                 
                 if existing:
                     agent_id = existing.get('id')
-                    print(f"  ℹ️  {agent_name} already registered (ID: {agent_id})")
-                    print(f"  📍 Endpoint: {existing.get('endpoint_url') or existing.get('endpointUrl')}")
+                    logger.info("ℹ️  %s already registered (ID: %s)", agent_name, agent_id)
+                    logger.info("📍 Endpoint: %s", existing.get('endpoint_url') or existing.get('endpointUrl'))
                     
                     # Ask if user wants to update
                     print(f"\n  💡 To update, delete the existing agent first:")
@@ -70,7 +74,7 @@ async def register_remote_agent():
                     return
             
             # Register new agent
-            print(f"  📤 Registering {agent_name} as remote SaaS agent...")
+            logger.info("📤 Registering %s as remote SaaS agent...", agent_name)
             response = await client.post(
                 f"{CONTEXT_FORGE_URL}/a2a",
                 headers={
@@ -83,17 +87,17 @@ async def register_remote_agent():
             if response.status_code in [200, 201]:
                 result = response.json()
                 agent_id = result.get('id')
-                print(f"  ✅ {agent_name} registered successfully!")
-                print(f"  📧 Agent ID: {agent_id}")
-                print(f"  📍 Endpoint: {REMOTE_AGENT['endpoint_url']}")
-                print(f"  🏷️  Tags: {', '.join(REMOTE_AGENT['tags'])}")
-                print(f"  🌐 Location: {REMOTE_AGENT['metadata']['location']}")
-                print(f"  ☁️  Provider: {REMOTE_AGENT['metadata']['provider']}")
+                logger.info("✅ %s registered successfully!", agent_name)
+                logger.info("📧 Agent ID: %s", agent_id)
+                logger.info("📍 Endpoint: %s", REMOTE_AGENT['endpoint_url'])
+                logger.info("🏷️  Tags: %s", ', '.join(REMOTE_AGENT['tags']))
+                logger.info("🌐 Location: %s", REMOTE_AGENT['metadata']['location'])
+                logger.info("☁️  Provider: %s", REMOTE_AGENT['metadata']['provider'])
                 
                 # Save agent ID
                 with open('.agent_ids', 'a') as f:
                     f.write(f"{agent_name}={agent_id}\n")
-                print(f"\n  💾 Agent ID saved to .agent_ids")
+                logger.info("💾 Agent ID saved to .agent_ids")
                 
                 print(f"\n  🎯 Next Steps:")
                 print(f"     1. Test locally: curl http://localhost:5004/.well-known/agent.json")
@@ -102,14 +106,14 @@ async def register_remote_agent():
                 print(f"     4. Re-register with updated URL")
                 
             else:
-                print(f"  ❌ Failed to register {agent_name}: {response.status_code}")
-                print(f"     Response: {response.text}")
+                logger.error("❌ Failed to register %s: %s %s", agent_name, response.status_code, response.text)
                 
         except Exception as e:
-            print(f"  ❌ Error registering {agent_name}: {e}")
+            logger.error("❌ Error registering %s: %s", agent_name, e)
 
 
 if __name__ == "__main__":
+    configure_logging('register_remote_agent', use_queue=False)  # In order with the printed instructions
     print("="*60)
     print("🚀 Remote Agent Registration")
     print("="*60)
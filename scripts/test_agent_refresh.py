@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""Test incremental agent refresh when an AgentCard fetch fails, then recovers
+
+Runs offline: the registry listing and the card fetches are replaced by
+in-memory fakes. Run directly or with pytest.
+"""
+
+import asyncio
+import json
+import os
+import sys
+import tempfile
+
+# Add parent directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+os.environ["AGENT_SNAPSHOT_PATH"] = ""  # Keep the on-disk snapshot out of the test
+
+from a2a.types import AgentCapabilities, AgentCard, AgentSkill
+
+import orchestrator.orchestrator as orchestrator_module
+from orchestrator.orchestrator import DISCOVERY_CACHE, Orchestrator, _agent_info
+
+
+def listing_entry(updated_at):
+    return {'id': 'weather-1', 'name': 'weather-agent', 'endpoint_url': 'http://weather:5001',
+            'updated_at': updated_at, 'enabled': True}
+
+
+def card_info(entry, skill_id):
+    return {
+        'name': 'Weather Agent',
+        'id': entry['id'],
+        'endpoint_url': entry['endpoint_url'],
+        'updated_at': entry['updated_at'],
+        'card': None,
+        'card_hash': skill_id,
+        'cache_policy': {},
+        'side_effects': set(),
+        'streaming': False,
+        'skills': {skill_id: {'name': skill_id, 'description': 'Weather', 'tags': ['weather'], 'examples': []}},
+    }
+
+
+class FakeRegistry:
+    """Listing and AgentCards served to the orchestrator, with a switch to fail card fetches"""
+
+    def __init__(self):
+        self.listing = [listing_entry('1')]
+        self.skill = 'get_weather_v1'
+        self.fail = False
+        self.fetches = 0
+
+    def install(self, orchestrator):
+        async def fetch_listing(use_virtual_server, etag=None, quiet=False):
+            return [dict(entry) for entry in self.listing], None
+
+        async def fetch_card(httpx_client, semaphore, agent):
+            self.fetches += 1
+            if self.fail:
+                return agent['name'], None, "connection refused"
+            return agent['name'], card_info(agent, self.skill), None
+
+        orchestrator._fetch_registry_listing = fetch_listing
+        orchestrator._fetch_agent_card = fetch_card
+
+
+async def run_fail_then_recover():
+    DISCOVERY_CACHE.clear()
+    registry = FakeRegistry()
+    async with Orchestrator() as orchestrator:
+        registry.install(orchestrator)
+        await orchestrator.discover_agents()
+        assert list(orchestrator.agents['Weather Agent']['skills']) == ['get_weather_v1']
+
+        # The agent is updated, but its new card cannot be fetched: the old card is kept
+        registry.listing = [listing_entry('2')]
+        registry.skill = 'get_weather_v2'
+        registry.fail = True
+        await orchestrator.refresh_agents()
+        agent = orchestrator.agents['Weather Agent']
+        assert list(agent['skills']) == ['get_weather_v1']
+        assert agent['replicas'][0]['updated_at'] == '1', "replica must keep the version its card came from"
+
+        # The next refresh retries the fetch and picks up the new card
+        registry.fail = False
+        fetches = registry.fetches
+        await orchestrator.revalidate_agents()
+        assert registry.fetches == fetches + 1
+        agent = orchestrator.agents['Weather Agent']
+        assert list(agent['skills']) == ['get_weather_v2']
+        assert agent['replicas'][0]['updated_at'] == '2'
+
+        # Now up to date: nothing left to fetch
+        await orchestrator.refresh_agents()
+        assert registry.fetches == fetches + 1
+
+
+def test_refresh_retries_failed_card_fetch():
+    asyncio.run(run_fail_then_recover())
+
+
+async def run_snapshot_round_trip():
+    card = AgentCard(
+        name='weather_agent', version='1.0.0', description='Weather forecasts', url='http://weather:5001',
+        capabilities=AgentCapabilities(streaming=True), default_input_modes=['text'], default_output_modes=['text'],
+        skills=[AgentSkill(id='get_forecast', name='Weather Forecast', description='Multi-day weather forecast',
+                           tags=['weather', 'forecast'], examples=['Forecast for Paris'])],
+    )
+    entry = listing_entry('1')
+    agent = {**_agent_info(card, entry['name'], entry), 'endpoints': [entry['endpoint_url']],
+             'replicas': [{'endpoint_url': entry['endpoint_url'], 'updated_at': '1'}]}
+    path = os.path.join(tempfile.mkdtemp(prefix="snapshot_test_"), "cache", "agent_snapshot.json")
+    orchestrator_module.SNAPSHOT_PATH = path
+    try:
+        async with Orchestrator() as orchestrator:
+            orchestrator._save_snapshot(False, {'agents': {'weather_agent': agent}, 'etag': 'W/"1"', 'fingerprint': 'fp'})
+            with open(path) as f:
+                saved = json.load(f)  # Plain JSON, nothing pickled
+            assert saved['agents']['weather_agent']['card']['skills'][0]['id'] == 'get_forecast'
+
+            loaded = orchestrator._load_snapshot(False)
+            assert loaded['etag'] == 'W/"1"' and loaded['fingerprint'] == 'fp'
+            assert loaded['fetched_at'] == float('-inf')
+            restored = loaded['agents']['weather_agent']
+            for field in ('card', 'card_hash', 'skills', 'streaming', 'cache_policy', 'endpoints', 'replicas'):
+                assert restored[field] == agent[field], field
+
+            # The index is rebuilt from the restored cards
+            orchestrator.router.sync(loaded['agents'])
+            assert orchestrator.router.match("weather forecast for Paris")[0]['agent_name'] == 'weather_agent'
+
+            # A snapshot for another Context Forge or virtual server is ignored
+            assert orchestrator._load_snapshot(True) is None
+    finally:
+        orchestrator_module.SNAPSHOT_PATH = ""
+
+
+def test_snapshot_round_trip():
+    asyncio.run(run_snapshot_round_trip())
+
+
+if __name__ == "__main__":
+    test_refresh_retries_failed_card_fetch()
+    print("✅ Refresh retries a failed AgentCard fetch")
+    test_snapshot_round_trip()
+    print("✅ Snapshot round-trips AgentCards as JSON")
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""Test that identical concurrent agent calls share one upstream request
+
+The orchestrator's _send_balanced is replaced by a stub that counts calls
+and holds them until released; no agents or Context Forge needed. Run
+directly or with pytest.
+"""
+
+import asyncio
+import os
+import sys
+
+# Add parent directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+os.environ.setdefault("AGENT_SNAPSHOT_PATH", "")
+
+from orchestrator.orchestrator import Orchestrator
+
+QUERY = "What's the weather in Paris?"
+# Spellings normalize_query folds into QUERY
+VARIANTS = [QUERY, "what's the weather in paris", "  WHAT'S  the weather in Paris?! "]
+
+
+class StubUpstream:
+    """Stands in for _send_balanced: counts calls, holds them until release()"""
+
+    def __init__(self, reply=("☀️ Sunny, 22°C", {'skill_id': 'get_weather'}), error=None):
+        self.reply = reply
+        self.error = error
+        self.calls = 0
+        self.released = asyncio.Event()
+
+    async def __call__(self, agent_name, endpoints, query, hedge=False):
+        self.calls += 1
+        await self.released.wait()
+        if self.error is not None:
+            raise self.error
+        return self.reply
+
+    def release(self):
+        self.released.set()
+
+
+def make_orchestrator(upstream, side_effects=()):
+    orchestrator = Orchestrator()
+    orchestrator.single_flight = True
+    orchestrator.agents = {
+        'weather_agent': {
+            'endpoint_url': "http://weather",
+            'cache_policy': {'get_weather': 300.0},
+            'side_effects': frozenset(side_effects),
+            'skills': {},
+        }
+    }
+    orchestrator._send_balanced = upstream
+    return orchestrator
+
+
+async def call_concurrently(orchestrator, upstream, queries):
+    """Invoke every query at once, release the upstream once all are waiting"""
+    calls = [
+        asyncio.ensure_future(orchestrator.invoke_agent('weather_agent', query, skill_id='get_weather'))
+        for query in queries
+    ]
+    await asyncio.sleep(0)  # Every call reaches the in-flight map
+    upstream.release()
+    return await asyncio.gather(*calls, return_exceptions=True)
+
+
+def test_identical_calls_share_one_upstream_request():
+    async def run():
+        upstream = StubUpstream()
+        orchestrator = make_orchestrator(upstream)
+        replies = await call_concurrently(orchestrator, upstream, VARIANTS * 4)
+        assert upstream.calls == 1
+        assert replies == ["☀️ Sunny, 22°C"] * 12
+        assert orchestrator.coalesced_calls == 11
+        assert not orchestrator._in_flight
+        assert orchestrator.response_cache.stats()['entries'] == 1
+
+        # A different query is its own request
+        await call_concurrently(orchestrator, upstream, ["Weather in Tokyo"])
+        assert upstream.calls == 2
+
+    asyncio.run(run())
+
+
+def test_failed_reply_reaches_every_waiter_and_is_not_cached():
+    async def run():
+        upstream = StubUpstream(reply=("❌ Error calling weather_agent: connection refused", None))
+        orchestrator = make_orchestrator(upstream)
+        replies = await call_concurrently(orchestrator, upstream, VARIANTS)
+        assert upstream.calls == 1
+        assert replies == ["❌ Error calling weather_agent: connection refused"] * 3
+        assert orchestrator.response_cache.stats()['entries'] == 0
+
+        # The next call goes upstream again
+        upstream.reply = ("☀️ Sunny, 22°C", {'skill_id': 'get_weather'})
+        assert await call_concurrently(orchestrator, upstream, [QUERY]) == ["☀️ Sunny, 22°C"]
+        assert upstream.calls == 2
+
+    asyncio.run(run())
+
+
+def test_exception_reaches_every_waiter():
+    async def run():
+        upstream = StubUpstream(error=ConnectionError("reset by peer"))
+        orchestrator = make_orchestrator(upstream)
+        replies = await call_concurrently(orchestrator, upstream, VARIANTS)
+        assert upstream.calls == 1
+        assert all(isinstance(reply, ConnectionError) for reply in replies)
+        assert not orchestrator._in_flight
+        assert orchestrator.response_cache.stats()['entries'] == 0
+
+        upstream.error = None
+        assert await call_concurrently(orchestrator, upstream, [QUERY]) == ["☀️ Sunny, 22°C"]
+        assert upstream.calls == 2
+
+    asyncio.run(run())
+
+
+def test_cancelled_waiter_leaves_the_shared_request_running():
+    async def run():
+        upstream = StubUpstream()
+        orchestrator = make_orchestrator(upstream)
+        first = asyncio.ensure_future(orchestrator.invoke_agent('weather_agent', QUERY, skill_id='get_weather'))
+        second = asyncio.ensure_future(orchestrator.invoke_agent('weather_agent', QUERY, skill_id='get_weather'))
+        await asyncio.sleep(0)
+        first.cancel()  # e.g. the first caller hit its deadline
+        await asyncio.sleep(0)
+        upstream.release()
+        assert await second == "☀️ Sunny, 22°C"
+        assert first.cancelled()
+        assert upstream.calls == 1
+
+    asyncio.run(run())
+
+
+def test_side_effecting_agents_are_not_coalesced():
+    async def run():
+        upstream = StubUpstream()
+        orchestrator = make_orchestrator(upstream, side_effects={'send_email'})
+        await call_concurrently(orchestrator, upstream, VARIANTS)
+        assert upstream.calls == 3
+        assert orchestrator.coalesced_calls == 0
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    tests = [(name, test) for name, test in list(globals().items()) if name.startswith('test_')]
+    for name, test in tests:
+        test()
+        print(f"✅ {name}")
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""Test the email agent's query parsing and replies in-process
+
+No server, network or delivery: emails stay queued. Run directly or with pytest.
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+
+# The email agent's directory is not a package: import its modules directly
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'email-agent'))
+os.environ.setdefault("EMAIL_STORE", "memory")
+
+import email_delivery
+from agent_executor import EmailAgent
+from email_delivery import HOSTNAME, DeliveryQueue, FileTransport
+from email_store import EmailStore, SqliteEmailStore
+from intent_parser import parse_query
+
+TMP_DIR = tempfile.mkdtemp(prefix="email_agent_test_")
+
+
+def make_agent(store=None):
+    """EmailAgent without delivery workers: sent emails stay queued"""
+    store = EmailStore() if store is None else store
+    transport = FileTransport(os.path.join(TMP_DIR, "outbox.jsonl"))
+    return EmailAgent(sent_emails=store, delivery=DeliveryQueue(store, transport, workers=0))
+
+
+def test_single_send_mentioning_an_address_is_not_bulk():
+    parsed = parse_query("Send email to bob@x.com with subject Hi and message ping me at alice@y.com")
+    assert parsed.intent == 'send_email'
+    assert parsed.recipient == 'bob@x.com'
+    assert parsed.message == 'ping me at alice@y.com'
+
+
+def test_several_recipients_are_bulk():
+    parsed = parse_query("Send email to bob@x.com, carol@y.com with subject Hi and message ping alice@z.com")
+    assert parsed.intent == 'bulk_send_email'
+    assert parsed.text[:parsed.slots_start].count('@') == 2
+
+
+def test_status_filter_needs_an_explicit_form():
+    assert parse_query("What is the delivery status of the email I sent?").status is None
+    assert parse_query("Check status failed").status == 'failed'
+    assert parse_query("Track sent emails").status == 'sent'
+    assert parse_query("Delivery status of emails that are queued").status == 'queued'
+
+
+def test_plain_status_question_lists_recent_emails():
+    async def run(agent):
+        await agent.send_email("Send email to bob@example.com with subject Hi and message Hello")
+        reply = await agent.check_status("What is the delivery status of the email I sent?")
+        assert reply.startswith("📊 Recent email status:"), reply
+        assert "bob@example.com" in reply and "queued" in reply
+        assert await agent.check_status("check status failed") == "📭 No failed emails found."
+
+    asyncio.run(run(make_agent()))
+    asyncio.run(run(make_agent(SqliteEmailStore(os.path.join(TMP_DIR, "emails.db")))))
+
+
+class RecordingTransport:
+    """Transport that records what it delivers"""
+
+    def __init__(self):
+        self.sent = []
+
+    async def send_batch(self, emails):
+        self.sent.extend(email_id for email_id, _ in emails)
+        return [None] * len(emails)
+
+
+def queued_record(owner):
+    return {'to': 'bob@example.com', 'subject': 'Hi', 'message': 'Hello', 'status': 'queued',
+            'timestamp': '2026-01-01T00:00:00', 'delivery_status': 'pending', 'attempts': 0, 'queued_by': owner}
+
+
+async def deliver(queue, seconds=0.2):
+    queue.start()
+    await asyncio.sleep(seconds)
+
+
+def test_orphaned_queued_emails_are_recovered():
+    store = SqliteEmailStore(os.path.join(TMP_DIR, "recover.db"))
+    store.add('email_dead0000', queued_record(f"{HOSTNAME}:999999999:00000000"))  # Stopped process
+    store.add('email_live0000', queued_record(f"{HOSTNAME}:{os.getppid()}:00000000"))  # Still running
+    store.add('email_old00000', queued_record(None))  # Queued before emails recorded their process
+    transport = RecordingTransport()
+    queue = DeliveryQueue(store, transport, workers=1, rate_limit=0, recover_interval=0)
+    asyncio.run(deliver(queue))
+    assert sorted(transport.sent) == ['email_dead0000', 'email_old00000']
+    assert store.get('email_dead0000')['status'] == 'sent'
+    assert store.get('email_live0000')['status'] == 'queued'
+
+    # Claimed emails are not recovered twice
+    transport = RecordingTransport()
+    asyncio.run(deliver(DeliveryQueue(store, transport, workers=1, rate_limit=0, recover_interval=0)))
+    assert transport.sent == []
+
+
+def test_store_errors_do_not_stop_delivery():
+    class FlakyStore(EmailStore):
+        def update(self, email_id, **fields):
+            if email_id == 'email_bad00000':
+                raise RuntimeError("disk full")
+            return super().update(email_id, **fields)
+
+    async def run():
+        store = FlakyStore()
+        transport = RecordingTransport()
+        queue = DeliveryQueue(store, transport, workers=1, rate_limit=0, recover_interval=0)
+        for email_id in ('email_bad00000', 'email_good0000'):
+            store.add(email_id, queued_record(queue.owner))
+            queue.submit(email_id, store.get(email_id))
+        await asyncio.sleep(0.1)
+        store.add('email_next0000', queued_record(queue.owner))
+        queue.submit('email_next0000', store.get('email_next0000'))
+        await asyncio.sleep(0.1)
+        assert store.get('email_good0000')['status'] == 'sent'
+        assert store.get('email_next0000')['status'] == 'sent', "the worker must survive the store error"
+
+    asyncio.run(run())
+
+
+def test_unrecorded_outcomes_are_recorded_again():
+    class FlakyStore(EmailStore):
+        failures = 2
+
+        def update(self, email_id, **fields):
+            if self.failures:
+                self.failures -= 1
+                raise RuntimeError("database is locked")
+            return super().update(email_id, **fields)
+
+    async def run():
+        store = FlakyStore()
+        transport = RecordingTransport()
+        queue = DeliveryQueue(store, transport, workers=1, rate_limit=0, retry_backoff=0.01, recover_interval=0)
+        store.add('email_flaky000', queued_record(queue.owner))
+        queue.submit('email_flaky000', store.get('email_flaky000'))
+        await asyncio.sleep(0.2)
+        assert store.get('email_flaky000')['status'] == 'sent', "the outcome must be recorded once the store recovers"
+        assert transport.sent == ['email_flaky000'], "recording again must not deliver again"
+        assert len(queue) == 0
+
+    asyncio.run(run())
+
+
+def test_recovery_pages_past_emails_of_live_processes():
+    store = EmailStore()
+    for i in range(5):  # Oldest first: still queued by a running process
+        store.add(f'email_live000{i}', queued_record(f"{HOSTNAME}:{os.getppid()}:00000000"))
+    store.add('email_dead0000', queued_record(f"{HOSTNAME}:999999999:00000000"))
+    transport = RecordingTransport()
+    page_size = email_delivery.RECOVER_BATCH
+    email_delivery.RECOVER_BATCH = 2
+    try:
+        queue = DeliveryQueue(store, transport, workers=1, rate_limit=0, max_queued=3, recover_interval=0)
+        asyncio.run(deliver(queue))
+    finally:
+        email_delivery.RECOVER_BATCH = page_size
+    assert transport.sent == ['email_dead0000']
+
+
+if __name__ == "__main__":
+    tests = [(name, test) for name, test in list(globals().items()) if name.startswith('test_')]
+    for name, test in tests:
+        test()
+        print(f"✅ {name}")
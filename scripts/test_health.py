@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""Test the orchestrator's endpoint health: circuit breaker, adaptive timeouts, replica picking
+
+Deterministic: a fake clock and fixed latency samples drive EndpointHealth,
+and a scripted RNG drives HealthTracker's replica sampling. Run directly or
+with pytest.
+"""
+
+import os
+import sys
+
+# Add parent directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from orchestrator.health import CLOSED, HALF_OPEN, OPEN, EndpointHealth, HealthTracker
+
+
+class FakeClock:
+    """Monotonic clock the test moves by hand"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+class ScriptedRandom:
+    """RNG stand-in: sample() takes the first k candidates, random() counts up"""
+
+    def __init__(self):
+        self.samples = []
+        self.draws = 0
+
+    def sample(self, population, k):
+        self.samples.append(list(population))
+        return list(population)[:k]
+
+    def random(self):
+        self.draws += 1
+        return self.draws
+
+
+def test_circuit_closes_opens_and_half_opens():
+    clock = FakeClock()
+    health = EndpointHealth(failure_threshold=3, cooldown=10.0, max_cooldown=30.0, clock=clock)
+
+    # closed -> open after consecutive failures
+    for _ in range(2):
+        assert health.allow_request()
+        health.record_failure()
+    assert health.state == CLOSED
+    health.record_failure()
+    assert health.state == OPEN
+    assert not health.allow_request() and health.rejected == 1
+    clock.advance(4)
+    assert health.retry_in() == 6.0
+
+    # open -> half-open after the cooldown: exactly one probe goes out
+    clock.advance(6)
+    assert health.allow_request()
+    assert health.state == HALF_OPEN
+    assert not health.allow_request() and health.rejected == 2
+
+    # A failed probe re-opens with a doubled cooldown, capped at max_cooldown
+    health.record_failure()
+    assert health.state == OPEN and health.cooldown == 20.0
+    clock.advance(19)
+    assert not health.allow_request()
+    clock.advance(1)
+    assert health.allow_request()
+    health.record_failure()
+    assert health.cooldown == 30.0
+    clock.advance(30)
+
+    # half-open -> closed on a successful probe, cooldown back to its base
+    assert health.allow_request()
+    health.record_success(0.2)
+    assert health.state == CLOSED and health.cooldown == 10.0
+    assert health.allow_request() and health.allow_request()
+
+
+def test_circuit_opens_on_error_rate():
+    health = EndpointHealth(failure_threshold=100, min_samples=10, error_rate_threshold=0.5, clock=FakeClock())
+    for _ in range(5):
+        health.record_success(0.1)
+        health.record_failure()
+    assert health.state == OPEN
+    assert health.error_rate() == 0.0, "outcomes are judged afresh once it recovers"
+
+
+def test_timeout_follows_p99():
+    clock = FakeClock()
+    health = EndpointHealth(min_samples=20, timeout_multiplier=2.0, min_timeout=1.0, idle_reset=300.0, clock=clock)
+
+    # Full timeout until enough samples exist
+    for _ in range(19):
+        health.record_success(0.5)
+    assert health.timeout(30.0) == 30.0
+
+    # 2 x p99 of 100 samples 0.01..1.00s: p99 is 0.99s
+    health.latencies.clear()
+    for i in range(1, 101):
+        health.record_success(i / 100)
+    assert health.percentile(99) == 0.99
+    assert health.percentile(50) == 0.5
+    assert health.timeout(30.0) == 1.98
+
+    # Clamped to [min_timeout, default]
+    assert health.timeout(1.5) == 1.5
+    health.latencies.clear()
+    for _ in range(20):
+        health.record_success(0.1)
+    assert health.timeout(30.0) == 1.0
+
+    # Full timeout again after idling (a scaled-to-zero agent cold starts)
+    clock.advance(301)
+    assert health.timeout(30.0) == 30.0
+    health.record_success(0.1)
+    assert health.timeout(30.0) == 1.0
+
+    # ... and for probes of an open circuit
+    for _ in range(health.failure_threshold):
+        health.record_failure()
+    assert health.timeout(30.0) == 30.0
+
+
+def test_pick_prefers_fewer_outstanding_and_skips_open_circuits():
+    rng = ScriptedRandom()
+    tracker = HealthTracker(rng=rng, failure_threshold=1, clock=FakeClock())
+    endpoints = ["http://a", "http://b", "http://c"]
+    tracker.get("http://a").outstanding = 3
+    tracker.get("http://b").outstanding = 1
+    tracker.get("http://c").outstanding = 0
+
+    # p2c compares the two sampled replicas only
+    assert tracker.pick(endpoints, "p2c") == "http://b"
+    assert rng.samples == [endpoints]
+    # least_outstanding compares all of them
+    assert tracker.pick(endpoints, "least_outstanding") == "http://c"
+
+    # Ties go to the lower random draw
+    tracker.get("http://c").outstanding = 1
+    assert tracker.pick(["http://b", "http://c"], "least_outstanding") == "http://b"
+
+    # Open circuits are skipped, unless every replica is open
+    tracker.get("http://b").record_failure()
+    assert tracker.is_open("http://b")
+    assert tracker.pick(endpoints, "p2c") == "http://c"
+    assert len(rng.samples) == 1, "two replicas left: compared without sampling"
+    for url in endpoints:
+        tracker.get(url).record_failure()
+    assert tracker.pick(endpoints, "least_outstanding") in endpoints
+
+    # exclude (the hedge's primary) leaves the other replica, or nothing
+    assert tracker.pick(["http://a", "http://b"], exclude=("http://a",)) == "http://b"
+    assert tracker.pick(["http://a"], exclude=("http://a",)) is None
+
+
+def test_hedge_delay_follows_p95():
+    tracker = HealthTracker(min_samples=20, clock=FakeClock())
+    health = tracker.get("http://a")
+    for i in range(1, 20):
+        health.record_success(i / 100)
+    assert tracker.hedge_delay("http://a") is None, "no hedging until enough samples"
+    for i in range(20, 101):
+        health.record_success(i / 100)
+    assert tracker.hedge_delay("http://a", percentile=95.0) == 0.95
+    assert tracker.hedge_delay("http://a", percentile=1.0, min_delay=0.05) == 0.05
+
+
+if __name__ == "__main__":
+    tests = [(name, test) for name, test in list(globals().items()) if name.startswith('test_')]
+    for name, test in tests:
+        test()
+        print(f"✅ {name}")
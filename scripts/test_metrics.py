@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""Test the /metrics gauges read from the request handler and the task store
+
+Runs in-process on bare Starlette apps; no agents needed. Run directly or
+with pytest.
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+from types import SimpleNamespace
+
+from starlette.applications import Starlette
+
+# Add parent directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from a2a.server.tasks import InMemoryTaskStore
+from a2a.types import Task, TaskState, TaskStatus
+
+import common.task_store
+from common.metrics import MetricsRegistry, instrument_app, parse_metrics
+from common.task_store import SqliteTaskStore
+
+TMP_DIR = tempfile.mkdtemp(prefix="metrics_test_")
+
+
+def gauges(registry):
+    """{metric name: value} of the unlabelled samples a scrape renders"""
+    return {name: value for name, labels, value in parse_metrics(registry.render()) if not labels}
+
+
+def make_task(task_id):
+    return Task(id=task_id, context_id='ctx', status=TaskStatus(state=TaskState.completed))
+
+
+def test_gauges_survive_missing_sdk_internals():
+    # A handler without the private attributes the gauges read
+    registry = MetricsRegistry()
+    instrument_app(Starlette(), SimpleNamespace(task_store=InMemoryTaskStore()), registry=registry)
+    assert gauges(registry)['a2a_task_store_tasks'] == 0
+
+    # Internals that changed shape: queues without .queue, no task store
+    handler = SimpleNamespace(
+        _queue_manager=SimpleNamespace(_task_queue={'t1': object()}),
+        _running_agents={'t1': object()},
+    )
+    registry = MetricsRegistry()
+    instrument_app(Starlette(), handler, registry=registry)
+    values = gauges(registry)
+    assert values['a2a_running_tasks'] == 1
+    assert values['a2a_event_queues'] == 1
+    assert values['a2a_event_queue_depth'] == 0
+
+    # A collector that raises drops its sample instead of failing the scrape
+    registry.running_tasks.set_function(lambda: 1 / 0)
+    assert 'a2a_running_tasks' not in gauges(registry)
+
+
+def test_task_store_gauge_never_queries_on_scrape():
+    async def run():
+        store = SqliteTaskStore(os.path.join(TMP_DIR, "tasks.db"), flush_interval=0.01)
+        registry = MetricsRegistry()
+        instrument_app(Starlette(), SimpleNamespace(task_store=store), registry=registry)
+        for i in range(3):
+            await store.save(make_task(f"task-{i}"))
+        await asyncio.sleep(0.1)  # The flush loop commits and recounts off the loop
+        assert gauges(registry)['a2a_task_store_tasks'] == 3
+
+        def no_queries():
+            raise AssertionError("a scrape must not query SQLite")
+        store._count = no_queries
+        assert gauges(registry)['a2a_task_store_tasks'] == 3
+
+    interval = common.task_store.TASK_COUNT_INTERVAL
+    common.task_store.TASK_COUNT_INTERVAL = 0
+    try:
+        asyncio.run(run())
+    finally:
+        common.task_store.TASK_COUNT_INTERVAL = interval
+
+
+if __name__ == "__main__":
+    tests = [(name, test) for name, test in list(globals().items()) if name.startswith('test_')]
+    for name, test in tests:
+        test()
+        print(f"✅ {name}")
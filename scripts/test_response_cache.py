@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""Test which agent replies the orchestrator's response cache keeps
+
+Calls the email agent in-process over an ASGI transport (no servers or
+Context Forge needed), with the cache policy its AgentCard declares. Run
+directly or with pytest.
+"""
+
+import asyncio
+import importlib.util
+import os
+import sys
+
+import httpx
+
+# Add parent directory to path
+REPO_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, REPO_ROOT)
+os.environ.setdefault("TASK_STORE", "memory")
+os.environ.setdefault("EMAIL_STORE", "memory")
+os.environ.setdefault("AGENT_SNAPSHOT_PATH", "")
+
+from a2a.types import AgentCard
+
+from orchestrator.orchestrator import Orchestrator
+from response_cache import cache_policy_from_card, reply_ttl, side_effect_skills_from_card
+
+
+def test_reply_ttl():
+    policy = {'validate_email': 3600.0, 'send_email': 0.0}
+    assert reply_ttl(policy, 'validate_email', {}) == 3600.0  # Agent reports nothing: the routed skill's
+    assert reply_ttl(policy, 'validate_email', {'skill_id': 'validate_email'}) == 3600.0
+    assert reply_ttl(policy, 'validate_email', {'skill_id': 'send_email'}) == 0  # Mis-routed side effect
+    assert reply_ttl(policy, 'validate_email', {'skill_id': None}) == 0  # No skill ran
+
+
+def load_email_agent():
+    """The email agent's entry module (its directory is not a package)"""
+    path = os.path.join(REPO_ROOT, 'email-agent', '__main__.py')
+    sys.modules.pop('agent_executor', None)  # weather-agent has one too
+    sys.path.insert(0, os.path.dirname(path))
+    try:
+        spec = importlib.util.spec_from_file_location("email_agent_app", path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        return module
+    finally:
+        sys.path.pop(0)
+
+
+async def email_agent_orchestrator():
+    """Orchestrator whose client reaches the email agent's app, with the card's cache policy"""
+    transport = httpx.ASGITransport(app=load_email_agent().create_app())
+    orchestrator = Orchestrator()
+    orchestrator.client = httpx.AsyncClient(transport=transport)
+    response = await orchestrator.client.get("http://email_agent/.well-known/agent-card.json")
+    card = AgentCard.model_validate(response.json())
+    orchestrator.agents = {
+        card.name: {
+            'endpoint_url': "http://email_agent/",
+            'cache_policy': cache_policy_from_card(card),
+            'side_effects': side_effect_skills_from_card(card),
+            'skills': {},
+        }
+    }
+    return orchestrator, card.name
+
+
+def test_usage_reply_is_not_cached():
+    async def run():
+        orchestrator, agent_name = await email_agent_orchestrator()
+        try:
+            assert orchestrator.agents[agent_name]['cache_policy']['validate_email'] > 0
+            # Routed as validate_email, but no skill understands the query
+            reply = await orchestrator.invoke_agent(agent_name, "Help me with my inbox", skill_id='validate_email')
+            assert reply.startswith("📧 Email Agent - Available Commands:"), reply
+            assert orchestrator.response_cache.stats()['entries'] == 0
+
+            reply = await orchestrator.invoke_agent(agent_name, "Validate email bob@example.com", skill_id='validate_email')
+            assert "bob@example.com" in reply, reply
+            assert orchestrator.response_cache.stats()['entries'] == 1
+        finally:
+            await orchestrator.client.aclose()
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    tests = [(name, test) for name, test in list(globals().items()) if name.startswith('test_')]
+    for name, test in tests:
+        test()
+        print(f"✅ {name}")
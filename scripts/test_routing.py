@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""Test that the default routing engine sends each example query to the right agent
+
+Builds every agent's app in-process and reads its AgentCard over an ASGI
+transport (no servers or Context Forge needed), indexes the cards the way
+discovery does, then routes each card's examples and the repo's sample
+queries. Run directly or with pytest.
+"""
+
+import asyncio
+import importlib.util
+import os
+import sys
+
+import httpx
+
+# Add parent directory to path
+REPO_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, REPO_ROOT)
+os.environ.setdefault("TASK_STORE", "memory")  # No task databases for a routing test
+os.environ.setdefault("AGENT_SNAPSHOT_PATH", "")
+
+from orchestrator.orchestrator import Orchestrator
+from orchestrator.routing import AGENT_KEYWORDS, KeywordSkillIndex
+
+AGENT_SCRIPTS = {
+    'weather_agent': 'weather-agent/__main__.py',
+    'calculator_agent': 'agents/calculator_agent.py',
+    'travel_agent': 'agents/travel_agent.py',
+    'email_agent': 'email-agent/__main__.py',
+}
+
+# Queries outside the cards' own examples (the keyword table routed them),
+# with the agents they must match
+SAMPLE_QUERIES = {
+    "What should I pack for London?": ['weather_agent'],
+    "Is it going to rain in Seattle?": ['weather_agent'],
+    "Will it be sunny or cloudy in Miami tomorrow?": ['weather_agent'],
+    "What is the climate like in Denver?": ['weather_agent'],
+    "What's the weather in Dallas?": ['weather_agent'],
+    "Convert 100 USD to EUR": ['calculator_agent'],
+    "Plan a trip to Paris": ['travel_agent'],
+    "Send email to bob@example.com with subject Hi": ['email_agent'],
+    "I want to visit Paris for 7 days. What's the weather, what should I pack, and what's the budget?":
+        ['weather_agent', 'travel_agent'],
+    "What's the weather in Tokyo and convert 100 USD to JPY": ['calculator_agent', 'weather_agent'],
+}
+
+
+# Edge cases for the keyword scorer: substrings, repeats, numbers, short and stop words
+KEYWORD_QUERIES = [
+    "",
+    "weather weather WEATHER",
+    "Is it rainy? Packages and umbrellas",
+    "convert 3.5 -10 100 usd",
+    "a an the to of in on",
+    "Recommendations for a romantic vacation with a tight budget",
+    "currency conversion: eur->gbp, then multiply by 12",
+    "What are the top tips for adventure travel?",
+    "send an email and validate the addresses",
+    "temperatures in celsius and fahrenheit",
+    "xyz qwerty",
+]
+
+
+def baseline_match(agents, query):
+    """The linear keyword scorer KeywordSkillIndex replaced, kept as the reference"""
+    query_lower = query.lower()
+    stop_words = {'a', 'an', 'the', 'in', 'on', 'at', 'to', 'for', 'of', 'and', 'or', 'is', 'are', 'was', 'were',
+                  'be', 'been', 'being', 'have', 'has', 'had', 'do', 'does', 'did', 'will', 'would', 'should',
+                  'could', 'may', 'might', 'can', 'what', 'when', 'where', 'who', 'how', 'i', 'you', 'me', 'my',
+                  'your'}
+    words = [w for w in query_lower.split()
+             if w not in stop_words and not w.replace('.', '').replace('-', '').isdigit()]
+    matched = []
+    for agent_name, agent_info in agents.items():
+        agent_score = sum(10 for keyword in AGENT_KEYWORDS.get(agent_name, []) if keyword in query_lower)
+        matched_skills = []
+        for skill_id, skill in agent_info['skills'].items():
+            skill_score = 0
+            for word in words:
+                if len(word) > 2:
+                    if word in skill['name'].lower():
+                        skill_score += 5
+                    if word in skill['description'].lower():
+                        skill_score += 3
+            if skill_score > 0:
+                matched_skills.append({'skill_id': skill_id, 'score': skill_score})
+        if matched_skills or agent_score > 0:
+            matched.append({
+                'agent_name': agent_name,
+                'skill_id': matched_skills[0]['skill_id'] if matched_skills else next(iter(agent_info['skills'])),
+                'score': agent_score + sum(s['score'] for s in matched_skills),
+            })
+    matched.sort(key=lambda m: m['score'], reverse=True)
+    return [m for m in matched if m['score'] > 5]
+
+
+def load_agent_script(service, relative_path):
+    """Import an agent's entry script by path (the agent directories are not packages)"""
+    path = os.path.join(REPO_ROOT, relative_path)
+    sys.modules.pop('agent_executor', None)  # weather-agent and email-agent both have one
+    sys.path.insert(0, os.path.dirname(path))
+    try:
+        spec = importlib.util.spec_from_file_location(f"{service}_app", path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        return module
+    finally:
+        sys.path.pop(0)
+
+
+async def fetch_cards():
+    """{service: AgentCard JSON} served by each agent's create_app()"""
+    cards = {}
+    for service, relative_path in AGENT_SCRIPTS.items():
+        app = load_agent_script(service, relative_path).create_app()
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://agent") as client:
+            response = await client.get("/.well-known/agent-card.json")
+            response.raise_for_status()
+            cards[service] = response.json()
+    return cards
+
+
+def build_orchestrator(cards):
+    """Orchestrator with the cards indexed as discovery would"""
+    orchestrator = Orchestrator()
+    orchestrator.agents = {
+        card['name']: {
+            'endpoint_url': f"http://{service}",
+            'skills': {
+                skill['id']: {
+                    'name': skill['name'],
+                    'description': skill['description'],
+                    'tags': skill.get('tags'),
+                    'examples': skill.get('examples'),
+                }
+                for skill in card['skills']
+            },
+        }
+        for service, card in cards.items()
+    }
+    orchestrator.router.sync(orchestrator.agents)
+    return orchestrator
+
+
+def expected_routes(cards):
+    """{query: agents} for every card example, plus the sample queries"""
+    routes = {}
+    for card in cards.values():
+        for skill in card['skills']:
+            for example in skill.get('examples') or []:
+                routes[example] = [card['name']]
+    routes.update(SAMPLE_QUERIES)
+    return routes
+
+
+def misrouted(orchestrator, routes):
+    """[(query, expected agents, matched agents)] for queries not routed to exactly their agents"""
+    errors = []
+    for query, agents in routes.items():
+        matched = [match['agent_name'] for match in orchestrator.match_query_to_skills(query)]
+        if sorted(matched) != sorted(agents):
+            errors.append((query, agents, matched))
+    return errors
+
+
+def keyword_mismatches(orchestrator, queries):
+    """[(query, baseline, index)] for queries KeywordSkillIndex scores differently than the baseline"""
+    index = KeywordSkillIndex()
+    index.sync(orchestrator.agents)
+    errors = []
+    for query in queries:
+        expected = [(m['agent_name'], m['skill_id'], m['score']) for m in baseline_match(orchestrator.agents, query)]
+        actual = [(m['agent_name'], m['skill_id'], m['score']) for m in index.match(query)]
+        if actual != expected:
+            errors.append((query, expected, actual))
+    return errors
+
+
+def test_routes_examples_to_their_agent():
+    cards = asyncio.run(fetch_cards())
+    orchestrator = build_orchestrator(cards)
+    errors = misrouted(orchestrator, expected_routes(cards))
+    assert not errors, "\n".join(f"{query!r}: expected {agents}, matched {matched}" for query, agents, matched in errors)
+
+
+def test_keyword_index_matches_baseline_scores():
+    cards = asyncio.run(fetch_cards())
+    orchestrator = build_orchestrator(cards)
+    errors = keyword_mismatches(orchestrator, list(expected_routes(cards)) + KEYWORD_QUERIES)
+    assert not errors, "\n".join(f"{query!r}: baseline {expected}, index {actual}" for query, expected, actual in errors)
+
+
+if __name__ == "__main__":
+    cards = asyncio.run(fetch_cards())
+    orchestrator = build_orchestrator(cards)
+    routes = expected_routes(cards)
+    errors = misrouted(orchestrator, routes)
+    for query, agents, matched in errors:
+        print(f"❌ {query!r}: expected {agents}, matched {matched}")
+    print(f"{'✅' if not errors else '❌'} {len(routes) - len(errors)}/{len(routes)} queries routed "
+          f"to their agent ({orchestrator.routing_engine})")
+
+    queries = list(routes) + KEYWORD_QUERIES
+    keyword_errors = keyword_mismatches(orchestrator, queries)
+    for query, expected, actual in keyword_errors:
+        print(f"❌ {query!r}: baseline {expected}, index {actual}")
+    print(f"{'✅' if not keyword_errors else '❌'} {len(queries) - len(keyword_errors)}/{len(queries)} queries "
+          f"scored by the keyword index as by the baseline")
+    sys.exit(1 if errors or keyword_errors else 0)
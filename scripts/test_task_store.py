@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""Test the agents' SQLite task store: write-behind, LRU eviction and TTL expiry
+
+Runs in-process on temporary SQLite files; no agents needed. Run directly or
+with pytest.
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+
+# Add parent directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from a2a.types import Task, TaskState, TaskStatus
+
+import common.task_store
+from common.task_store import SqliteTaskStore
+
+TMP_DIR = tempfile.mkdtemp(prefix="task_store_test_")
+
+
+def make_task(task_id, state=TaskState.working):
+    return Task(id=task_id, context_id='ctx', status=TaskStatus(state=state))
+
+
+def db_path(name):
+    return os.path.join(TMP_DIR, f"{name}.db")
+
+
+def test_save_then_get_after_flush():
+    async def run():
+        store = SqliteTaskStore(db_path("flush"), cache_size=0, flush_interval=0.01)
+        other_worker = SqliteTaskStore(db_path("flush"), cache_size=0, flush_interval=0.01)
+
+        await store.save(make_task("t1"))
+        assert (await store.get("t1")).id == "t1", "a queued save is visible in its own worker"
+        assert await other_worker.get("t1") is None, "not flushed yet"
+
+        await asyncio.sleep(0.1)
+        assert not store._pending
+        assert (await other_worker.get("t1")).status.state == TaskState.working
+
+        await store.save(make_task("t1", TaskState.completed))
+        await store.delete("t2")
+        await store.flush()
+        assert (await other_worker.get("t1")).status.state == TaskState.completed
+
+        await store.delete("t1")
+        assert await store.get("t1") is None, "a queued delete hides the row at once"
+        await store.flush()
+        assert await other_worker.get("t1") is None
+        assert len(store) == 0
+
+    asyncio.run(run())
+
+
+def test_lru_evicts_least_recently_used():
+    async def run():
+        store = SqliteTaskStore(db_path("lru"), cache_size=2, flush_interval=0.01)
+        for task_id in ("t1", "t2"):
+            await store.save(make_task(task_id))
+        await store.get("t1")  # t2 is now the least recently used
+        await store.save(make_task("t3"))
+        assert list(store._cache) == ["t1", "t3"]
+
+        # An evicted task is read back from the file
+        await store.flush()
+        task = await store.get("t2")
+        assert task.id == "t2"
+        assert list(store._cache) == ["t3", "t2"]
+
+    asyncio.run(run())
+
+
+def test_expired_tasks_are_swept():
+    async def run():
+        store = SqliteTaskStore(db_path("ttl"), cache_size=0, flush_interval=0.01, ttl=0.1)
+        await store.save(make_task("old"))
+        await asyncio.sleep(0.2)  # Flushed, then older than the TTL
+        await store.save(make_task("new"))  # The flush that follows sweeps
+        await asyncio.sleep(0.1)
+        assert await store.get("old") is None
+        assert (await store.get("new")).id == "new"
+        assert len(store) == 1
+
+    interval = common.task_store.TASK_SWEEP_INTERVAL
+    common.task_store.TASK_SWEEP_INTERVAL = 0
+    try:
+        asyncio.run(run())
+    finally:
+        common.task_store.TASK_SWEEP_INTERVAL = interval
+
+
+def test_flush_loop_sleeps_while_idle():
+    async def run():
+        store = SqliteTaskStore(db_path("idle"), flush_interval=0.01, write_batch=3)
+        await store.save(make_task("t1"))
+        await asyncio.sleep(0.05)
+
+        flushes = []
+        flush = store.flush
+
+        async def counted_flush():
+            flushes.append(len(store._pending))
+            await flush()
+        store.flush = counted_flush
+
+        await asyncio.sleep(0.2)  # Twenty flush intervals with nothing queued
+        assert flushes == []
+
+        # A full batch is committed without waiting out the interval
+        store.flush_interval = 10.0
+        for task_id in ("t2", "t3", "t4"):
+            await store.save(make_task(task_id))
+        await asyncio.sleep(0.05)
+        assert flushes == [3]
+        assert not store._pending
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    tests = [(name, test) for name, test in list(globals().items()) if name.startswith('test_')]
+    for name, test in tests:
+        test()
+        print(f"✅ {name}")
@@ -9,6 +9,7 @@ import httpx
 # Add parent directory to path
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
 
+from common.log import configure_logging
 from orchestrator.orchestrator import Orchestrator
 
 async def get_auth_token():
@@ -63,6 +64,7 @@ async def test_virtual_server():
     print("=" * 60)
 
 if __name__ == "__main__":
+    configure_logging('test_virtual_server', use_queue=False)  # Discovery lines in order with the results
     asyncio.run(test_virtual_server())
 
 # Made with Bob
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+Summarize spans recorded with TRACE_EXPORTER=file (see common/tracing.py)
+
+Prints, per span (service and name), the call count, error count and latency
+percentiles, plus self time: the span's duration minus the time covered by
+its children. Self time shows where a slow query actually spends its time -
+registry lookups, card fetches, routing, the network hop or the agent's
+execute. Then the slowest traces are printed as trees.
+
+Usage:
+    TRACE_EXPORTER=file python3 orchestrator/orchestrator.py   # and the agents
+    python3 scripts/trace_report.py
+    python3 scripts/trace_report.py logs/traces.jsonl --slowest 5 --root route_query
+"""
+import argparse
+import json
+import math
+import os
+import sys
+from collections import defaultdict
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, REPO_ROOT)
+
+from common.tracing import TRACE_FILE
+
+
+def load_spans(path):
+    spans = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                spans.append(json.loads(line))
+    return spans
+
+
+def percentile(values, q):
+    """Nearest-rank percentile of sorted values"""
+    return values[min(len(values) - 1, max(0, math.ceil(q / 100 * len(values)) - 1))]
+
+
+def covered_ms(span, children):
+    """Milliseconds of span covered by the union of its children's intervals"""
+    intervals = sorted(
+        (max(c['start_time_unix_nano'], span['start_time_unix_nano']), min(c['end_time_unix_nano'], span['end_time_unix_nano']))
+        for c in children
+    )
+    total = 0
+    current_start = current_end = None
+    for start, end in intervals:
+        if current_end is None or start > current_end:
+            if current_end is not None:
+                total += current_end - current_start
+            current_start, current_end = start, end
+        else:
+            current_end = max(current_end, end)
+    if current_end is not None:
+        total += current_end - current_start
+    return max(0, total) / 1e6
+
+
+def summarize(spans):
+    """Per (service, name): count, errors, duration and self-time percentiles"""
+    children = defaultdict(list)
+    for span in spans:
+        if span.get('parent_span_id'):
+            children[(span['trace_id'], span['parent_span_id'])].append(span)
+
+    groups = defaultdict(lambda: {'durations': [], 'self': [], 'errors': 0})
+    for span in spans:
+        group = groups[(span['service'], span['name'])]
+        duration = span['duration_ms']
+        group['durations'].append(duration)
+        group['self'].append(duration - covered_ms(span, children[(span['trace_id'], span['span_id'])]))
+        if span['status'] == 'error':
+            group['errors'] += 1
+
+    rows = []
+    for (service, name), group in groups.items():
+        durations = sorted(group['durations'])
+        self_times = group['self']
+        rows.append({
+            'service': service,
+            'name': name,
+            'count': len(durations),
+            'errors': group['errors'],
+            'p50': percentile(durations, 50),
+            'p95': percentile(durations, 95),
+            'p99': percentile(durations, 99),
+            'max': durations[-1],
+            'self_total': sum(self_times),
+            'self_mean': sum(self_times) / len(self_times),
+        })
+    rows.sort(key=lambda row: row['self_total'], reverse=True)
+    return rows
+
+
+def print_summary(rows):
+    print(f"{'span':<48} {'count':>6} {'err':>4} {'p50':>8} {'p95':>8} {'p99':>8} {'max':>8} {'self avg':>9} {'self total':>11}")
+    for row in rows:
+        label = f"{row['service']}:{row['name']}"
+        print(f"{label:<48} {row['count']:>6} {row['errors']:>4} {row['p50']:>8.2f} {row['p95']:>8.2f} "
+              f"{row['p99']:>8.2f} {row['max']:>8.2f} {row['self_mean']:>9.2f} {row['self_total']:>11.1f}")
+    print("(milliseconds; sorted by total self time)")
+
+
+def print_trace(spans, root):
+    """Print one trace as an indented tree with offsets from the root's start"""
+    by_parent = defaultdict(list)
+    for span in spans:
+        by_parent[span.get('parent_span_id')].append(span)
+
+    def walk(span, depth):
+        offset = (span['start_time_unix_nano'] - root['start_time_unix_nano']) / 1e6
+        attributes = {k: v for k, v in span['attributes'].items() if k in ('agent', 'skill', 'endpoint', 'cache', 'http.status_code')}
+        error = f"  ❌ {span['error']}" if span['status'] == 'error' else ""
+        details = f"  {attributes}" if attributes else ""
+        print(f"   {'  ' * depth}{span['service']}:{span['name']}  +{offset:.1f}ms  {span['duration_ms']:.2f}ms{details}{error}")
+        for child in sorted(by_parent[span['span_id']], key=lambda s: s['start_time_unix_nano']):
+            walk(child, depth + 1)
+
+    walk(root, 0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Summarize recorded trace spans")
+    parser.add_argument("path", nargs="?", default=TRACE_FILE, help=f"Span file (default: {TRACE_FILE})")
+    parser.add_argument("--slowest", type=int, default=3, help="Slowest traces to print as trees (default: 3)")
+    parser.add_argument("--root", help="Only consider traces whose root span has this name (e.g. route_query)")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.path):
+        print(f"❌ No span file at {args.path} (run with TRACE_EXPORTER=file)")
+        sys.exit(1)
+
+    spans = load_spans(args.path)
+    traces = defaultdict(list)
+    for span in spans:
+        traces[span['trace_id']].append(span)
+
+    # Roots are spans without a parent in the file (agent-only traces have a
+    # server span whose parent was never exported, e.g. an unsampled caller)
+    span_ids = {(span['trace_id'], span['span_id']) for span in spans}
+    roots = [
+        span for span in spans
+        if not span.get('parent_span_id') or (span['trace_id'], span['parent_span_id']) not in span_ids
+    ]
+    if args.root:
+        roots = [span for span in roots if span['name'] == args.root]
+        keep = {span['trace_id'] for span in roots}
+        spans = [span for span in spans if span['trace_id'] in keep]
+
+    print(f"\n📊 {len(spans)} spans in {len({span['trace_id'] for span in spans})} traces from {args.path}\n")
+    if not spans:
+        return
+    print_summary(summarize(spans))
+
+    for root in sorted(roots, key=lambda span: span['duration_ms'], reverse=True)[:args.slowest]:
+        print(f"\n🐢 Trace {root['trace_id']} ({root['duration_ms']:.2f}ms)")
+        print_trace(traces[root['trace_id']], root)
+    print()
+
+
+if __name__ == "__main__":
+    main()
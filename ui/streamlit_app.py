@@ -1,7 +1,7 @@
 import streamlit as st
-import httpx
 import asyncio
 import os
+import threading
 from datetime import datetime
 
 # Configuration
@@ -13,6 +13,8 @@ VIRTUAL_SERVER = os.getenv("VIRTUAL_SERVER", "travel-suite")
 import sys
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
 from orchestrator.orchestrator import Orchestrator
+from common.log import configure_logging, new_request_id
+from common.metrics import histogram_quantile, parse_metrics
 
 st.set_page_config(
     page_title="A2A Multi-Agent Orchestrator",
@@ -50,69 +52,119 @@ else:
     st.sidebar.caption("Querying all registered agents")
 
 
+@st.cache_resource
+def get_runtime():
+    """Process-wide event loop and started Orchestrator shared by every session
+    
+    httpx connection pools are bound to the event loop they were opened on,
+    so the shared client lives on one background loop instead of a fresh
+    asyncio.run() per call.
+    """
+    configure_logging("streamlit_ui")
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, daemon=True, name="orchestrator-loop").start()
+    orchestrator = Orchestrator()
+    asyncio.run_coroutine_threadsafe(orchestrator.start(), loop).result()
+    return loop, orchestrator
+
+
+def run_async(coro):
+    """Run a coroutine on the shared loop and wait for its result"""
+    loop, _ = get_runtime()
+    return asyncio.run_coroutine_threadsafe(coro, loop).result()
+
+
+def get_http_client():
+    """Pooled keep-alive client owned by the shared Orchestrator"""
+    _, orchestrator = get_runtime()
+    return orchestrator.client
+
+
+async def match_query(orchestrator, query):
+    """Match a query to agent skills on the shared loop"""
+    return orchestrator.match_query_to_skills(query)
+
+
 async def get_agents():
-    """Fetch all registered agents from Context Forge"""
+    """Fetch all registered agents from Context Forge
+    
+    Runs on the shared loop's thread, which has no Streamlit script context:
+    errors are returned for the caller to display.
+    
+    Returns:
+        (agents, error) - error is None on success
+    """
     try:
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            response = await client.get(
-                f"{CONTEXT_FORGE_URL}/a2a",
-                headers={"Authorization": f"Bearer {BEARER_TOKEN}"}
-            )
-            if response.status_code == 200:
-                return response.json()
-            return []
+        response = await get_http_client().get(
+            f"{CONTEXT_FORGE_URL}/a2a",
+            headers={"Authorization": f"Bearer {BEARER_TOKEN}"},
+            timeout=10.0,
+        )
+        if response.status_code == 200:
+            return response.json(), None
+        return [], None
     except Exception as e:
-        st.error(f"Error fetching agents: {e}")
-        return []
+        return [], e
 
 
 async def get_agent_card(endpoint_url):
     """Fetch AgentCard from an agent"""
     try:
-        async with httpx.AsyncClient(timeout=5.0) as client:
-            response = await client.get(f"{endpoint_url}/.well-known/agent.json")
-            if response.status_code == 200:
-                return response.json()
-            return None
+        response = await get_http_client().get(
+            f"{endpoint_url}/.well-known/agent.json",
+            timeout=5.0,
+        )
+        if response.status_code == 200:
+            return response.json()
+        return None
     except:
         return None
 
 
-async def call_agent(endpoint_url, query):
-    """Call an agent with a query"""
+async def get_agent_metrics(endpoint_url):
+    """Summary of an agent's Prometheus /metrics, or None when it has none
+    
+    Returns:
+        {skill_calls, skill_errors, skill_p95, http_p95, in_flight, tasks}
+        with latencies in seconds
+    """
     try:
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            payload = {
-                "jsonrpc": "2.0",
-                "method": "message/send",
-                "params": {
-                    "message": {
-                        "role": "user",
-                        "parts": [{"type": "text", "text": query}],
-                        "messageId": f"ui-{datetime.now().timestamp()}"
-                    }
-                },
-                "id": f"req-{datetime.now().timestamp()}"
-            }
-            
-            response = await client.post(
-                endpoint_url,
-                json=payload,
-                headers={"Content-Type": "application/json"}
-            )
-            
-            if response.status_code == 200:
-                result = response.json()
-                if 'result' in result and 'parts' in result['result']:
-                    texts = []
-                    for part in result['result']['parts']:
-                        if isinstance(part, dict) and 'text' in part:
-                            texts.append(part['text'])
-                    return ' '.join(texts) if texts else "No response"
-                return "Unexpected response format"
-            return f"Error: HTTP {response.status_code}"
-    except Exception as e:
-        return f"Error: {str(e)}"
+        response = await get_http_client().get(f"{endpoint_url}/metrics", timeout=5.0)
+        if response.status_code != 200:
+            return None
+    except Exception:
+        return None
+    
+    summary = {'skill_calls': 0, 'skill_errors': 0, 'in_flight': 0, 'tasks': 0}
+    buckets = {'skill': {}, 'http': {}}  # {le: cumulative count}, summed over label sets
+    for name, labels, value in parse_metrics(response.text):
+        if name == 'a2a_skill_requests_total':
+            summary['skill_calls'] += value
+            if labels.get('outcome') != 'ok':
+                summary['skill_errors'] += value
+        elif name == 'a2a_skill_duration_seconds_bucket':
+            le = float(labels['le'])
+            buckets['skill'][le] = buckets['skill'].get(le, 0) + value
+        elif name == 'a2a_http_request_duration_seconds_bucket' and labels.get('path') == '/':
+            le = float(labels['le'])
+            buckets['http'][le] = buckets['http'].get(le, 0) + value
+        elif name == 'a2a_http_requests_in_flight':
+            summary['in_flight'] = value - 1  # Minus this scrape
+        elif name == 'a2a_task_store_tasks':
+            summary['tasks'] = value
+    summary['skill_p95'] = histogram_quantile(0.95, list(buckets['skill'].items()))
+    summary['http_p95'] = histogram_quantile(0.95, list(buckets['http'].items()))
+    return summary
+
+
+def iterate_async(agen):
+    """Iterate an async generator running on the shared loop from Streamlit's thread"""
+    loop, _ = get_runtime()
+    while True:
+        try:
+            yield asyncio.run_coroutine_threadsafe(agen.__anext__(), loop).result()
+        except StopAsyncIteration:
+            return
 
 
 # Page 1: Query Interface
@@ -137,15 +189,17 @@ if page == "Query Interface":
         submit = st.button("🚀 Submit", type="primary")
     with col2:
         if st.button("🔄 Refresh Agents"):
+            get_runtime()[1].invalidate_discovery_cache()
             st.rerun()
     
     if submit and query:
         with st.spinner("Processing query..."):
             start_time = datetime.now()
             
-            # Initialize orchestrator and discover agents
-            orchestrator = Orchestrator()
-            asyncio.run(orchestrator.discover_agents())
+            # Reuse the shared orchestrator; agents come from the discovery cache
+            # (revalidated in the background once DISCOVERY_CACHE_TTL expires)
+            _, orchestrator = get_runtime()
+            run_async(orchestrator.ensure_agents())
             
             if not orchestrator.agents:
                 st.error("No agents available. Make sure agents are registered.")
@@ -156,8 +210,9 @@ if page == "Query Interface":
                 else:
                     st.info(f"Found {len(orchestrator.agents)} registered agents (all)")
                 
-                # Use smart routing to match query to relevant agents
-                matches = orchestrator.match_query_to_skills(query)
+                # Use smart routing to match query to relevant agents (on the
+                # orchestrator loop, so it never races a background refresh)
+                matches = run_async(match_query(orchestrator, query))
                 
                 if not matches:
                     st.warning("⚠️ No relevant agents found for this query. Showing all agent responses:")
@@ -172,16 +227,18 @@ if page == "Query Interface":
                 else:
                     st.success(f"🎯 Matched {len(matches)} relevant agent(s)")
                 
-                # Show responses from matched agents only
+                # Show responses from matched agents only, rendered as they stream in
                 st.markdown("### 📤 Responses")
                 
+                placeholders = {}
                 for match in matches:
-                    agent_name = match['agent_name']
-                    endpoint_url = match['endpoint']
-                    
-                    with st.expander(f"🤖 {agent_name}", expanded=True):
-                        response = asyncio.run(call_agent(endpoint_url, query))
-                        st.markdown(response)
+                    with st.expander(f"🤖 {match['agent_name']}", expanded=True):
+                        placeholders[match['agent_name']] = st.empty()
+                
+                responses = {name: "" for name in placeholders}
+                for agent_name, chunk in iterate_async(orchestrator.stream_matches(matches, query, request_id=new_request_id())):
+                    responses[agent_name] += chunk
+                    placeholders[agent_name].markdown(responses[agent_name])
                 
                 end_time = datetime.now()
                 duration = (end_time - start_time).total_seconds()
@@ -216,7 +273,9 @@ elif page == "Agent Dashboard":
         st.rerun()
     
     with st.spinner("Loading agents..."):
-        agents = asyncio.run(get_agents())
+        agents, error = run_async(get_agents())
+    if error is not None:
+        st.error(f"Error fetching agents: {error}")
     
     if not agents:
         st.warning("No agents registered. Run the registration script first.")
@@ -234,7 +293,7 @@ elif page == "Agent Dashboard":
             for agent in agents:
                 endpoint = agent.get('endpointUrl') or agent.get('endpoint_url')
                 if endpoint:
-                    card = asyncio.run(get_agent_card(endpoint))
+                    card = run_async(get_agent_card(endpoint))
                     if card and 'skills' in card:
                         total_skills += len(card['skills'])
             st.metric("Total Skills", total_skills)
@@ -261,7 +320,7 @@ elif page == "Agent Dashboard":
                     
                     # Fetch and display skills
                     if endpoint_url:
-                        card = asyncio.run(get_agent_card(endpoint_url))
+                        card = run_async(get_agent_card(endpoint_url))
                         if card and 'skills' in card:
                             st.markdown("**Skills:**")
                             for skill in card['skills']:
@@ -279,6 +338,18 @@ elif page == "Agent Dashboard":
                         st.metric("Success Rate", f"{success_rate:.1f}%")
                         avg_time = metrics.get('avgResponseTime', 0)
                         st.metric("Avg Response", f"{avg_time if avg_time is not None else 0:.3f}s")
+                    
+                    # Agent-side numbers from the agent's own /metrics endpoint
+                    agent_metrics = run_async(get_agent_metrics(endpoint_url)) if endpoint_url else None
+                    if agent_metrics:
+                        st.markdown("**Agent-side**")
+                        errors = agent_metrics['skill_errors']
+                        st.metric("Skill Calls", f"{agent_metrics['skill_calls']:.0f}",
+                                  delta=f"{errors:.0f} errors" if errors else None, delta_color="inverse")
+                        for label, key in (("Skill p95", 'skill_p95'), ("Request p95", 'http_p95')):
+                            value = agent_metrics[key]
+                            st.metric(label, f"{value * 1000:.1f}ms" if value is not None else "n/a")
+                        st.caption(f"{agent_metrics['in_flight']:.0f} in flight · {agent_metrics['tasks']:.0f} stored tasks")
 
 # Footer
 st.markdown("---")
@@ -1,42 +1,61 @@
-import uvicorn
 from a2a.server.apps import A2AStarletteApplication
 from a2a.server.request_handlers import DefaultRequestHandler
-from a2a.server.tasks import InMemoryTaskStore
 from a2a.types import (
     AgentCard,
     AgentSkill,
     AgentCapabilities,
+    AgentExtension,
 )
 from agent_executor import WeatherAgentExecutor
+# agent_executor puts the repository root on sys.path
+from common.log import configure_logging, get_logger
+from common.metrics import instrument_app
+from common.reply import RESPONSE_CACHE_EXTENSION
+from common.server import agent_port, serve
+from common.task_store import create_task_store
 
-if __name__ == '__main__':
+logger = get_logger('weather_agent')
+
+
+def create_app():
+    """Build the weather agent's Starlette app (once per worker process)"""
     # Define agent skills
     get_weather_skill = AgentSkill(
         id='get_current_weather',
         name='Get Current Weather',
         description='Get current weather conditions for a specified city',
-        tags=['weather', 'current'],
-        examples=['What is the weather in Dallas?', 'Current weather in Tokyo'],
+        tags=['weather', 'current', 'rain', 'sunny', 'cloudy', 'pack', 'packing'],
+        examples=['What is the weather in Dallas?', 'Current weather in Tokyo', 'What should I pack for London?'],
     )
     
     forecast_skill = AgentSkill(
         id='get_forecast',
         name='Get Weather Forecast',
         description='Get 5-day weather forecast for a city',
-        tags=['weather', 'forecast'],
+        tags=['weather', 'forecast', 'rain', 'climate'],
         examples=['Weather forecast for New York'],
     )
     
+    # Port from WEATHER_AGENT_PORT or PORT (run replicas on different ports)
+    port = agent_port('weather_agent', 5001)
+    
     # Create Agent Card
     agent_card = AgentCard(
         name='weather_agent',
         version='1.0.0',
         description='Provides current weather and forecasts for cities worldwide',
-        url='http://localhost:5001',
+        url=f'http://localhost:{port}',
         protocolVersion='0.3.0',
         capabilities=AgentCapabilities(
-            streaming=False,
+            streaming=True,
             pushNotifications=False,
+            extensions=[
+                AgentExtension(
+                    uri=RESPONSE_CACHE_EXTENSION,
+                    description='Per-skill response cache TTLs in seconds (0 = never cache)',
+                    params={'skills': {'get_current_weather': 300, 'get_forecast': 1800}},
+                ),
+            ],
         ),
         authentication={
             'schemes': [],
@@ -49,7 +68,7 @@ if __name__ == '__main__':
     # Create request handler
     request_handler = DefaultRequestHandler(
         agent_executor=WeatherAgentExecutor(),
-        task_store=InMemoryTaskStore(),
+        task_store=create_task_store('weather_agent'),  # SQLite behind an LRU, shared by every worker (TASK_STORE)
     )
     
     # Create A2A server application
@@ -58,8 +77,17 @@ if __name__ == '__main__':
         http_handler=request_handler,
     )
     
-    print("🌤️  Weather Agent starting on http://localhost:5001")
-    print("📋 AgentCard: http://localhost:5001/.well-known/agent.json")
+    # Build the Starlette app with Prometheus metrics at /metrics
+    return instrument_app(server.build(), request_handler)
+
+
+if __name__ == '__main__':
+    configure_logging('weather_agent')
+    port = agent_port('weather_agent', 5001)
+    
+    logger.info("🌤️  Weather Agent starting on http://localhost:%d", port)
+    logger.info("📋 AgentCard: http://localhost:%d/.well-known/agent.json", port)
+    logger.info("📈 Metrics: http://localhost:%d/metrics", port)
     
-    # Start server
-    uvicorn.run(server.build(), host='0.0.0.0', port=5001)
+    # Start server (WEATHER_AGENT_WORKERS or WORKERS worker processes)
+    serve('weather_agent', create_app, default_port=5001)
@@ -1,7 +1,19 @@
+import os
+import sys
+import time
 from typing_extensions import override
 from a2a.server.agent_execution import AgentExecutor, RequestContext
 from a2a.server.events import EventQueue
-from a2a.utils import new_agent_text_message
+
+# Shared modules at the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.log import REQUEST_ID_HEADER, get_logger, request_context
+from common.metrics import track_skill
+from common.reply import stream_reply
+from common.tracing import SERVER, extract, get_tracer, request_headers
+
+tracer = get_tracer('weather_agent')
+logger = get_logger('weather_agent')
 
 class WeatherAgent:
     """Simple weather agent with mock data"""
@@ -14,6 +26,10 @@ class WeatherAgent:
         "paris": {"condition": "Rainy", "temp_f": 54, "temp_c": 12},
     }
     
+    def classify(self, query: str):
+        """Skill id a query will run (get_weather serves both)"""
+        return 'get_forecast' if 'forecast' in query.lower() else 'get_current_weather'
+    
     async def get_weather(self, query: str) -> str:
         query_lower = query.lower()
         
@@ -47,20 +63,32 @@ class WeatherAgentExecutor(AgentExecutor):
         context: RequestContext,
         event_queue: EventQueue,
     ) -> None:
-        # Get the user's message
-        message_text = ""
-        if context.message and context.message.parts:
-            for part in context.message.parts:
-                # Part is a discriminated union, access via root
-                if hasattr(part, 'root') and hasattr(part.root, 'text'):
-                    message_text = part.root.text
-                    break
-        
-        # Process the weather query
-        result = await self.agent.get_weather(message_text)
-        
-        # Send response through event queue
-        await event_queue.enqueue_event(new_agent_text_message(result))
+        # Continue the caller's request id and trace (X-Request-ID and traceparent headers)
+        headers = request_headers(context)
+        with request_context(headers.get(REQUEST_ID_HEADER)), tracer.start_as_current_span(
+            'agent.execute', kind=SERVER, parent=extract(headers), attributes={'task_id': context.task_id}
+        ):
+            # Get the user's message
+            message_text = ""
+            if context.message and context.message.parts:
+                for part in context.message.parts:
+                    # Part is a discriminated union, access via root
+                    if hasattr(part, 'root') and hasattr(part.root, 'text'):
+                        message_text = part.root.text
+                        break
+            
+            # Process the weather query
+            skill_id = self.agent.classify(message_text)
+            started = time.perf_counter()
+            with tracer.start_as_current_span('agent.process', attributes={'skill': skill_id}), track_skill(skill_id):
+                result = await self.agent.get_weather(message_text)
+            
+            # Stream the response through the event queue
+            with tracer.start_as_current_span('agent.reply'):
+                await stream_reply(context, event_queue, result)
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            logger.info("✅ %s answered in %.1fms", skill_id, elapsed_ms,
+                        extra={'skill': skill_id, 'duration_ms': round(elapsed_ms, 1)})
     
     @override
     async def cancel(